@@ -7,7 +7,23 @@ from tests.services.file_service.test_file_service import TestFileServiceRegex,
 from tests.services.history_service.test_history_service import TestHistoryService
 from tests.test_action_manager import TestActionManger
 from tests.test_parser import TestParser
+from tests.test_stats_logger import TestStatsLogger
 from tests.test_orchestrator_streaming_output import TestOrchestratorStreamingOutput
+from tests.test_orchestrator_tools import TestOrchestratorTools
+from tests.test_prompt_cache import TestPromptCache
+from tests.test_orchestrator_prompt import TestOrchestratorPrompt
+from tests.test_orchestrator_state import TestOrchestratorState
+from tests.test_session_state_store import TestSessionStateStore
+from tests.test_action_cache import TestActionCache
+from tests.test_action_request_store import TestRedisActionRequestStore
+from tests.test_action_executor import TestActionExecutor
+from tests.test_broker_request_multiplexer import TestBrokerRequestMultiplexer, TestConcurrentAgentRequests
+from tests.test_llm_request_streaming import TestLLMRequestStreaming
+from tests.test_stimulus_usage import TestStimulusUsage
+from tests.services.history_service.test_history_providers import TestHistoryProviders
+from tests.services.history_service.test_sql_history_provider import TestSQLHistoryProvider
+from tests.test_sql_connection_pool import TestSQLConnectionPool
+from tests.services.history_service.test_cached_history_provider import TestCachedHistoryProvider
 
 
 def run_tests():
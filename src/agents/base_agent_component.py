@@ -1,6 +1,8 @@
 """This is the base class for all custom agent components"""
 
 import json
+import threading
+import time
 import traceback
 
 import os
@@ -12,10 +14,33 @@ from solace_ai_connector.common.utils import ensure_slash_on_end
 from ..services.llm_service.components.llm_service_component_base import LLMServiceComponentBase
 from ..common.action_list import ActionList
 from ..common.action_response import ActionResponse, ErrorInfo
-from ..common.constants import ORCHESTRATOR_COMPONENT_NAME
+from ..common.constants import (
+    ORCHESTRATOR_COMPONENT_NAME,
+    AGENT_REGISTRATION_REQUEST_ACTION,
+    ACTION_DEADLINE_USER_PROPERTY,
+)
 from ..services.file_service import FileService
 from ..services.file_service.file_utils import recursive_file_resolver
 from ..services.middleware_service.middleware_service import MiddlewareService
+from ..common.utils import get_summary_hash
+from ..common.action_executor import ActionExecutor, DEFAULT_MAX_QUEUED_ACTIONS
+from ..common.broker_request_multiplexer import BrokerRequestMultiplexer
+from ..common.stats_logger import StatsLogger
+from ..common.action_cache import (
+    DEFAULT_ACTION_CACHE_TTL,
+    create_action_cache,
+    get_action_cache_key,
+    is_cacheable_response,
+)
+
+# Set on each response, so they are not part of a cached response
+ACTION_REQUEST_RESPONSE_FIELDS = [
+    "action_list_id",
+    "action_idx",
+    "action_name",
+    "action_params",
+    "originator",
+]
 
 agent_info = {
     "class_name": "BaseAgentComponent",
@@ -37,6 +62,59 @@ agent_info = {
             "description": "The interval in seconds for agent registration",
             "default": 30,
         },
+        {
+            "name": "full_registration_interval",
+            "required": False,
+            "description": (
+                "The longest time in seconds between full registrations. In between, "
+                "registrations are just a heartbeat unless the agent's summary changes "
+                "or the orchestrator asks for it."
+            ),
+            "default": 600,
+        },
+        {
+            "name": "action_cache",
+            "required": False,
+            "description": (
+                "The cache for the responses of actions that have a 'cache' attribute. "
+                "'type' is 'memory' (the default, an LRU cache of 'max_entries' "
+                "responses) or 'redis' (with redis_host, redis_port and redis_db) to "
+                "share it between agent instances."
+            ),
+            "default": {},
+        },
+        {
+            "name": "max_concurrent_actions",
+            "required": False,
+            "description": (
+                "The number of actions this component instance can run at once. "
+                "Above 1, actions run on a thread pool and their responses are sent "
+                "as they finish. Their requests to the LLM and embedding services run "
+                "concurrently too, which needs the responders to copy the request's "
+                "user properties to their responses, as those services do."
+            ),
+            "default": 1,
+        },
+        {
+            "name": "max_queued_actions",
+            "required": False,
+            "description": (
+                "With max_concurrent_actions above 1, the number of action requests "
+                "that can wait for a thread before no more are taken from the input "
+                "queue."
+            ),
+            "default": DEFAULT_MAX_QUEUED_ACTIONS,
+        },
+        {
+            "name": "skip_expired_actions",
+            "required": False,
+            "description": (
+                "Don't run action requests that are still waiting once their deadline "
+                "has passed, as the orchestrator has already given up on them. This "
+                "relies on the agent's and orchestrator's clocks agreeing."
+            ),
+            "default": True,
+        },
     ],
     "input_schema": {
         "type": "object",
@@ -60,8 +138,38 @@ class BaseAgentComponent(LLMServiceComponentBase, ABC):
     def __init__(self, module_info={}, **kwargs):
         super().__init__(module_info, **kwargs)
         self.kwargs = kwargs
+        self.action_executor = None
+        # The broker request/response controller has one response queue, so the
+        # requests of concurrent actions go through a multiplexer that routes each
+        # response to its request
+        self.broker_request_multiplexer = None
+        max_concurrent_actions = int(self.get_config("max_concurrent_actions", 1))
+        if max_concurrent_actions > 1:
+            self.action_executor = ActionExecutor(
+                max_concurrent_actions,
+                int(self.get_config("max_queued_actions", DEFAULT_MAX_QUEUED_ACTIONS)),
+                name=f"{self.name}_action",
+            )
+            if self.is_broker_request_response_enabled():
+                self.broker_request_multiplexer = BrokerRequestMultiplexer(
+                    self.broker_request_response_controller
+                )
+        self.skip_expired_actions = self.get_config("skip_expired_actions", True)
+        self.skipped_action_count = 0
+        self.skipped_action_lock = threading.Lock()
         self.action_config = kwargs.get("action_config", {})
         self.registration_interval = int(self.get_config("registration_interval", 30))
+        # Hash of the last full registration - while the summary doesn't change
+        # only a heartbeat is sent
+        self.registered_summary_hash = None
+        self.full_registration_interval = int(
+            self.get_config("full_registration_interval", 600)
+        )
+        self.last_full_registration_time = 0
+        # Logged on each registration timer event
+        self.stats_logger = StatsLogger(
+            f"Agent {self.info.get('agent_name')}", self.get_stats
+        )
 
         self.llm_service_topic = self.get_config("llm_service_topic")
         if self.llm_service_topic:
@@ -87,6 +195,15 @@ class BaseAgentComponent(LLMServiceComponentBase, ABC):
             
         self.action_list = self.get_actions_list(agent=self, config_fn=self.get_config)
 
+        # Shared by all the instances of this agent component
+        with self.get_lock("action_cache"):
+            self.action_cache = self.kv_store_get("action_cache")
+            if not self.action_cache:
+                self.action_cache = create_action_cache(
+                    self.get_config("action_cache", {})
+                )
+                self.kv_store_set("action_cache", self.action_cache)
+
     def run(self):
         # This is called when the component is started - we will use this to send the first registration message
         # Only do this for the first of the agent components
@@ -109,10 +226,76 @@ class BaseAgentComponent(LLMServiceComponentBase, ABC):
             "actions": self.get_actions_summary(),
         }
 
+    def get_registration_message(self, full=False):
+        """Get the registration payload - the full summary if it has changed since
+        the last full registration (or if full is set), otherwise a heartbeat"""
+        summary = self.get_agent_summary()
+        summary_hash = get_summary_hash(summary)
+        # A full registration is also sent now and then in case the orchestrator
+        # missed the last one and can't ask for it
+        full = full or (
+            time.time() - self.last_full_registration_time
+            >= self.full_registration_interval
+        )
+        if not full and summary_hash == self.registered_summary_hash:
+            return {
+                "agent_name": summary["agent_name"],
+                "summary_hash": summary_hash,
+                "heartbeat": True,
+            }
+        summary["summary_hash"] = summary_hash
+        return summary
+
+    def get_registration_topic(self):
+        return f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/register/agent/{self.info['agent_name']}"
+
     def invoke(self, message, data):
         """Invoke the component"""
         action_name = data.get("action_name")
+        if action_name == AGENT_REGISTRATION_REQUEST_ACTION:
+            # The orchestrator doesn't have this agent's current summary
+            log.info("Sending full registration as requested by the orchestrator")
+            return {
+                "payload": self.get_registration_message(full=True),
+                "topic": self.get_registration_topic(),
+            }
+        if self.is_expired_action_request(message, data):
+            self.discard_current_message()
+            return None
+        if self.action_executor:
+            # The response is sent from the executor thread once the action is done
+            self.action_executor.submit(self.run_action_in_executor, message, data)
+            return None
+        return self.run_action(message, data)
+
+    def run_action_in_executor(self, message, data):
+        self.current_message = message
+        self.current_request_data = data
+        try:
+            if self.is_expired_action_request(message, data):
+                # It expired while waiting for a thread
+                message.call_acknowledgements()
+                return
+            result = self.run_action(message, data)
+            self.process_post_invoke(result, message)
+        except Exception as e:
+            log.error(
+                "Error running action %s: %s",
+                data.get("action_name"),
+                str(e),
+                exc_info=True,
+            )
+            self.handle_negative_acknowledgements(message, e)
+        finally:
+            self.current_message = None
+            self.current_request_data = None
+
+    def run_action(self, message, data):
+        """Run the requested action and return the action response message"""
+        action_name = data.get("action_name")
         action_response = None
+        action_response_dict = None
+        cache_key = None
         file_service = FileService()
         if not action_name:
             log.error("Action name not provided. Data: %s", json.dumps(data))
@@ -154,7 +337,11 @@ class BaseAgentComponent(LLMServiceComponentBase, ABC):
                         meta = {
                             "session_id": session_id,
                         }
-                        action_response = action.invoke(resolved_params, meta)
+                        cache_key, action_response_dict = self.get_cached_action_response(
+                            action, resolved_params, message.get_user_properties()
+                        )
+                        if action_response_dict is None:
+                            action_response = action.invoke(resolved_params, meta)
                     except Exception as e:
 
                         error_message = (
@@ -182,34 +369,165 @@ class BaseAgentComponent(LLMServiceComponentBase, ABC):
                         message="Unauthorized: You don't have permission to perform this action.",
                     )
 
-        action_response.action_list_id = data.get("action_list_id")
-        action_response.action_idx = data.get("action_idx")
-        action_response.action_name = action_name
-        action_response.action_params = data.get("action_params", {})
-        action_response.originator = data.get("originator", ORCHESTRATOR_COMPONENT_NAME)
-        try:
-            action_response_dict = action_response.to_dict()
-        except Exception as e:
-            log.error(
-                "Error after action %s in converting action response to dict: %s. Data: %s",
-                action_name,
-                str(e),
-                json.dumps(data),
-                exc_info=True,
-            )
+        if action_response_dict is not None:
+            log.debug("Using the cached response for action %s", action_name)
             action_response_dict = {
-                "message": "Internal error: Error converting action response to dict",
+                **action_response_dict,
+                "action_list_id": data.get("action_list_id"),
+                "action_idx": data.get("action_idx"),
+                "action_name": action_name,
+                "action_params": data.get("action_params", {}),
+                "originator": data.get("originator", ORCHESTRATOR_COMPONENT_NAME),
             }
+        else:
+            action_response.action_list_id = data.get("action_list_id")
+            action_response.action_idx = data.get("action_idx")
+            action_response.action_name = action_name
+            action_response.action_params = data.get("action_params", {})
+            action_response.originator = data.get(
+                "originator", ORCHESTRATOR_COMPONENT_NAME
+            )
+            try:
+                action_response_dict = action_response.to_dict()
+                if cache_key and is_cacheable_response(action_response_dict):
+                    self.cache_action_response(
+                        cache_key, action, action_response_dict
+                    )
+            except Exception as e:
+                log.error(
+                    "Error after action %s in converting action response to dict: %s. Data: %s",
+                    action_name,
+                    str(e),
+                    json.dumps(data),
+                    exc_info=True,
+                )
+                action_response_dict = {
+                    "message": "Internal error: Error converting action response to dict",
+                }
 
         # Construct the response topic
         response_topic = f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/actionResponse/agent/{self.info['agent_name']}/{action_name}"
 
         return {"payload": action_response_dict, "topic": response_topic}
 
+    @property
+    def current_message(self):
+        # Each executor thread has its own current message
+        return getattr(self._get_thread_state(), "current_message", None)
+
+    @current_message.setter
+    def current_message(self, message):
+        self._get_thread_state().current_message = message
+
+    @property
+    def current_request_data(self):
+        return getattr(self._get_thread_state(), "current_request_data", None)
+
+    @current_request_data.setter
+    def current_request_data(self, data):
+        self._get_thread_state().current_request_data = data
+
+    def _get_thread_state(self):
+        return self.__dict__.setdefault("_thread_state", threading.local())
+
+    def do_broker_request_response(
+        self, message, stream=False, streaming_complete_expression=None
+    ):
+        if not self.broker_request_multiplexer:
+            return super().do_broker_request_response(
+                message, stream, streaming_complete_expression
+            )
+        if stream:
+            return self.broker_request_multiplexer.request_stream_sync(
+                message, streaming_complete_expression
+            )
+        return self.broker_request_multiplexer.request_sync(message)
+
+    def is_expired_action_request(self, message, data):
+        """Check whether the request's deadline has passed, counting it as skipped
+        if it has"""
+        if not self.skip_expired_actions:
+            return False
+        user_properties = message.get_user_properties() or {}
+        deadline = user_properties.get(ACTION_DEADLINE_USER_PROPERTY)
+        if not deadline:
+            return False
+        overdue = time.time() - float(deadline)
+        if overdue < 0:
+            return False
+        with self.skipped_action_lock:
+            self.skipped_action_count += 1
+        log.warning(
+            "Skipping action %s - its deadline passed %.1f seconds ago",
+            data.get("action_name"),
+            overdue,
+        )
+        return True
+
+    def get_skipped_action_count(self):
+        """The number of action requests that were not run because their deadline
+        had passed"""
+        with self.skipped_action_lock:
+            return self.skipped_action_count
+
+    def get_action_executor_stats(self):
+        """The in-flight and queued action counts, or None if actions are not run
+        concurrently"""
+        if not self.action_executor:
+            return None
+        return self.action_executor.get_stats()
+
+    def get_stats(self):
+        stats = {}
+        if self.skip_expired_actions:
+            stats["skipped_actions"] = self.get_skipped_action_count()
+        action_executor_stats = self.get_action_executor_stats()
+        if action_executor_stats:
+            stats["action_executor"] = action_executor_stats
+        return stats
+
+    def stop_component(self):
+        if self.action_executor:
+            self.action_executor.shutdown(wait=False)
+        if self.broker_request_multiplexer:
+            self.broker_request_multiplexer.stop()
+        super().stop_component()
+
+    def get_cached_action_response(self, action, resolved_params, user_properties):
+        """Get the cache key for the action's response and the cached response
+        if there is one. Both are None if the action isn't cached."""
+        if not action.cache_config:
+            return None, None
+        cache_key = get_action_cache_key(
+            self.info.get("agent_name"),
+            action.name,
+            resolved_params,
+            action.cache_config,
+            user_properties,
+        )
+        if not cache_key:
+            return None, None
+        return cache_key, self.action_cache.get(cache_key)
+
+    def cache_action_response(self, cache_key, action, action_response_dict):
+        response = {
+            key: value
+            for key, value in action_response_dict.items()
+            if key not in ACTION_REQUEST_RESPONSE_FIELDS
+        }
+        self.action_cache.set(
+            cache_key,
+            response,
+            action.cache_config.get("ttl", DEFAULT_ACTION_CACHE_TTL),
+        )
+
     def handle_timer_event(self, timer_data):
         """Handle the timer event for agent registration."""
-        registration_message = self.get_agent_summary()
-        registration_topic = f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/register/agent/{self.info['agent_name']}"
+        registration_message = self.get_registration_message()
+        registration_topic = self.get_registration_topic()
+        if not registration_message.get("heartbeat"):
+            self.registered_summary_hash = registration_message["summary_hash"]
+            self.last_full_registration_time = time.time()
 
         message = Message(
             topic=registration_topic,
@@ -221,6 +539,8 @@ class BaseAgentComponent(LLMServiceComponentBase, ABC):
         )
 
         self.send_message(message)
+        self.stats_logger.log_stats()
 
         # Re-schedule the timer
         self.add_timer(self.registration_interval * 1000, "agent_registration")
+
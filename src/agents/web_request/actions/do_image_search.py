@@ -37,6 +37,8 @@ class DoImageSearch(Action):
                     },
                 ],
                 "required_scopes": ["web_request:do_image_search:read"],
+                # The images are stored in the session's files
+                "cache": {"ttl": 600, "scope": "session"},
             },
             **kwargs,
         )
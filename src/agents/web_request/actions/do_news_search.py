@@ -26,6 +26,7 @@ class DoNewsSearch(Action):
                     },
                 ],
                 "required_scopes": ["web_request:do_news_search:read"],
+                "cache": {"ttl": 300, "scope": "global"},
             },
             **kwargs,
         )
@@ -21,6 +21,7 @@ class DoSuggestionSearch(Action):
                     }
                 ],
                 "required_scopes": ["web_request:do_suggestion_search:read"],
+                "cache": {"ttl": 3600, "scope": "global"},
             },
             **kwargs,
         )
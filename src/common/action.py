@@ -16,6 +16,10 @@ class Action(ABC):
         self._disabled = attributes.get("disabled", False)
         self._examples = attributes.get("examples", [])
         self._required_scopes = attributes.get("required_scopes", [])
+        # Seconds to wait for the action's response before timing it out
+        self._timeout = attributes.get("timeout")
+        # Opts the action into response caching - see action_cache
+        self._cache_config = attributes.get("cache")
         self._config_fn = config_fn
         self.agent = agent
         self.kwargs = kwargs
@@ -36,6 +40,14 @@ class Action(ABC):
     def required_scopes(self):
         return self._required_scopes
 
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def cache_config(self):
+        return self._cache_config
+
     def set_agent(self, agent):
         self.agent = agent
 
@@ -67,6 +79,8 @@ class Action(ABC):
             "examples": self._examples,
             "required_scopes": self._required_scopes,
         }
+        if self._timeout:
+            summary[action_name]["timeout"] = self._timeout
         return summary
 
     def validate_attributes(self, attributes):
@@ -0,0 +1,145 @@
+"""Cache for the responses of actions that always give the same result for the same
+parameters. An action opts in with a 'cache' attribute:
+
+    "cache": {
+        "ttl": 300,               # seconds to keep a response
+        "scope": "session",       # who can share it - global, user or session
+        "vary_by_scopes": True,   # only share it between originators with the same scopes
+    }
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SCOPES = ["global", "user", "session"]
+DEFAULT_ACTION_CACHE_SCOPE = "session"
+DEFAULT_ACTION_CACHE_TTL = 300
+DEFAULT_MAX_ACTION_CACHE_ENTRIES = 1000
+
+# Responses with any of these are about the request rather than the parameters, so
+# they are never cached
+UNCACHEABLE_RESPONSE_FIELDS = [
+    "is_async",
+    "error_info",
+    "clear_history",
+    "agent_state_change",
+    "invoke_model_again",
+    "context_query",
+]
+
+
+def get_action_cache_key(agent_name, action_name, params, cache_config, user_properties):
+    """Get the cache key for an action's response, or None if it can't be cached
+    for this request (e.g. a per-user cache with no identity)"""
+    user_properties = user_properties or {}
+    scope = cache_config.get("scope", DEFAULT_ACTION_CACHE_SCOPE)
+    if scope not in CACHE_SCOPES:
+        raise ValueError(f"Invalid action cache scope '{scope}' for {action_name}")
+    key = {"agent": agent_name, "action": action_name, "params": params}
+    if scope == "user":
+        key["identity"] = user_properties.get("identity")
+        if not key["identity"]:
+            return None
+    elif scope == "session":
+        key["session_id"] = user_properties.get("session_id")
+        if not key["session_id"]:
+            return None
+    if cache_config.get("vary_by_scopes"):
+        key["scopes"] = sorted(user_properties.get("originator_scopes") or [])
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def is_cacheable_response(action_response_dict):
+    return not any(
+        action_response_dict.get(field) for field in UNCACHEABLE_RESPONSE_FIELDS
+    )
+
+
+class MemoryActionCache:
+    """An LRU cache of action responses in memory"""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.max_entries = self.config.get(
+            "max_entries", DEFAULT_MAX_ACTION_CACHE_ENTRIES
+        )
+        # key -> (expire_time, response), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, response, ttl):
+        with self._lock:
+            if self.max_entries <= 0:
+                return
+            self._entries[key] = (time.time() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisActionCache:
+    """Action responses in Redis, shared by all instances of the agents"""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "Please install the redis package to use the RedisActionCache.\n\t$ pip install redis"
+            )
+
+        self.redis_client = redis.Redis(
+            host=self.config.get("redis_host", "localhost"),
+            port=self.config.get("redis_port", 6379),
+            db=self.config.get("redis_db", 0),
+            decode_responses=True,
+        )
+
+    def _get_key(self, key):
+        return f"action_cache:{key}"
+
+    def get(self, key):
+        data = self.redis_client.get(self._get_key(key))
+        return json.loads(data) if data else None
+
+    def set(self, key, response, ttl):
+        self.redis_client.set(
+            self._get_key(key), json.dumps(response, default=str), ex=int(ttl)
+        )
+
+
+def create_action_cache(config=None):
+    """Create the action cache for the config's type ('memory' by default)"""
+    config = config or {}
+    cache_type = config.get("type", "memory")
+    if cache_type == "memory":
+        return MemoryActionCache(config)
+    if cache_type == "redis":
+        return RedisActionCache(config)
+    raise ValueError(
+        f"Unsupported action cache: {cache_type} - must be 'memory' or 'redis'"
+    )
@@ -0,0 +1,59 @@
+"""Bounded thread pool for running an agent's actions concurrently"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_QUEUED_ACTIONS = 100
+
+
+class ActionExecutor:
+    """Runs actions on up to max_workers threads. Once max_queued more are waiting,
+    submit blocks until one finishes, which holds back the component's input queue."""
+
+    def __init__(self, max_workers, max_queued=DEFAULT_MAX_QUEUED_ACTIONS, name="action"):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+
+    def submit(self, fn, *args):
+        self._slots.acquire()
+        with self._lock:
+            self.queued += 1
+        try:
+            return self._executor.submit(self._run, fn, args)
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+
+    def _run(self, fn, args):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "completed": self.completed,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,157 @@
+"""Many concurrent requests through one component's broker request/response
+controller, awaited from an asyncio event loop or made from any number of threads.
+
+The controller has a single response queue, so its own do_broker_request_response
+can only have one request outstanding. The multiplexer tags each request with an id
+in its user properties (the responder must copy the user properties to its
+responses, as the LLM service does) and a reader thread hands each response to the
+request with that id."""
+
+import asyncio
+import queue
+import threading
+import uuid
+from contextlib import aclosing
+
+from solace_ai_connector.common.event import EventType
+from solace_ai_connector.common.log import log
+
+REQUEST_ID_USER_PROPERTY = "multiplexed_request_id"
+
+
+class BrokerRequestMultiplexer:
+    """Sends requests through the controller and routes their responses to the
+    coroutines or threads waiting for them. Nothing else may use the controller while this
+    is running, as the reader thread takes every response off its queue."""
+
+    def __init__(self, controller, loop=None):
+        self.controller = controller
+        # Only needed for the async requests
+        self.loop = loop
+        self.request_expiry_s = controller.request_expiry_s
+        # request id -> function that hands a response message to the request
+        self._requests = {}
+        self._send_lock = threading.Lock()
+        self._stop_signal = threading.Event()
+        self._reader = threading.Thread(
+            target=self._read_responses, name="broker_request_reader", daemon=True
+        )
+        self._reader.start()
+
+    async def request(self, message):
+        """Send the message and return the response message"""
+        async with aclosing(self._do_request(message, False, None)) as responses:
+            async for response, _ in responses:
+                return response
+
+    def request_stream(self, message, streaming_complete_expression):
+        """Send the message and return an async generator of (response, last) for
+        each response message until the expression says the last one has arrived.
+        Close it (e.g. with contextlib.aclosing) if it isn't run to the end."""
+        return self._do_request(message, True, streaming_complete_expression)
+
+    def request_sync(self, message):
+        """Send the message and wait for the response message on this thread"""
+        responses = self._do_request_sync(message, False, None)
+        try:
+            return next(responses)[0]
+        finally:
+            responses.close()
+
+    def request_stream_sync(self, message, streaming_complete_expression):
+        """The same as request_stream, as a generator for a thread to run"""
+        return self._do_request_sync(message, True, streaming_complete_expression)
+
+    async def _do_request(self, message, stream, streaming_complete_expression):
+        responses = asyncio.Queue()
+        request_id = self._send(
+            message,
+            lambda response: self.loop.call_soon_threadsafe(
+                responses.put_nowait, response
+            ),
+            stream,
+            streaming_complete_expression,
+        )
+        try:
+            while True:
+                try:
+                    # Like the controller, the expiry restarts with each response
+                    response = await asyncio.wait_for(
+                        responses.get(), self.request_expiry_s
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError("Timeout waiting for response") from None
+                last = self._is_last(response, stream, streaming_complete_expression)
+                yield response, last
+                if last:
+                    return
+        finally:
+            self._requests.pop(request_id, None)
+
+    def _do_request_sync(self, message, stream, streaming_complete_expression):
+        responses = queue.Queue()
+        request_id = self._send(
+            message, responses.put, stream, streaming_complete_expression
+        )
+        try:
+            while True:
+                try:
+                    response = responses.get(timeout=self.request_expiry_s)
+                except queue.Empty:
+                    raise TimeoutError("Timeout waiting for response") from None
+                last = self._is_last(response, stream, streaming_complete_expression)
+                yield response, last
+                if last:
+                    return
+        finally:
+            self._requests.pop(request_id, None)
+
+    def _send(self, message, deliver, stream, streaming_complete_expression):
+        """Tag the message with a new request id and send it, with its responses
+        going to deliver. Returns the request id."""
+        request_id = str(uuid.uuid4())
+        user_properties = message.get_user_properties()
+        user_properties[REQUEST_ID_USER_PROPERTY] = request_id
+        message.set_user_properties(user_properties)
+
+        self._requests[request_id] = deliver
+        try:
+            with self._send_lock:
+                self.controller.send_message(
+                    message, stream, streaming_complete_expression
+                )
+        except Exception:
+            self._requests.pop(request_id, None)
+            raise
+        return request_id
+
+    @staticmethod
+    def _is_last(response, stream, streaming_complete_expression):
+        if not stream:
+            return True
+        return bool(response.get_data(streaming_complete_expression))
+
+    def get_num_requests(self):
+        return len(self._requests)
+
+    def _read_responses(self):
+        while not self._stop_signal.is_set():
+            try:
+                event = self.controller.response_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if event.event_type != EventType.MESSAGE:
+                continue
+            response = event.data
+            request_id = (response.get_user_properties() or {}).get(
+                REQUEST_ID_USER_PROPERTY
+            )
+            deliver = self._requests.get(request_id)
+            if deliver is None:
+                # The request has timed out or was abandoned
+                log.warning("Dropping response for unknown request %s", request_id)
+                continue
+            deliver(response)
+
+    def stop(self):
+        self._stop_signal.set()
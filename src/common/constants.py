@@ -4,6 +4,13 @@ DEFAULT_IDENTITY_KEY_FIELD = "identity"
 
 ORCHESTRATOR_COMPONENT_NAME = "orchestrator"
 
+# Action name the orchestrator uses to ask an agent for its full registration
+AGENT_REGISTRATION_REQUEST_ACTION = "__agent_registration__"
+
+# User property with the time (epoch seconds) after which the orchestrator no
+# longer waits for an action's response
+ACTION_DEADLINE_USER_PROPERTY = "action_deadline"
+
 HISTORY_MEMORY_ROLE = "history"
 
 HISTORY_ACTION_ROLE = "tool_call"
@@ -1,13 +1,37 @@
 """Manage a MySQL database connection."""
 
+from contextlib import contextmanager
+
 import mysql.connector
+from solace_ai_connector.common.log import log
+
+from .sql_connection_pool import (
+    DEFAULT_POOL_MAX_SIZE,
+    DEFAULT_POOL_MIN_SIZE,
+    get_connection_pool,
+    get_pool_dsn,
+)
+from .sql_transaction import Transaction
+
 
 class MySQLDatabase:
-    def __init__(self, host: str, user: str, password: str, database: str):
+    """Runs queries on connections from the process' pool for the database, so
+    that any number of these objects for the same database share connections."""
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        database: str,
+        pool_min_size: int = DEFAULT_POOL_MIN_SIZE,
+        pool_max_size: int = DEFAULT_POOL_MAX_SIZE,
+    ):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        # A connection held for the cursor() callers, until close()
         self.connection = None
 
         if ":" in self.host:
@@ -15,13 +39,24 @@ class MySQLDatabase:
         else:
             self.port = 3306
 
+        self.pool = get_connection_pool(
+            get_pool_dsn(
+                "mysql", self.user, self.password, self.host, self.port, self.database
+            ),
+            self.connect,
+            self.is_healthy,
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+        )
+
     def cursor(self, **kwargs):
         if self.connection is None:
-            self.connect()
+            self.connection = self.pool.checkout()
         try:
             return self.connection.cursor(**kwargs)
         except mysql.connector.errors.OperationalError:
-            self.connect()
+            self.pool.release(self.connection, broken=True)
+            self.connection = self.pool.checkout()
             return self.connection.cursor(**kwargs)
 
     def connect(self):
@@ -36,5 +71,50 @@ class MySQLDatabase:
             autocommit=True,
         )
 
+    @staticmethod
+    def is_healthy(connection):
+        # Pings the server
+        return connection.is_connected()
+
     def close(self):
-        self.connection.close()
+        if self.connection is not None:
+            self.pool.release(self.connection)
+            self.connection = None
+
+    def execute(self, query, params=None):
+        sanity = 3
+        while True:
+            connection = self.pool.checkout()
+            try:
+                # A buffered cursor holds all of the results, so the connection
+                # can go back to the pool before they are read
+                cursor = connection.cursor(dictionary=True, buffered=True)
+                cursor.execute(query, params)
+                self.pool.release(connection)
+                break
+            except Exception as e:
+                log.error("Database error: %s", e)
+                self.pool.release(connection, broken=not self.pool.check_health(connection))
+                sanity -= 1
+                if sanity == 0:
+                    raise e
+
+        return cursor
+
+    @contextmanager
+    def transaction(self):
+        """Run the queries of the with block on one connection, in a transaction
+        that is committed at the end of the block or rolled back on an error"""
+        connection = self.pool.checkout()
+        try:
+            connection.start_transaction()
+            yield Transaction(connection.cursor(dictionary=True, buffered=True))
+            connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:  # pylint: disable=broad-except
+                pass
+            self.pool.release(connection, broken=not self.pool.check_health(connection))
+            raise
+        self.pool.release(connection)
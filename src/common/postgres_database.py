@@ -1,16 +1,38 @@
 """Manage a PostgreSQL database connection."""
 
+from contextlib import contextmanager
+
 import psycopg2
 import psycopg2.extras
 from solace_ai_connector.common.log import log
 
+from .sql_connection_pool import (
+    DEFAULT_POOL_MAX_SIZE,
+    DEFAULT_POOL_MIN_SIZE,
+    get_connection_pool,
+    get_pool_dsn,
+)
+from .sql_transaction import Transaction
+
 
 class PostgreSQLDatabase:
-    def __init__(self, host: str, user: str, password: str, database: str):
+    """Runs queries on connections from the process' pool for the database, so
+    that any number of these objects for the same database share connections."""
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        database: str,
+        pool_min_size: int = DEFAULT_POOL_MIN_SIZE,
+        pool_max_size: int = DEFAULT_POOL_MAX_SIZE,
+    ):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        # A connection held for the cursor() callers, until close()
         self.connection = None
 
         if ":" in self.host:
@@ -18,17 +40,26 @@ class PostgreSQLDatabase:
         else:
             self.port = 5432
 
+        self.pool = get_connection_pool(
+            get_pool_dsn(
+                "postgresql", self.user, self.password, self.host, self.port, self.database
+            ),
+            self.connect,
+            self.is_healthy,
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+        )
+
     def cursor(self, **kwargs):
-        if self.connection is None or self.connection.closed:
-            self.connect()
-        try:
-            return self.connection.cursor(**kwargs)
-        except Exception:  # pylint: disable=broad-except
-            self.connect()
-            return self.connection.cursor(**kwargs)
+        if self.connection is not None and self.connection.closed:
+            self.pool.release(self.connection, broken=True)
+            self.connection = None
+        if self.connection is None:
+            self.connection = self.pool.checkout()
+        return self.connection.cursor(**kwargs)
 
     def connect(self, auto_commit=True):
-        self.connection = psycopg2.connect(
+        connection = psycopg2.connect(
             host=self.host,
             port=self.port,
             user=self.user,
@@ -36,26 +67,72 @@ class PostgreSQLDatabase:
             database=self.database,
             connect_timeout=10,
         )
-        self.connection.autocommit = auto_commit
+        connection.autocommit = auto_commit
+        return connection
+
+    @staticmethod
+    def is_healthy(connection):
+        if connection.closed:
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
 
     def close(self):
-        self.connection.close()
+        if self.connection is not None:
+            self.pool.release(self.connection)
+            self.connection = None
 
     def execute(self, query, params=None):
         sanity = 3
         while True:
+            connection = self.pool.checkout()
             try:
-                cursor = self.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                # The results are fetched into the cursor, so the connection
+                # can go back to the pool before they are read
+                cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
                 cursor.execute(query, params)
+                self.pool.release(connection)
                 break
             except Exception as e:
                 log.error("Database error: %s", e)
+                self.pool.release(connection, broken=not self.pool.check_health(connection))
                 sanity -= 1
                 if sanity == 0:
                     raise e
 
         return cursor
 
+    @contextmanager
+    def transaction(self):
+        """Run the queries of the with block on one connection, in a transaction
+        that is committed at the end of the block or rolled back on an error"""
+        connection = self.pool.checkout()
+        try:
+            connection.autocommit = False
+            yield Transaction(
+                connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            )
+            connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:  # pylint: disable=broad-except
+                pass
+            self._release_after_transaction(connection, failed=True)
+            raise
+        self._release_after_transaction(connection)
+
+    def _release_after_transaction(self, connection, failed=False):
+        try:
+            connection.autocommit = True
+        except Exception:  # pylint: disable=broad-except
+            self.pool.release(connection, broken=True)
+            return
+        self.pool.release(
+            connection, broken=failed and not self.pool.check_health(connection)
+        )
+
 def get_db_for_action(action_obj, sql_params=None):
     if sql_params:
         sql_host = sql_params.get("sql_host")
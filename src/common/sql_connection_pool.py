@@ -0,0 +1,190 @@
+"""Pools of SQL database connections, shared across the process.
+
+There is one pool per DSN, so every PostgreSQLDatabase or MySQLDatabase for the same
+server, credentials and database - the history provider's and each action's - takes
+its connections from the same pool rather than opening its own."""
+
+import hashlib
+import threading
+import time
+
+from solace_ai_connector.common.log import log
+
+DEFAULT_POOL_MIN_SIZE = 1
+DEFAULT_POOL_MAX_SIZE = 10
+DEFAULT_CHECKOUT_TIMEOUT = 30
+# Connections idle for longer than this are checked before they are handed out
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+# Connections beyond the minimum are closed after being idle for this long
+DEFAULT_MAX_IDLE_TIME = 300
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SQLConnectionPool:
+    """A thread-safe pool of connections made by the connect function.
+    is_healthy(connection) says whether a connection can still be used."""
+
+    def __init__(
+        self,
+        connect,
+        is_healthy,
+        min_size=DEFAULT_POOL_MIN_SIZE,
+        max_size=DEFAULT_POOL_MAX_SIZE,
+        checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT,
+        health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+        max_idle_time=DEFAULT_MAX_IDLE_TIME,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"Invalid connection pool size: min {min_size}, max {max_size}"
+            )
+        self.connect = connect
+        self.is_healthy = is_healthy
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle_time = max_idle_time
+        # (connection, time it was released), most recently used last
+        self._idle = []
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def fill(self):
+        """Open connections until there are min_size. A failure is logged rather than
+        raised, as the connections are also opened as they are needed."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self.connect()
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning("Failed to open a pooled database connection: %s", e)
+                self._remove()
+                return
+            with self._condition:
+                self._idle.append((connection, time.time()))
+                self._condition.notify()
+
+    def checkout(self):
+        """Get a connection for the caller's sole use until it is released"""
+        deadline = time.time() + self.checkout_timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, released_time = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    connection, released_time = None, None
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No database connection free after {self.checkout_timeout} seconds"
+                    )
+                self._condition.wait(remaining)
+
+        if connection is not None and (
+            time.time() - released_time < self.health_check_interval
+            or self.check_health(connection)
+        ):
+            return connection
+        if connection is not None:
+            log.info("Replacing an unhealthy database connection")
+            self._close(connection)
+        try:
+            return self.connect()
+        except Exception:
+            self._remove()
+            raise
+
+    def release(self, connection, broken=False):
+        """Return the connection to the pool, or close it if it is broken"""
+        if broken:
+            self._close(connection)
+            self._remove()
+            return
+        now = time.time()
+        to_close = []
+        with self._condition:
+            self._idle.append((connection, now))
+            # Close the connections beyond the minimum that haven't been used for a while
+            while (
+                len(self._idle) > 1
+                and self._size > self.min_size
+                and now - self._idle[0][1] > self.max_idle_time
+            ):
+                to_close.append(self._idle.pop(0)[0])
+                self._size -= 1
+            self._condition.notify()
+        for idle_connection in to_close:
+            self._close(idle_connection)
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+            }
+
+    def close(self):
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._size -= len(self._idle)
+            self._idle = []
+        for connection in idle:
+            self._close(connection)
+
+    def check_health(self, connection):
+        try:
+            return self.is_healthy(connection)
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+    def _remove(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+
+def get_pool_dsn(scheme, user, password, host, port, database):
+    """The DSN that a pool is shared by. It has a hash of the credentials in place of
+    the password, so that a pool's connections are only used with the password they
+    were opened with."""
+    credentials_hash = hashlib.sha256(f"{user}:{password}".encode("utf-8")).hexdigest()
+    return f"{scheme}://{user}:{credentials_hash[:16]}@{host}:{port}/{database}"
+
+
+def get_connection_pool(dsn, connect, is_healthy, **options):
+    """Get the process' pool for the DSN, creating it with the given connect
+    function and options and filling it to its minimum size if there isn't one yet"""
+    with _pools_lock:
+        pool = _pools.get(dsn)
+        if pool is not None:
+            return pool
+        pool = SQLConnectionPool(connect, is_healthy, **options)
+        _pools[dsn] = pool
+    pool.fill()
+    return pool
+
+
+def close_connection_pools():
+    """Close the idle connections of every pool and forget the pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
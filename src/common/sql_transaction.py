@@ -0,0 +1,13 @@
+"""The cursor of an SQL transaction."""
+
+
+class Transaction:
+    """The cursor of a transaction, with an execute that returns it like the
+    databases' own execute, so that code can run on either"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params=None):
+        self.cursor.execute(query, params)
+        return self.cursor
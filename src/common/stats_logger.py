@@ -0,0 +1,35 @@
+"""Periodic logging of a component's stats"""
+
+import json
+import threading
+import time
+
+from solace_ai_connector.common.log import log
+
+from .time import FIVE_MINUTES
+
+# How often the stats are logged, in seconds
+STATS_LOG_INTERVAL = FIVE_MINUTES
+
+
+class StatsLogger:
+    """Logs the stats returned by get_stats, if there are any, at most once every
+    interval seconds. log_stats is meant to be called from a timer that goes off
+    more often than that."""
+
+    def __init__(self, name, get_stats, interval=STATS_LOG_INTERVAL):
+        self.name = name
+        self.get_stats = get_stats
+        self.interval = interval
+        self.logged_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def log_stats(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self.logged_time < self.interval:
+                return
+            self.logged_time = now
+        stats = self.get_stats()
+        if stats:
+            log.info("%s stats: %s", self.name, json.dumps(stats))
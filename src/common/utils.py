@@ -1,6 +1,9 @@
 """Grab-bag of common utility functions."""
 
 import re
+import copy
+import hashlib
+import json
 import yaml
 import xml.etree.ElementTree as ET
 from solace_ai_connector.common.log import log
@@ -283,23 +286,50 @@ def parse_orchestrator_response(
 
     # Parse out the <reasoning> tag - they are always first, so just do a
     # simple search and remove them from the response
+    response, reasoning_match = extract_reasoning(response, tp)
+    if reasoning_match:
+        parsed_data["reasoning"] = reasoning_match.group(1).strip()
+    elif f"<{tp}reasoning>" in response:
+        parsed_data["errors"].append("Incomplete <reasoning> tag")
+        return parsed_data
+    else:
+        parsed_data["reasoning"] = None
+
+    response, status_updates = extract_status_updates(response, tp)
+
+    # Remove any incomplete status_update tags
+    response = remove_incomplete_status_update(response, tp)
+
+    if status_updates:
+        parsed_data["status_updates"] = status_updates
+
+    # Parse out <file> tags and other elements
+    response_lines = OrchestratorResponseLines(tp)
+    for line in response.split("\n"):
+        response_lines.parse_line(line)
+
+    return response_lines.finish(parsed_data, check_reasoning)
+
+
+def extract_reasoning(response, tp):
+    """Remove all complete <reasoning> blocks from the response and return the
+    remaining text along with the match for the first one (or None)"""
     reasoning_match = re.search(
         "<" + tp + r"reasoning>(.*?)</" + tp + "reasoning>", response, re.DOTALL
     )
     if reasoning_match:
-        parsed_data["reasoning"] = reasoning_match.group(1).strip()
         response = re.sub(
             "<" + tp + r"reasoning>.*?</" + tp + "reasoning>",
             "",
             response,
             flags=re.DOTALL,
         )
-    elif f"<{tp}reasoning>" in response:
-        parsed_data["errors"].append("Incomplete <reasoning> tag")
-        return parsed_data
-    else:
-        parsed_data["reasoning"] = None
+    return response, reasoning_match
+
 
+def extract_status_updates(response, tp):
+    """Remove all complete <status_update> blocks from the response and return the
+    remaining text along with the list of status updates"""
     # Get all the <{tp}status_update> tags
     status_updates = []
     status_matches = re.finditer(
@@ -316,38 +346,68 @@ def parse_orchestrator_response(
         response,
         flags=re.DOTALL,
     )
+    return response, status_updates
 
-    # Remove any incomplete status_update tags
-    response = re.sub(f"<{tp}status_update>.*?($|<)", "", response, flags=re.DOTALL)
 
-    if status_updates:
-        parsed_data["status_updates"] = status_updates
+def remove_incomplete_status_update(response, tp):
+    """Remove a <status_update> tag that has not been closed yet"""
+    return re.sub(f"<{tp}status_update>.*?($|<)", "", response, flags=re.DOTALL)
 
-    # Parse out <file> tags and other elements
-    in_file = False
-    current_file = {}
-    file_content = []
-    current_action = {}
-    in_invoke_action = False
-    current_param_name = None
-    current_param_value = []
-    open_tags = []
-    current_text = []
-    seen_invoke_action = False
 
-    for line in response.split("\n"):
+class OrchestratorResponseLines:
+    """The line by line part of parsing an orchestrator response.
+
+    The parse state is held on the object so that parsing can be resumed as more
+    lines arrive. This is used by parse_orchestrator_response and by the
+    incremental OrchestratorResponseParser.
+    """
+
+    def __init__(self, tp):
+        self.tp = tp
+        self.actions = []
+        self.content = []
+        self.errors = []
+        self.current_subject_starting_id = None
+        self.in_file = False
+        self.current_file = {}
+        self.file_content = []
+        self.file_content_length = 0
+        self.current_action = {}
+        self.in_invoke_action = False
+        self.current_param_name = None
+        self.current_param_value = []
+        self.open_tags = []
+        self.current_text = []
+        self.seen_invoke_action = False
+
+    def copy(self):
+        """Return a copy that can be parsed further without affecting this one"""
+        other = copy.copy(self)
+        other.actions = copy.deepcopy(self.actions)
+        other.content = copy.deepcopy(self.content)
+        other.errors = list(self.errors)
+        other.current_file = dict(self.current_file)
+        other.file_content = list(self.file_content)
+        other.current_action = copy.deepcopy(self.current_action)
+        other.current_param_value = list(self.current_param_value)
+        other.open_tags = list(self.open_tags)
+        other.current_text = list(self.current_text)
+        return other
+
+    def parse_line(self, line):
+        tp = self.tp
 
         if f"<{tp}current_subject" in line:
             id_match = re.search(r'starting_id\s*=\s*[\'"](\w+)[\'"]\s*\/?>', line)
             if id_match:
-                parsed_data["current_subject_starting_id"] = id_match.group(1)
+                self.current_subject_starting_id = id_match.group(1)
 
         elif f"<{tp}file" in line:
-            in_file = True
+            self.in_file = True
             # We can't guarantee the order of the attributes, so we need to parse them separately
             name_match = re.search(r'name\s*=\s*[\'"]([^\'"]+)[\'"]', line)
             mime_type_match = re.search(r'mime_type\s*=\s*[\'"]([^\'"]+)[\'"]', line)
-            current_file = {
+            self.current_file = {
                 "name": name_match.group(1) if name_match else "",
                 "mime_type": mime_type_match.group(1) if mime_type_match else "",
                 "url": "",
@@ -358,44 +418,46 @@ def parse_orchestrator_response(
             if f"</{tp}file>" in line:
                 file_end_index = line.index(f"</{tp}file>")
                 file_line = line[: file_end_index + len(f"</{tp}file>")]
-                file_content = [file_line]
-                current_file = parse_file_content("\n".join(file_content))
-                if not seen_invoke_action:
-                    add_content_entry(parsed_data["content"], "file", current_file)
-                in_file = False
-                current_file = {}
-                file_content = []
+                self.file_content = [file_line]
+                self.current_file = parse_file_content("\n".join(self.file_content))
+                if not self.seen_invoke_action:
+                    add_content_entry(self.content, "file", self.current_file)
+                self.in_file = False
+                self.current_file = {}
+                self.file_content = []
             else:
-                file_content.append(file_line)
+                self.file_content.append(file_line)
+                self.file_content_length = len(file_line)
 
         elif f"</{tp}file>" in line:
-            if in_file:
-                if current_text:
+            if self.in_file:
+                if self.current_text:
                     add_content_entry(
-                        parsed_data["content"], "text", current_text, add_newline=True
+                        self.content, "text", self.current_text, add_newline=True
                     )
-                    current_text = []
+                    self.current_text = []
                 file_end_index = line.index(f"</{tp}file>")
                 file_line = line[: file_end_index + len(f"</{tp}file>")]
-                file_content.append(file_line)
-                current_file = parse_file_content("\n".join(file_content))
-                if not seen_invoke_action:
-                    add_content_entry(parsed_data["content"], "file", current_file)
-                in_file = False
-                current_file = {}
-                file_content = []
+                self.file_content.append(file_line)
+                self.current_file = parse_file_content("\n".join(self.file_content))
+                if not self.seen_invoke_action:
+                    add_content_entry(self.content, "file", self.current_file)
+                self.in_file = False
+                self.current_file = {}
+                self.file_content = []
             else:
-                parsed_data["errors"].append("Unmatched </file> tag")
-        elif in_file:
-            file_content.append(line)
+                self.errors.append("Unmatched </file> tag")
+        elif self.in_file:
+            self.file_content.append(line)
+            self.file_content_length += len(line) + 1
 
         elif f"<{tp}invoke_action" in line:
-            if in_invoke_action:
-                parsed_data["errors"].append("Nested <invoke_action> tags")
-            in_invoke_action = True
-            seen_invoke_action = True
-            open_tags.append("invoke_action")
-            current_action = {
+            if self.in_invoke_action:
+                self.errors.append("Nested <invoke_action> tags")
+            self.in_invoke_action = True
+            self.seen_invoke_action = True
+            self.open_tags.append("invoke_action")
+            self.current_action = {
                 "agent": None,
                 "action": None,
                 "parameters": {},
@@ -404,36 +466,36 @@ def parse_orchestrator_response(
             for attr in ["agent", "action"]:
                 attr_match = re.search(rf'{attr}\s*=\s*[\'"]([_\-\.\w]+)[\'"]', line)
                 if attr_match:
-                    current_action[attr] = attr_match.group(1)
+                    self.current_action[attr] = attr_match.group(1)
 
         elif f"</{tp}invoke_action>" in line:
-            if not in_invoke_action:
-                parsed_data["errors"].append("Unmatched </invoke_action> tag")
+            if not self.in_invoke_action:
+                self.errors.append("Unmatched </invoke_action> tag")
             else:
-                in_invoke_action = False
-                if "invoke_action" in open_tags:
-                    open_tags.remove("invoke_action")
-                if current_param_name:
-                    current_action["parameters"][current_param_name] = "\n".join(
-                        current_param_value
+                self.in_invoke_action = False
+                if "invoke_action" in self.open_tags:
+                    self.open_tags.remove("invoke_action")
+                if self.current_param_name:
+                    self.current_action["parameters"][self.current_param_name] = (
+                        "\n".join(self.current_param_value)
                     )
-                parsed_data["actions"].append(current_action)
-                current_action = {}
-                current_param_name = None
-                current_param_value = []
-
-        elif in_invoke_action and f"<{tp}parameter" in line:
-            if current_param_name:
-                param_value = "\n".join(current_param_value)
-                current_action["parameters"][current_param_name] = (
+                self.actions.append(self.current_action)
+                self.current_action = {}
+                self.current_param_name = None
+                self.current_param_value = []
+
+        elif self.in_invoke_action and f"<{tp}parameter" in line:
+            if self.current_param_name:
+                param_value = "\n".join(self.current_param_value)
+                self.current_action["parameters"][self.current_param_name] = (
                     clean_parameter_value(param_value)
                 )
-                current_param_value = []
+                self.current_param_value = []
 
             param_name_match = re.search(r'name\s*=\s*[\'"](\w+)[\'"]', line)
             if param_name_match:
-                current_param_name = param_name_match.group(1)
-                open_tags.append("parameter")
+                self.current_param_name = param_name_match.group(1)
+                self.open_tags.append("parameter")
 
                 # Handle content on the same line as opening tag
                 content_after_open = re.search(
@@ -442,73 +504,377 @@ def parse_orchestrator_response(
                 if content_after_open:
                     initial_content = content_after_open.group(1)
                     if initial_content:
-                        current_param_value.append(initial_content)
+                        self.current_param_value.append(initial_content)
 
                 # Check if parameter closes on same line
                 if f"</{tp}parameter>" in line:
-                    param_value = "\n".join(current_param_value)
-                    current_action["parameters"][current_param_name] = (
+                    param_value = "\n".join(self.current_param_value)
+                    self.current_action["parameters"][self.current_param_name] = (
                         clean_parameter_value(param_value)
                     )
-                    current_param_name = None
-                    current_param_value = []
+                    self.current_param_name = None
+                    self.current_param_value = []
 
-                    if "parameter" in open_tags:
-                        open_tags.remove("parameter")
+                    if "parameter" in self.open_tags:
+                        self.open_tags.remove("parameter")
                 elif line.endswith("/>"):
-                    current_action["parameters"][current_param_name] = ""
-                    current_param_name = None
-                    if "parameter" in open_tags:
-                        open_tags.remove("parameter")
+                    self.current_action["parameters"][self.current_param_name] = ""
+                    self.current_param_name = None
+                    if "parameter" in self.open_tags:
+                        self.open_tags.remove("parameter")
                 elif not ">" in line:
-                    parsed_data["errors"].append("Incomplete <parameter> tag")
+                    self.errors.append("Incomplete <parameter> tag")
 
-        elif in_invoke_action and current_param_name:
+        elif self.in_invoke_action and self.current_param_name:
             if f"</{tp}parameter>" in line:
                 # Handle content before closing tag on final line
                 content_before_close = re.sub(f"</{tp}parameter>.*", "", line)
                 if content_before_close:
-                    current_param_value.append(content_before_close)
-                param_value = "\n".join(current_param_value)
-                current_action["parameters"][current_param_name] = (
+                    self.current_param_value.append(content_before_close)
+                param_value = "\n".join(self.current_param_value)
+                self.current_action["parameters"][self.current_param_name] = (
                     clean_parameter_value(param_value)
                 )
-                current_param_name = None
-                current_param_value = []
-                if "parameter" in open_tags:
-                    open_tags.remove("parameter")
+                self.current_param_name = None
+                self.current_param_value = []
+                if "parameter" in self.open_tags:
+                    self.open_tags.remove("parameter")
             else:
-                current_param_value.append(line)
+                self.current_param_value.append(line)
 
         else:
             # NOTE that we are intentionally ignoring all output text that occurs
             # after any <invoke_action> tag. It has been told to never do this and
             # if it does, then there is a good chance it is hallucinating responses
-            if not seen_invoke_action:
-                current_text.append(line)
+            if not self.seen_invoke_action:
+                self.current_text.append(line)
+
+    def finish(self, parsed_data, check_reasoning=True):
+        """Close out the parse and fill in parsed_data. This consumes the state."""
+        parsed_data["actions"] = self.actions
+        parsed_data["content"] = self.content
+        parsed_data["errors"].extend(self.errors)
+        parsed_data["current_subject_starting_id"] = self.current_subject_starting_id
+
+        if self.open_tags:
+            parsed_data["errors"].append(
+                f"Unclosed tags: {', '.join(self.open_tags)}"
+            )
 
-    if open_tags:
-        parsed_data["errors"].append(f"Unclosed tags: {', '.join(open_tags)}")
+        if self.in_file and not self.seen_invoke_action:
+            # Add a status update for this
+            parsed_data["status_updates"].append(
+                f"File {self.current_file['name']} loading ({self.file_content_length} characters)..."
+            )
+            parsed_data["send_last_status_update"] = True
+            parsed_data["errors"].append("Unclosed <file> tag")
+
+        if len(self.current_text) > 0:
+            add_content_entry(parsed_data["content"], "text", self.current_text)
+
+        # Final check - if there is no reasoning, then the LLM is not complying with the
+        # request and we should return an error
+        if check_reasoning and not parsed_data["reasoning"]:
+            parsed_data["errors"].append("No <t###_reasoning> tag found")
+            parsed_data["content"] = []
+
+        return parsed_data
+
+
+class OrchestratorResponseParser:
+    """Incremental version of parse_orchestrator_response for streamed responses.
+
+    A streamed response is parsed again every time a new batch arrives. Rather than
+    re-parsing the whole text each time, this parser commits every complete line that
+    is not inside an open <reasoning> or <status_update> block and only has to look
+    at the uncommitted tail on later calls. The result is the same as calling
+    parse_orchestrator_response on the full text received so far.
+    """
+
+    # Enough to hold a partially received tag prefix such as '<t123'
+    TAG_PREFIX_SCAN_TAIL = 32
+
+    def __init__(self, tag_prefix=""):
+        self.tag_prefix = tag_prefix
+        self.chunks = []
+        self.length = 0
+        self.tag_prefix_scan_tail = ""
+        self.reset(tag_prefix)
+
+    def reset(self, tp):
+        """Throw away everything that was committed and start over with the given prefix"""
+        self.tp = tp
+        self.pending = "".join(self.chunks)
+        self.last_angle_bracket = None
+        self.reasoning_match = None
+        self.status_updates = []
+        self.lines = OrchestratorResponseLines(tp)
+
+    def parse(self, response, last_chunk=False, check_reasoning=True):
+        """Parse the full response text received so far. The text must extend
+        the text from the previous call - if it doesn't, parsing starts over."""
+        response = response or ""
+        if len(response) < self.length:
+            self.chunks = []
+            self.length = 0
+            self.tag_prefix_scan_tail = ""
+            self.reset(self.tag_prefix)
+        return self.feed(response[self.length :], last_chunk, check_reasoning)
+
+    def feed(self, chunk, last_chunk=False, check_reasoning=True):
+        """Add newly received text and parse the response received so far"""
+        if chunk:
+            self.chunks.append(chunk)
+            self.length += len(chunk)
+            self.pending += chunk
+            if not self.tp:
+                self.learn_tag_prefix(chunk)
+
+        self.commit_complete_lines()
+
+        parsed_data = {
+            "actions": [],
+            "current_subject_starting_id": None,
+            "errors": [],
+            "reasoning": None,
+            "content": [],
+            "status_updates": list(self.status_updates),
+            "send_last_status_update": False,
+        }
+
+        if not self.length:
+            parsed_data["status_updates"] = []
+            return parsed_data
+
+        tp = self.tp
+        tail = self.pending
+        if not last_chunk:
+            # Same as remove_incomplete_tags_at_end, but only looking at the tail
+            last_index = max(tail.rfind("<"), tail.rfind(">"))
+            last_angle_bracket = (
+                tail[last_index] if last_index != -1 else self.last_angle_bracket
+            )
+            if last_angle_bracket == "<":
+                last_newline = tail.rfind("\n")
+                if last_newline != -1:
+                    tail = tail[:last_newline]
+                elif self.length > len(tail):
+                    # The text ends with a committed line, so the whole tail goes
+                    tail = None
+
+        lines = self.lines.copy()
+        reasoning_match = self.reasoning_match
+        if tail is not None:
+            tail, tail_reasoning_match = extract_reasoning(tail, tp)
+            if not reasoning_match:
+                reasoning_match = tail_reasoning_match
+            if not reasoning_match and f"<{tp}reasoning>" in tail:
+                parsed_data["errors"].append("Incomplete <reasoning> tag")
+                parsed_data["status_updates"] = []
+                return parsed_data
+
+            tail, status_updates = extract_status_updates(tail, tp)
+            tail = remove_incomplete_status_update(tail, tp)
+            parsed_data["status_updates"].extend(status_updates)
+
+            for line in tail.split("\n"):
+                lines.parse_line(line)
+
+        if reasoning_match:
+            parsed_data["reasoning"] = reasoning_match.group(1).strip()
+
+        return lines.finish(parsed_data, check_reasoning)
+
+    def learn_tag_prefix(self, chunk):
+        """Look for the tag prefix in the new text. If it shows up after lines
+        were already committed without it, they are parsed again."""
+        text = self.tag_prefix_scan_tail + chunk
+        match = re.search(r"<(t[\d]+_)", text)
+        if not match:
+            self.tag_prefix_scan_tail = text[-self.TAG_PREFIX_SCAN_TAIL :]
+            return
+        if len(self.pending) < self.length:
+            self.reset(match.group(1))
+        else:
+            self.tp = match.group(1)
+            self.lines.tp = self.tp
+
+    def commit_complete_lines(self):
+        """Parse and commit the complete lines at the start of the pending text
+        that are not inside an unfinished <reasoning> or <status_update> block"""
+        tp = self.tp
+        pending = self.pending
+        end = pending.rfind("\n") + 1
+        for tag in ("reasoning", "status_update"):
+            open_tag = f"<{tp}{tag}>"
+            close_tag = f"</{tp}{tag}>"
+            position = 0
+            while True:
+                start = pending.find(open_tag, position, end)
+                if start == -1:
+                    break
+                close = pending.find(close_tag, start + len(open_tag))
+                if close == -1 or close + len(close_tag) > end:
+                    end = pending.rfind("\n", 0, start) + 1
+                    break
+                position = close + len(close_tag)
+
+        if not end:
+            return
+
+        committed = pending[:end]
+        text, reasoning_match = extract_reasoning(committed, tp)
+        text, status_updates = extract_status_updates(text, tp)
+        if (
+            f"<{tp}reasoning>" in text
+            or f"<{tp}status_update>" in text
+            or not text.endswith("\n")
+        ):
+            # A block that didn't pair up cleanly - leave it for a full parse
+            return
+
+        if not self.reasoning_match:
+            self.reasoning_match = reasoning_match
+        self.status_updates.extend(status_updates)
+        for line in text.split("\n")[:-1]:
+            self.lines.parse_line(line)
+
+        last_index = max(committed.rfind("<"), committed.rfind(">"))
+        if last_index != -1:
+            self.last_angle_bracket = committed[last_index]
+        self.pending = pending[end:]
+
+
+# Orchestrator tags that can safely be given the response's tag prefix if the LLM
+# used the wrong one or left it off
+REPAIRABLE_TAGS = ["reasoning", "invoke_action", "parameter", "status_update"]
+
+
+def fix_tag_prefixes(response, tp):
+    """Give the repairable tags the tag prefix tp where the LLM used another
+    t###_ prefix. Tags without a prefix are only fixed inside an invoke_action,
+    as anywhere else they may be part of the content, such as a code sample."""
+    tags = "|".join(REPAIRABLE_TAGS)
+    response = re.sub(rf"<(/?)t\d+_({tags})\b", rf"<\1{tp}\2", response)
+
+    def fix_unprefixed(match):
+        action = re.sub(rf"<(/?)({tags})\b", rf"<\1{tp}\2", match.group(1))
+        return action + match.group(2)
+
+    return re.sub(
+        rf"(<{re.escape(tp)}invoke_action\b.*?)(</{re.escape(tp)}invoke_action>|$)",
+        fix_unprefixed,
+        response,
+        flags=re.DOTALL,
+    )
+
+
+def repair_orchestrator_response(response, parsed_data, tag_prefix=""):
+    """Try to fix the common, unambiguous formatting mistakes in an orchestrator
+    response so that the LLM doesn't have to be asked again.
 
-    if in_file and not seen_invoke_action:
-        content = "\n".join(file_content)
-        # Add a status update for this
-        parsed_data["status_updates"].append(
-            f"File {current_file['name']} loading ({len(content)} characters)..."
+    Returns (parsed_data, repairs). If the response could be made error free,
+    parsed_data is the result of parsing the repaired response and repairs lists
+    what was fixed. Otherwise the original parsed_data is returned along with an
+    empty list. tag_prefix is the prefix the prompt asked for - without it, the
+    prefix of the first prefixed tag is used."""
+    if not response or not parsed_data.get("errors"):
+        return parsed_data, []
+
+    tp = tag_prefix
+    if not tp:
+        match = re.search(r"<(t[\d]+_)", response)
+        tp = match.group(1) if match else ""
+    if not tp:
+        return parsed_data, []
+
+    repairs = []
+    repaired = response
+    check_reasoning = True
+
+    def parse(text):
+        return parse_orchestrator_response(
+            text, last_chunk=True, tag_prefix=tp, check_reasoning=check_reasoning
         )
-        parsed_data["send_last_status_update"] = True
-        parsed_data["errors"].append("Unclosed <file> tag")
 
-    if len(current_text) > 0:
-        add_content_entry(parsed_data["content"], "text", current_text)
+    fixed = fix_tag_prefixes(repaired, tp)
+    if fixed != repaired:
+        repaired = fixed
+        repairs.append("tag_prefix")
+        result = parse(repaired)
+    else:
+        result = parsed_data
+
+    # A </reasoning> that never came - close it before the next tag
+    if "Incomplete <reasoning> tag" in result["errors"]:
+        fixed = close_reasoning(repaired, tp)
+        if fixed is None:
+            return parsed_data, []
+        repaired = fixed
+        repairs.append("close_reasoning")
+        result = parse(repaired)
+
+    # Stray closing tags for actions that were already closed
+    if "Unmatched </invoke_action> tag" in result["errors"]:
+        repaired = remove_unmatched_invoke_action_ends(repaired, tp)
+        repairs.append("unmatched_invoke_action")
+        result = parse(repaired)
+
+    # Close any action or parameter left open at the end of the response
+    unclosed = [
+        error for error in result["errors"] if error.startswith("Unclosed tags: ")
+    ]
+    if unclosed:
+        open_tags = unclosed[0][len("Unclosed tags: ") :].split(", ")
+        if not set(open_tags) <= {"invoke_action", "parameter"}:
+            return parsed_data, []
+        repaired = repaired.rstrip() + "".join(
+            f"\n</{tp}{tag}>" for tag in reversed(open_tags)
+        )
+        repairs.append("close_tags")
+        result = parse(repaired)
+
+    # The reasoning is only there to help the LLM - actions are still usable
+    # without it as long as they are complete
+    if result["errors"] == ["No <t###_reasoning> tag found"] and result["actions"]:
+        if all(action.get("agent") and action.get("action") for action in result["actions"]):
+            check_reasoning = False
+            repairs.append("missing_reasoning")
+            result = parse(repaired)
+
+    if result["errors"] or not repairs:
+        return parsed_data, []
+    return result, repairs
+
+
+def close_reasoning(response, tp):
+    """Add the missing </reasoning> before the first tag that follows the
+    <reasoning> tag. Returns None if there is no such tag."""
+    start = response.find(f"<{tp}reasoning>")
+    if start == -1:
+        return None
+    next_tag = re.search(rf"^\s*<{tp}(?!reasoning)", response[start:], re.MULTILINE)
+    if not next_tag:
+        return None
+    insert_at = start + next_tag.start()
+    return response[:insert_at].rstrip() + f"\n</{tp}reasoning>\n" + response[insert_at:]
 
-    # Final check - if there is no reasoning, then the LLM is not complying with the
-    # request and we should return an error
-    if check_reasoning and not parsed_data["reasoning"]:
-        parsed_data["errors"].append("No <t###_reasoning> tag found")
-        parsed_data["content"] = []
 
-    return parsed_data
+def remove_unmatched_invoke_action_ends(response, tp):
+    """Remove </invoke_action> tags that don't have an open <invoke_action>"""
+    in_invoke_action = False
+    lines = []
+    for line in response.split("\n"):
+        if f"<{tp}invoke_action" in line:
+            in_invoke_action = True
+        elif f"</{tp}invoke_action>" in line:
+            if not in_invoke_action:
+                line = line.replace(f"</{tp}invoke_action>", "")
+                if not line.strip():
+                    continue
+            in_invoke_action = False
+        lines.append(line)
+    return "\n".join(lines)
 
 
 def strip_text_after_invoke_action(text):
@@ -710,3 +1076,10 @@ def format_agent_response(actions):
     if not found_ai_response:
         return None
     return ai_response, files
+
+
+def get_summary_hash(summary):
+    """A hash of an agent summary that only changes when its content does"""
+    return hashlib.sha256(
+        json.dumps(summary, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
@@ -1,6 +1,7 @@
 from typing import Dict, Any
 import base64
 import json
+from time import time
 from uuid import uuid4
 
 from solace_ai_connector.common.message import Message
@@ -244,6 +245,8 @@ class GatewayInput(GatewayBase):
                 "stimulus_uuid": stimulus_uuid,
                 "user_info": user_info,
                 "identity": identity_value,
+                # For measuring how long the stimulus waits on the orchestrator's queue
+                "stimulus_sent_time": time(),
             }
         )
         copied_data["user_info"] = user_info
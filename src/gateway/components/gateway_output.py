@@ -218,6 +218,8 @@ class GatewayOutput(GatewayBase):
                 keep_depth = clear_history_tuple[1]
                 self.history_instance.clear_history(session_id, keep_depth)
 
+            self.history_instance.flush(session_id)
+
         if files:
             downloaded_files = []
             for file in files:
@@ -6,7 +6,9 @@ does the following things:
 3. As each action response is received, the Action Manager updates the ActionRequestList object.
 4. Once all actions are received, the Action Manager sends the full response to the Orchestrator.
 5. A periodic timer checks to see if any actions should be timed out. The timer is externally
-   managed - this class just has a method to call to check for timeouts.
+   managed - this class just has a method to call to check for timeouts. Each action's
+   deadline is kept in the action request store, ordered by time, so a check only looks
+   at the actions that have expired.
 
 """
 
@@ -16,14 +18,36 @@ from datetime import datetime
 from solace_ai_connector.common.log import log
 from ..common.utils import format_agent_response
 from ..common.constants import ORCHESTRATOR_COMPONENT_NAME
+from .action_request_store import (
+    MemoryActionRequestStore,
+    create_action_request_store,
+)
 
+# The default time to wait for an action's response, in seconds. Actions can set
+# their own with a 'timeout' attribute.
 ACTION_REQUEST_TIMEOUT = 180
+# How long to keep an action request once one of its actions has timed out, in case
+# the timeout responses never make it back
+TIMED_OUT_ACTION_REQUEST_TTL = 60
+PENDING_ACTION_RESPONSE = (
+    "Pending - this result is not available yet. It will be sent in a later "
+    "message when it arrives."
+)
+LATE_RESULTS_NOTE = (
+    "These are the late results for actions that were still pending when the "
+    "earlier results were sent.\n"
+)
+
+# The kinds of deadline
+ACTION_DEADLINE = "action"
+PARTIAL_RESULTS_DEADLINE = "partial_results"
+REMOVE_DEADLINE = "remove"
 
 
 class ActionManager:
     """This class manages all the ActionRequests that are pending"""
 
-    def __new__(cls, kv_store, lock_manager):
+    def __new__(cls, kv_store, lock_manager, config=None):
         lock = lock_manager.get_lock("action_manager")
         with lock:
             instance = kv_store.get("action_manager_instance")
@@ -32,7 +56,10 @@ class ActionManager:
                 kv_store.set("action_manager_instance", instance)
         return instance
 
-    def __init__(self, kv_store, lock_manager):
+    def __init__(self, kv_store, lock_manager, config=None):
+        """config selects where the pending action requests are kept - see
+        action_request_store. Only the first ActionManager created with a
+        config sets it."""
         self.action_requests = {}
         self.lock = lock_manager.get_lock("action_manager")
 
@@ -41,43 +68,112 @@ class ActionManager:
             if not action_requests:
                 action_requests = {}
                 kv_store.set("action_requests", action_requests)
+            # The memory store's deadline heap
+            deadlines = kv_store.get("action_deadlines")
+            if deadlines is None:
+                deadlines = []
+                kv_store.set("action_deadlines", deadlines)
         self.action_requests = action_requests
-
-    def add_action_request(self, action_requestlist, user_properties):
-        """Add an action request to the list"""
+        self.deadlines = deadlines
+        if not hasattr(self, "partial_results_timeouts"):
+            # Unsealed action requests that get partial results once sealed
+            self.partial_results_timeouts = {}
+        if not hasattr(self, "store"):
+            self.store_config = None
+            self.store = MemoryActionRequestStore(
+                self.action_requests, self.lock, self.deadlines
+            )
+        if config and self.store_config is None:
+            self.store = create_action_request_store(
+                config, self.action_requests, self.lock, self.deadlines
+            )
+            self.store_config = config
+
+    def add_action_request(
+        self,
+        action_requestlist,
+        user_properties,
+        sealed=True,
+        partial_results_timeout=None,
+    ):
+        """Add an action request to the list and return its action_list_id.
+
+        If sealed is False, more actions can be added with add_actions and the
+        list can't complete until seal_action_request is called.
+
+        If partial_results_timeout is set and the request is still waiting for some
+        of its actions that many seconds after it is sealed, do_timeout_check
+        returns the results so far so that the model doesn't have to wait."""
         uuid = str(uuid4())
 
         # Add the uuid to each action
         for action in action_requestlist:
             action["action_list_id"] = uuid
+        arl = ActionRequestList(uuid, action_requestlist, user_properties, sealed=sealed)
+        self.store.add(arl)
+        self._add_deadlines(uuid, action_requestlist)
+        if partial_results_timeout:
+            if sealed:
+                self._add_partial_results_deadline(uuid, partial_results_timeout)
+            else:
+                with self.lock:
+                    self.partial_results_timeouts[uuid] = partial_results_timeout
+        return uuid
+
+    def add_actions(self, action_list_id, actions):
+        """Add more actions to an action request that has not been sealed yet.
+        Returns False if the action request is gone."""
+        for action in actions:
+            action["action_list_id"] = action_list_id
+        start_position = self.store.add_actions(action_list_id, actions)
+        if start_position is None:
+            log.error(
+                "Action request %s not found. Maybe it had already timed out",
+                action_list_id,
+            )
+            return False
+        self._add_deadlines(action_list_id, actions, start_position)
+        return True
+
+    def _add_deadlines(self, action_list_id, actions, start_position=0):
+        for position, action in enumerate(actions, start_position):
+            if "response" in action:
+                continue
+            timeout = action.get("timeout") or ACTION_REQUEST_TIMEOUT
+            self.store.add_deadline(timeout, action_list_id, ACTION_DEADLINE, position)
+
+    def _add_partial_results_deadline(self, action_list_id, timeout):
+        self.store.add_deadline(timeout, action_list_id, PARTIAL_RESULTS_DEADLINE)
+
+    def seal_action_request(self, action_list_id):
+        """Mark an action request as having all of its actions. If all the
+        responses have already arrived, the complete action list is returned
+        and the caller is responsible for sending it back to the model."""
         with self.lock:
-            if uuid in self.action_requests:
-                log.error("Action request with UUID %s already exists", uuid)
-
-            arl = ActionRequestList(uuid, action_requestlist, user_properties)
-            self.action_requests[uuid] = arl
+            partial_results_timeout = self.partial_results_timeouts.pop(
+                action_list_id, None
+            )
+        action_list = self.store.seal(action_list_id)
+        if action_list:
+            log.info("Action request %s is complete", action_list_id)
+        elif partial_results_timeout:
+            self._add_partial_results_deadline(action_list_id, partial_results_timeout)
+        return action_list
 
     def delete_action_request(self, action_list_id):
         """Delete an action request from the list"""
-        with self.lock:
-            if action_list_id in self.action_requests:
-                del self.action_requests[action_list_id]
+        self.store.delete(action_list_id)
 
     def get_action_info(self, action_list_id, action_name, action_idx):
         """Get an action request"""
-        with self.lock:
-            action_list = self.action_requests.get(action_list_id)
-            if action_list is None:
-                return None
-
-            action = action_list.get_action(action_name, action_idx)
-            if action is None:
-                return None
-
-        return action
+        action_list = self.store.get(action_list_id)
+        if action_list is None:
+            return None
+        return action_list.get_action(action_name, action_idx)
 
     def add_action_response(self, action_response_obj, response_text_and_files):
-        """Add an action response to the list"""
+        """Add an action response to the list. If the returned action list is
+        complete, the caller is responsible for sending it back to the model."""
         action_list_id = action_response_obj.get("action_list_id")
 
         originator = action_response_obj.get("originator", "unknown")
@@ -89,96 +185,102 @@ class ActionManager:
                 originator, action_list_id
             )
             return None
-            
-        with self.lock:
-            action_list = self.action_requests.get(action_list_id)
-            if action_list is None:
-                log.error(
-                    "Action request %s not found. Maybe it had already timed out",
-                    action_list_id,
-                )
-                return None
-
-            action_list.add_response(action_response_obj, response_text_and_files)
 
+        action_list = self.store.add_response(
+            action_list_id, action_response_obj, response_text_and_files
+        )
+        if action_list is None:
+            log.error(
+                "Action request %s is not waiting for this response. Maybe it had "
+                "already timed out",
+                action_list_id,
+            )
         return action_list
 
     def do_timeout_check(self):
         """Check for any actions that have timed out"""
         events = []
-        with self.lock:
-            action_list_ids = list(self.action_requests.keys())
-            for action_list_id in action_list_ids:
-                action_requestlist = self.action_requests.get(action_list_id)
-                if action_requestlist.has_timed_out():
-                    log.info("Action request %s has timed out", action_list_id)
-                    events.extend(self.do_timeout(action_requestlist, action_list_id))
-        return events
-
-    def do_timeout(self, action_requestlist, action_list_id):
-        """Handle a timeout for a specific action request"""
-        events = action_requestlist.get_action_response_timeout_events()
-        if len(events) == 0:
-            timeout_count = action_requestlist.get_timeout_count()
-            if timeout_count > 10:
-                log.error(
-                    "Action request %s has timed out too many times", action_list_id
+        for action_list_id, kind, position in self.store.take_expired_deadlines():
+            if kind == REMOVE_DEADLINE:
+                if self.store.delete(action_list_id):
+                    log.error(
+                        "Action request %s was not completed after it timed out",
+                        action_list_id,
+                    )
+                continue
+            if kind == PARTIAL_RESULTS_DEADLINE:
+                event = self.get_partial_results_event(action_list_id)
+                if event:
+                    events.append(event)
+                continue
+            # Nothing is returned if the request is complete or the action was answered
+            event = self.store.time_out_action(action_list_id, position)
+            if event:
+                log.info(
+                    "Action %s of action request %s has timed out",
+                    event.get("action_name"),
+                    action_list_id,
+                )
+                events.append(event)
+                self.store.add_deadline(
+                    TIMED_OUT_ACTION_REQUEST_TTL, action_list_id, REMOVE_DEADLINE
                 )
-                del self.action_requests[action_list_id]
-            else:
-                action_requestlist.increment_timeout_count()
         return events
 
+    def get_partial_results_event(self, action_list_id):
+        """If the action request has some but not all of its responses, mark those
+        as sent and return an event with them for the model"""
+        action_list = self.store.take_partial_results(action_list_id)
+        if action_list is None:
+            return None
+        log.info("Sending the partial results of action request %s", action_list_id)
+        response_text, files = action_list.format_partial_ai_response()
+        return {
+            "partial_results": True,
+            "action_list_id": action_list_id,
+            "text": response_text,
+            "files": files,
+            "user_properties": action_list.get_user_properties(),
+        }
+
 
 class ActionRequestList:
     """This class holds the list of actions to be executed for a single LLM response"""
 
-    def __init__(self, action_list_id, actions, user_properties):
+    def __init__(self, action_list_id, actions, user_properties, sealed=True):
         self.action_list_id = action_list_id
         self.actions = actions
         self.user_properties = user_properties
-        self.num_pending_actions = len(actions)
+        self.sealed = sealed
+        # Actions can arrive with a response already (e.g. an error found while creating them)
+        self.num_pending_actions = len(
+            [action for action in actions if "response" not in action]
+        )
         self.create_time = datetime.now()
-        self.timeout_count = 0
         self.responses = {}
-
-    def has_timed_out(self):
-        """Check if the action request has timed out"""
-        return (
-            datetime.now() - self.create_time
-        ).total_seconds() > ACTION_REQUEST_TIMEOUT
-
-    def get_timeout_count(self):
-        """Get the number of times this action request has timed out"""
-        return self.timeout_count
-
-    def increment_timeout_count(self):
-        """Increment the number of times this action request has timed out"""
-        self.timeout_count += 1
+        # Set once the responses so far have been sent to the model - the actions
+        # whose responses were sent are marked as 'reported'
+        self.partial_results_sent = False
 
     def get_user_properties(self):
         """Get the user properties"""
         return self.user_properties
 
-    def get_action_response_timeout_events(self):
-        """Go through all the action requests and return a timeout event
-        for each one that does not yet have a response"""
-        timeout_events = []
-        for action in self.actions:
-            if "response" not in action:
-                timeout_events.append(
-                    {
-                        "message": "Action response timed out",
-                        "action_list_id": self.action_list_id,
-                        "action_idx": action.get("action_idx"),
-                        "action_name": action.get("action_name"),
-                        "user_properties": self.user_properties,
-                    }
-                )
-            action["response"] = {"text": "Action response timed out"}
-            action["timed_out"] = True
-
-        return timeout_events
+    def get_action_timeout_event(self, position):
+        """Time out the action at the position in the list and return its timeout
+        event, or None if it already has a response"""
+        action = self.actions[position]
+        if "response" in action:
+            return None
+        action["response"] = {"text": "Action response timed out"}
+        action["timed_out"] = True
+        return {
+            "message": "Action response timed out",
+            "action_list_id": self.action_list_id,
+            "action_idx": action.get("action_idx"),
+            "action_name": action.get("action_name"),
+            "user_properties": self.user_properties,
+        }
 
     def get_action(self, action_name, action_idx):
         """Get the action with the specified name and index"""
@@ -211,6 +313,8 @@ class ActionRequestList:
         action_name = action_response_obj.get("action_name")
 
         action = self.get_action(action_name, action_idx)
+        if action is None:
+            return False
 
         if "response" in action and not action.get("timed_out"):
             log.error("Action Response already has a response")
@@ -224,14 +328,65 @@ class ActionRequestList:
 
         return False
 
+    def add_actions(self, actions):
+        """Add actions to a list that is not sealed yet"""
+        if self.sealed:
+            log.error(
+                "Can't add actions to sealed action request %s", self.action_list_id
+            )
+            return
+        self.actions.extend(actions)
+        self.num_pending_actions += len(
+            [action for action in actions if "response" not in action]
+        )
+
+    def seal(self):
+        """No more actions will be added to this list"""
+        self.sealed = True
+
     def is_complete(self):
         """Check if all actions have been completed"""
-        return self.num_pending_actions == 0
+        return self.sealed and self.num_pending_actions == 0
 
     def get_responses(self):
         """Get all the responses"""
         return self.actions
 
+    def take_partial_results(self):
+        """If some but not all of the actions have responses, mark those as
+        reported and return True. This is only done once per list."""
+        if not self.sealed or self.partial_results_sent:
+            return False
+        answered = [action for action in self.actions if "response" in action]
+        if not answered or len(answered) == len(self.actions):
+            return False
+        for action in answered:
+            action["reported"] = True
+        self.partial_results_sent = True
+        return True
+
+    def format_partial_ai_response(self):
+        """Format the responses so far for the AI, with the missing ones as pending"""
+        return format_agent_response(
+            [
+                (
+                    action
+                    if "response" in action
+                    else {**action, "response": {"text": PENDING_ACTION_RESPONSE}}
+                )
+                for action in self.actions
+            ]
+        )
+
     def format_ai_response(self):
-        """Format the action response for the AI"""
-        return format_agent_response(self.actions)
+        """Format the action response for the AI. If partial results were already
+        sent, only the late ones are included."""
+        if not self.partial_results_sent:
+            return format_agent_response(self.actions)
+        result = format_agent_response(
+            [action for action in self.actions if not action.get("reported")]
+        )
+        if result is None:
+            return None
+        response_text, files = result
+        return LATE_RESULTS_NOTE + response_text, files
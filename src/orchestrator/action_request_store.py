@@ -0,0 +1,435 @@
+"""Stores for the action requests that the ActionManager is waiting on, and for
+the deadlines of their actions.
+
+The memory store keeps them in the flow's kv store, so the responses must come back
+to the same orchestrator process. The redis store shares them between orchestrators,
+so any of them can take an action response and, if it is the last one, reinvoke the
+model. Recording a response and checking whether the request is complete is atomic,
+so only one orchestrator sees each request complete. The deadlines are shared too,
+so any orchestrator times out the actions of one that has gone away.
+"""
+
+import heapq
+import itertools
+import json
+import time
+
+from solace_ai_connector.common.log import log
+
+from ..common.time import ONE_HOUR
+
+ACTION_REQUEST_STORES = ["memory", "redis"]
+# The sorted set of the deadlines of all the orchestrators' action requests
+DEADLINES_KEY = "action_request_deadlines"
+ACTION_TIMED_OUT_RESPONSE = {"text": "Action response timed out"}
+
+
+class MemoryActionRequestStore:
+    """Keeps the ActionRequestLists in a dict and their deadlines in a heap, both
+    shared through the flow's kv store"""
+
+    def __init__(self, action_requests, lock, deadlines=None):
+        self.action_requests = action_requests
+        self.lock = lock
+        # (deadline, sequence, action_list_id, kind, action position), ordered by
+        # deadline
+        self.deadlines = [] if deadlines is None else deadlines
+        # Keeps entries with the same deadline in the order they were added
+        self.deadline_sequence = itertools.count()
+
+    def add_deadline(self, timeout, action_list_id, kind, position=None):
+        """Add a deadline timeout seconds from now"""
+        with self.lock:
+            heapq.heappush(
+                self.deadlines,
+                (
+                    time.monotonic() + timeout,
+                    next(self.deadline_sequence),
+                    action_list_id,
+                    kind,
+                    position,
+                ),
+            )
+
+    def take_expired_deadlines(self):
+        """Remove the deadlines that have passed and return them as
+        (action_list_id, kind, position), earliest first"""
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, _, action_list_id, kind, position = heapq.heappop(self.deadlines)
+                expired.append((action_list_id, kind, position))
+        return expired
+
+    def add(self, action_list):
+        with self.lock:
+            if action_list.action_list_id in self.action_requests:
+                log.error(
+                    "Action request with UUID %s already exists",
+                    action_list.action_list_id,
+                )
+            self.action_requests[action_list.action_list_id] = action_list
+
+    def get(self, action_list_id):
+        with self.lock:
+            return self.action_requests.get(action_list_id)
+
+    def delete(self, action_list_id):
+        """Delete the action request - returns True if it was there"""
+        with self.lock:
+            return self.action_requests.pop(action_list_id, None) is not None
+
+    def add_actions(self, action_list_id, actions):
+        """Add actions to an unsealed request - returns the position of the first
+        one, or None if the request is gone"""
+        with self.lock:
+            action_list = self.action_requests.get(action_list_id)
+            if action_list is None:
+                return None
+            start_position = len(action_list.actions)
+            action_list.add_actions(actions)
+            return start_position
+
+    def seal(self, action_list_id):
+        """Seal the request and return it if it is now complete"""
+        with self.lock:
+            action_list = self.action_requests.get(action_list_id)
+            if action_list is None:
+                return None
+            action_list.seal()
+            if action_list.is_complete():
+                return action_list
+        return None
+
+    def add_response(self, action_list_id, action_response_obj, response_text_and_files):
+        """Record an action's response and return the request, or None if it is gone"""
+        with self.lock:
+            action_list = self.action_requests.get(action_list_id)
+            if action_list is None:
+                return None
+            action_list.add_response(action_response_obj, response_text_and_files)
+            return action_list
+
+    def take_partial_results(self, action_list_id):
+        """Mark the responses so far as reported and return the request, if it has
+        some but not all of them"""
+        with self.lock:
+            action_list = self.action_requests.get(action_list_id)
+            if action_list is None or not action_list.take_partial_results():
+                return None
+            return action_list
+
+    def time_out_action(self, action_list_id, position):
+        """Time out the action if it has no response yet and return its timeout event"""
+        with self.lock:
+            action_list = self.action_requests.get(action_list_id)
+            if action_list is None:
+                return None
+            return action_list.get_action_timeout_event(position)
+
+
+# Record an action's response. Returns {status, fields} where status is -1 if the
+# request is gone, -2 if the action doesn't match, -3 if it already had a response,
+# 1 if this response completed the request and 0 otherwise.
+ADD_RESPONSE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return {-1, {}} end
+local position = ARGV[1]
+if redis.call('HGET', KEYS[1], 'name:' .. position) ~= ARGV[2] then return {-2, {}} end
+if redis.call('HGET', KEYS[1], 'state:' .. position) == 'responded' then return {-3, {}} end
+redis.call('HSET', KEYS[1], 'response:' .. position, ARGV[3], 'state:' .. position, 'responded')
+local status = 0
+if redis.call('HINCRBY', KEYS[1], 'pending', -1) <= 0
+    and redis.call('HGET', KEYS[1], 'sealed') == '1'
+    and redis.call('HSETNX', KEYS[1], 'completed', '1') == 1 then
+    status = 1
+end
+return {status, redis.call('HGETALL', KEYS[1])}
+"""
+
+# Seal a request. Returns {status, fields} where status is 1 if the request is now
+# complete and 0 otherwise.
+SEAL_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return {0, {}} end
+redis.call('HSET', KEYS[1], 'sealed', '1')
+if tonumber(redis.call('HGET', KEYS[1], 'pending')) <= 0
+    and redis.call('HSETNX', KEYS[1], 'completed', '1') == 1 then
+    return {1, redis.call('HGETALL', KEYS[1])}
+end
+return {0, {}}
+"""
+
+# Add actions to a request. ARGV is the number of pending actions followed by
+# (name, action, state, response) for each action. Returns the position of the
+# first action, or -1 if the request is gone.
+ADD_ACTIONS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+local start = tonumber(redis.call('HGET', KEYS[1], 'num_actions'))
+local position = start
+for i = 2, #ARGV, 4 do
+    redis.call('HSET', KEYS[1], 'name:' .. position, ARGV[i], 'action:' .. position, ARGV[i + 1],
+        'state:' .. position, ARGV[i + 2])
+    if ARGV[i + 3] ~= '' then
+        redis.call('HSET', KEYS[1], 'response:' .. position, ARGV[i + 3])
+    end
+    position = position + 1
+end
+redis.call('HSET', KEYS[1], 'num_actions', position)
+redis.call('HINCRBY', KEYS[1], 'pending', ARGV[1])
+return start
+"""
+
+# Time out an action that has no response yet. Returns {user_properties, action}
+# or nil if it has already been answered.
+TIME_OUT_ACTION_SCRIPT = """
+local position = ARGV[1]
+if redis.call('HGET', KEYS[1], 'state:' .. position) ~= 'pending' then return nil end
+redis.call('HSET', KEYS[1], 'state:' .. position, 'timed_out', 'response:' .. position, ARGV[2])
+return {redis.call('HGET', KEYS[1], 'user_properties'), redis.call('HGET', KEYS[1], 'action:' .. position)}
+"""
+
+# Mark the responses so far as reported, once, if the request is sealed and has
+# some but not all of them. Returns its fields or nil.
+TAKE_PARTIAL_RESULTS_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'sealed') ~= '1' or redis.call('HEXISTS', KEYS[1], 'completed') == 1
+    or redis.call('HEXISTS', KEYS[1], 'partial_results_sent') == 1 then
+    return nil
+end
+local num_actions = tonumber(redis.call('HGET', KEYS[1], 'num_actions'))
+local answered = {}
+for position = 0, num_actions - 1 do
+    if redis.call('HGET', KEYS[1], 'state:' .. position) ~= 'pending' then
+        table.insert(answered, position)
+    end
+end
+if #answered == 0 or #answered == num_actions then return nil end
+for _, position in ipairs(answered) do
+    redis.call('HSET', KEYS[1], 'reported:' .. position, '1')
+end
+redis.call('HSET', KEYS[1], 'partial_results_sent', '1')
+return redis.call('HGETALL', KEYS[1])
+"""
+
+
+class RedisActionRequestStore:
+    """Keeps the action requests in Redis hashes, one per request. Requests that are
+    never completed are removed by Redis after time_to_live seconds.
+
+    The deadlines are in a sorted set scored by their time, which every orchestrator
+    polls. Whichever removes an expired deadline from the set handles it, and the
+    scripts that act on it do nothing if it has already been handled. The times are
+    wall clock times, so the orchestrators' clocks must roughly agree."""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "Please install the redis package to use the RedisActionRequestStore.\n\t$ pip install redis"
+            )
+
+        self.time_to_live = int(self.config.get("time_to_live", ONE_HOUR))
+        self.redis_client = redis.Redis(
+            host=self.config.get("redis_host", "localhost"),
+            port=self.config.get("redis_port", 6379),
+            db=self.config.get("redis_db", 0),
+            decode_responses=True,
+        )
+        self.add_response_script = self.redis_client.register_script(
+            ADD_RESPONSE_SCRIPT
+        )
+        self.seal_script = self.redis_client.register_script(SEAL_SCRIPT)
+        self.add_actions_script = self.redis_client.register_script(
+            ADD_ACTIONS_SCRIPT
+        )
+        self.time_out_action_script = self.redis_client.register_script(
+            TIME_OUT_ACTION_SCRIPT
+        )
+        self.take_partial_results_script = self.redis_client.register_script(
+            TAKE_PARTIAL_RESULTS_SCRIPT
+        )
+
+    def _get_key(self, action_list_id):
+        return f"action_requests:{action_list_id}"
+
+    def add_deadline(self, timeout, action_list_id, kind, position=None):
+        """Add a deadline timeout seconds from now"""
+        self.redis_client.zadd(
+            DEADLINES_KEY,
+            {json.dumps([action_list_id, kind, position]): time.time() + timeout},
+        )
+
+    def take_expired_deadlines(self):
+        """Claim the deadlines that have passed and return them as
+        (action_list_id, kind, position), earliest first. Each is only returned
+        to one orchestrator."""
+        expired = self.redis_client.zrangebyscore(DEADLINES_KEY, "-inf", time.time())
+        if not expired:
+            return []
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for member in expired:
+            pipeline.zrem(DEADLINES_KEY, member)
+        claimed = pipeline.execute()
+        return [
+            tuple(json.loads(member))
+            for member, removed in zip(expired, claimed)
+            if removed
+        ]
+
+    def _get_action_args(self, actions):
+        args = []
+        num_pending = 0
+        for action in actions:
+            action = dict(action)
+            response = action.pop("response", None)
+            if response is None:
+                num_pending += 1
+            args.extend(
+                [
+                    action.get("action_name") or "",
+                    json.dumps(action, default=str),
+                    "pending" if response is None else "responded",
+                    "" if response is None else json.dumps(response, default=str),
+                ]
+            )
+        return num_pending, args
+
+    def _to_action_list(self, action_list_id, fields):
+        """Build an ActionRequestList from the request's hash fields"""
+        from .action_manager import ActionRequestList
+
+        if not fields:
+            return None
+        actions = []
+        for position in range(int(fields.get("num_actions", 0))):
+            action = json.loads(fields[f"action:{position}"])
+            if f"response:{position}" in fields:
+                action["response"] = json.loads(fields[f"response:{position}"])
+            if fields.get(f"state:{position}") == "timed_out":
+                action["timed_out"] = True
+            if fields.get(f"reported:{position}"):
+                action["reported"] = True
+            actions.append(action)
+        action_list = ActionRequestList(
+            action_list_id,
+            actions,
+            json.loads(fields.get("user_properties") or "null"),
+            sealed=fields.get("sealed") == "1",
+        )
+        action_list.num_pending_actions = int(fields.get("pending", 0))
+        action_list.partial_results_sent = "partial_results_sent" in fields
+        return action_list
+
+    def add(self, action_list):
+        key = self._get_key(action_list.action_list_id)
+        num_pending, args = self._get_action_args(action_list.actions)
+        fields = {
+            "user_properties": json.dumps(action_list.user_properties, default=str),
+            "sealed": "1" if action_list.sealed else "0",
+            "pending": 0,
+            "num_actions": 0,
+        }
+        pipeline = self.redis_client.pipeline()
+        pipeline.hset(key, mapping=fields)
+        pipeline.expire(key, self.time_to_live)
+        pipeline.execute()
+        self.add_actions_script(keys=[key], args=[num_pending] + args)
+
+    def get(self, action_list_id):
+        return self._to_action_list(
+            action_list_id, self.redis_client.hgetall(self._get_key(action_list_id))
+        )
+
+    def delete(self, action_list_id):
+        return self.redis_client.delete(self._get_key(action_list_id)) > 0
+
+    def add_actions(self, action_list_id, actions):
+        num_pending, args = self._get_action_args(actions)
+        start_position = self.add_actions_script(
+            keys=[self._get_key(action_list_id)], args=[num_pending] + args
+        )
+        return None if start_position < 0 else start_position
+
+    def seal(self, action_list_id):
+        status, values = self.seal_script(keys=[self._get_key(action_list_id)])
+        if status != 1:
+            return None
+        return self._to_action_list(action_list_id, get_script_fields(values))
+
+    def add_response(self, action_list_id, action_response_obj, response_text_and_files):
+        action_idx = action_response_obj.get("action_idx")
+        if not isinstance(action_idx, int) or action_idx < 0:
+            log.error(
+                "Action Response for %s in request %s has an invalid action_idx: %s",
+                action_response_obj.get("action_name"),
+                action_list_id,
+                action_idx,
+            )
+            return None
+        status, values = self.add_response_script(
+            keys=[self._get_key(action_list_id)],
+            args=[
+                action_idx,
+                action_response_obj.get("action_name"),
+                json.dumps(response_text_and_files, default=str),
+            ],
+        )
+        if status == -1:
+            return None
+        if status == -2:
+            log.error(
+                "Action Response for %s does not match an action in request %s",
+                action_response_obj.get("action_name"),
+                action_list_id,
+            )
+            return None
+        if status == -3:
+            log.error("Action Response already has a response")
+            return None
+        action_list = self._to_action_list(action_list_id, get_script_fields(values))
+        if status == 0 and action_list.is_complete():
+            # Another orchestrator has already completed it
+            return None
+        return action_list
+
+    def take_partial_results(self, action_list_id):
+        values = self.take_partial_results_script(keys=[self._get_key(action_list_id)])
+        if not values:
+            return None
+        return self._to_action_list(action_list_id, get_script_fields(values))
+
+    def time_out_action(self, action_list_id, position):
+        result = self.time_out_action_script(
+            keys=[self._get_key(action_list_id)],
+            args=[position, json.dumps(ACTION_TIMED_OUT_RESPONSE)],
+        )
+        if not result:
+            return None
+        user_properties, action = result
+        action = json.loads(action)
+        return {
+            "message": ACTION_TIMED_OUT_RESPONSE["text"],
+            "action_list_id": action_list_id,
+            "action_idx": action.get("action_idx"),
+            "action_name": action.get("action_name"),
+            "user_properties": json.loads(user_properties or "null"),
+        }
+
+
+def get_script_fields(values):
+    """Turn the flat [field, value, ...] list that HGETALL gives scripts into a dict"""
+    return dict(zip(values[::2], values[1::2]))
+
+
+def create_action_request_store(config, action_requests, lock, deadlines=None):
+    """Create the action request store for the config's type ('memory' by default).
+    The memory store uses the given dict and deadline heap."""
+    store_type = (config or {}).get("type", "memory")
+    if store_type == "memory":
+        return MemoryActionRequestStore(action_requests, lock, deadlines)
+    if store_type == "redis":
+        return RedisActionRequestStore(config)
+    raise ValueError(
+        f"Unsupported action request store: {store_type} - must be one of {ACTION_REQUEST_STORES}"
+    )
@@ -1,6 +1,7 @@
 """This is a custom component that handles the action_manager timer going off"""
 
 import os
+from time import time
 
 from solace_ai_connector.components.component_base import ComponentBase
 
@@ -33,10 +34,14 @@ class OrchestratorActionManagerTimeoutComponent(ComponentBase):
         # Also check on agents
         orchestrator_state = self.kv_store_get("orchestrator_state")
         orchestrator_state.age_out_agents()
+        orchestrator_state.stats_logger.log_stats()
 
         # Now turn these into messages
         messages = []
         for event in timeout_events:
+            if event.get("partial_results"):
+                messages.append(self.create_partial_results_message(event))
+                continue
             action_name = event.get("action_name")
             if action_name is None:
                 log.error("Action name not found in event")
@@ -56,3 +61,20 @@ class OrchestratorActionManagerTimeoutComponent(ComponentBase):
             messages.append(new_message)
 
         return messages
+
+    def create_partial_results_message(self, event):
+        """Send the results that have arrived so far back to the model"""
+        user_properties = event.get("user_properties") or {}
+        user_properties["stimulus_sent_time"] = time()
+        return {
+            "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/stimulus/orchestrator/reinvokeModel",
+            "payload": {
+                "text": event.get("text"),
+                "files": event.get("files"),
+                "identity": user_properties.get("identity"),
+                "channel": user_properties.get("channel"),
+                "thread_ts": user_properties.get("thread_ts"),
+                "action_response_reinvoke": True,
+            },
+            "user_properties": user_properties,
+        }
@@ -10,6 +10,7 @@ from solace_ai_connector.common.event import Event, EventType
 from ...orchestrator.orchestrator_main import OrchestratorState
 from ...orchestrator.orchestrator_prompt import BasicRagPrompt, ContextQueryPrompt
 from ..action_manager import ActionManager
+from ...common.constants import ACTION_DEADLINE_USER_PROPERTY
 
 info = {
     "class_name": "OrchestratorActionResponseComponent",
@@ -54,6 +55,8 @@ class OrchestratorActionResponseComponent(ComponentBase):
 
         user_properties = message.get_user_properties()
         user_properties['timestamp_start'] = time()
+        # The deadline was for the action - it must not go on to the reinvoke
+        user_properties.pop(ACTION_DEADLINE_USER_PROPERTY, None)
         message.set_user_properties(user_properties)
 
         if not data:
@@ -175,5 +178,8 @@ class OrchestratorActionResponseComponent(ComponentBase):
         user_properties = message.get_user_properties()
         user_properties['timestamp_end'] = time()
         message.set_user_properties(user_properties)
+        # The events are all reinvoke stimuli, which are sent now
+        for event in events:
+            event["user_properties"] = {"stimulus_sent_time": user_properties['timestamp_end']}
 
         return events
@@ -1,8 +1,14 @@
 """This is a custom component that handles registrations from the distributed agents"""
 
-# from solace_ai_connector.common.log import log
+import os
+
+from solace_ai_connector.common.log import log
 from solace_ai_connector.components.component_base import ComponentBase
 from solace_ai_connector.common.message import Message
+from ...common.constants import (
+    ORCHESTRATOR_COMPONENT_NAME,
+    AGENT_REGISTRATION_REQUEST_ACTION,
+)
 from ...orchestrator.orchestrator_main import OrchestratorState
 
 info = {
@@ -15,6 +21,35 @@ info = {
             "description": "The time-to-live for agent registrations in milliseconds. There must be a registration from an agent within this time period, otherwise the agent will be considered offline.",
             "default": 60000,
         },
+        {
+            "name": "registry_snapshot",
+            "required": False,
+            "description": (
+                "Where to save the registered agents so that they are known straight "
+                "away after a restart: 'type' is 'file' (with 'path') or 'redis' "
+                "(with redis_host, redis_port, redis_db and optionally 'key'). Not "
+                "saved if empty."
+            ),
+            "default": {},
+        },
+        {
+            "name": "provisional_agent_ttl_ms",
+            "required": False,
+            "description": (
+                "How long the agents loaded from the registry snapshot are kept "
+                "without registering again, in milliseconds."
+            ),
+            "default": 15000,
+        },
+        {
+            "name": "request_registrations_on_start",
+            "required": False,
+            "description": (
+                "Ask all the agents to register again when the orchestrator starts, "
+                "rather than waiting for their next registration."
+            ),
+            "default": True,
+        },
     ],
     "input_schema": {
         "type": "object",
@@ -27,6 +62,17 @@ info = {
                 "type": "string",
                 "description": "A description of the application.",
             },
+            "summary_hash": {
+                "type": "string",
+                "description": "A hash of the agent's summary. It only changes when the summary does.",
+            },
+            "heartbeat": {
+                "type": "boolean",
+                "description": (
+                    "If true, this is just a heartbeat with the agent_name and "
+                    "summary_hash - the rest of the summary is left out."
+                ),
+            },
             "actions": {
                 "type": "array",
                 "description": "A list of actions the application can perform.",
@@ -79,12 +125,24 @@ info = {
                                 "description": "A required scope for the action.",
                             },
                         },
+                        "timeout": {
+                            "type": "number",
+                            "description": "Seconds to wait for the action's response before timing it out.",
+                        },
                     },
                     "required": ["name", "description", "params"],
                 },
             },
         },
-        "required": ["agent_name", "description", "actions"],
+        "required": ["agent_name"],
+    },
+    "output_schema": {
+        "type": "object",
+        "description": "A request for an agent's full registration",
+        "properties": {
+            "topic": {"type": "string"},
+            "payload": {"type": "object"},
+        },
     },
 }
 
@@ -99,9 +157,60 @@ class OrchestratorRegister(ComponentBase):
             if not self.orchestrator_state:
                 self.orchestrator_state = OrchestratorState()
                 self.kv_store_set("orchestrator_state", self.orchestrator_state)
+        self.orchestrator_state.configure_registry_store(
+            self.get_config("registry_snapshot")
+        )
+
+    def run(self):
+        # Only the first of the registration components restores the registry
+        if self.component_index == 0:
+            num_loaded = self.orchestrator_state.load_registry_snapshot(
+                self.get_config("provisional_agent_ttl_ms")
+            )
+            if num_loaded:
+                log.info("Loaded %d agents from the registry snapshot", num_loaded)
+            if self.get_config("request_registrations_on_start"):
+                self.send_registration_broadcast()
+
+        super().run()
+
+    def send_registration_broadcast(self):
+        """Ask every agent to send its full registration"""
+        message = Message()
+        message.set_previous(
+            {
+                "payload": {
+                    "action_name": AGENT_REGISTRATION_REQUEST_ACTION,
+                    "action_params": {},
+                    "originator": ORCHESTRATOR_COMPONENT_NAME,
+                },
+                "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/registrationRequest/orchestrator",
+            }
+        )
+        self.send_message(message)
 
     def invoke(self, message: Message, data):
         """Receive a registration from an agent and store it in the component's state."""
-        # log.info("Received registration from agent")
-        self.orchestrator_state.register_agent(data)
-        return data
+        if data.get("heartbeat"):
+            agent_name = data.get("agent_name")
+            if not self.orchestrator_state.refresh_agent(
+                agent_name, data.get("summary_hash")
+            ):
+                log.info("Asking agent %s for its full registration", agent_name)
+                return self.create_registration_request(agent_name)
+        else:
+            self.orchestrator_state.register_agent(data)
+        self.discard_current_message()
+        return None
+
+    def create_registration_request(self, agent_name):
+        """Create an action request that asks the agent to send its full summary"""
+        return {
+            "payload": {
+                "agent_name": agent_name,
+                "action_name": AGENT_REGISTRATION_REQUEST_ACTION,
+                "action_params": {},
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/actionRequest/orchestrator/agent/{agent_name}/{AGENT_REGISTRATION_REQUEST_ACTION}",
+        }
@@ -1,11 +1,15 @@
 """This is the component that handles request from users and forms the appropriate prompt for the LLM, makes the call, and parses the output and creates the appropriate ActionRequests"""
 
+import asyncio
+import contextvars
 import datetime
 import random
 import json
 import copy
+import threading
 import uuid
 import os
+from contextlib import aclosing
 from dateutil.tz import tzlocal
 from time import time
 from typing import Dict, Any
@@ -14,7 +18,11 @@ import yaml
 from solace_ai_connector.common.log import log
 from solace_ai_connector.common.message import Message
 
-from ...common.constants import ORCHESTRATOR_COMPONENT_NAME, HISTORY_MEMORY_ROLE
+from ...common.constants import (
+    ORCHESTRATOR_COMPONENT_NAME,
+    HISTORY_MEMORY_ROLE,
+    ACTION_DEADLINE_USER_PROPERTY,
+)
 from ...services.llm_service.components.llm_request_component import (
     LLMRequestComponent,
     info as base_info,
@@ -29,11 +37,29 @@ from ..orchestrator_main import (
 )
 from ..orchestrator_prompt import (
     SystemPrompt,
+    ToolSystemPrompt,
     UserStimulusPrompt,
     ActionResponsePrompt,
+    RequestContextPrompt,
+    add_cache_breakpoints,
+)
+from ...common.broker_request_multiplexer import BrokerRequestMultiplexer
+from ...common.utils import (
+    files_to_block_text,
+    parse_orchestrator_response,
+    repair_orchestrator_response,
+    OrchestratorResponseParser,
+)
+from ..action_manager import ActionManager, ACTION_REQUEST_TIMEOUT
+from ..stimulus_usage import (
+    DEFAULT_STIMULUS_LIMITS,
+    add_stimulus_usage,
+    format_limit_reached_message,
+    get_exceeded_limits,
+    get_messages_characters,
+    get_stimulus_usage,
 )
-from ...common.utils import files_to_block_text, parse_orchestrator_response
-from ..action_manager import ActionManager
+from ..orchestrator_tools import create_action_tools, tool_calls_to_actions
 
 
 info = base_info.copy()
@@ -44,6 +70,146 @@ info["description"] = (
     "for the LLM, makes the call, and parses the output and creates "
     "the appropriate ActionRequests"
 )
+info["config_parameters"] = base_info["config_parameters"] + [
+    {
+        "name": "early_action_dispatch",
+        "required": False,
+        "description": (
+            "Send each action request as soon as its invoke_action block has "
+            "streamed in, rather than waiting for the full LLM response. "
+            "Only used with llm_mode='stream'."
+        ),
+        "default": False,
+    },
+    {
+        "name": "repair_llm_responses",
+        "required": False,
+        "description": (
+            "Fix simple formatting mistakes in the LLM response (wrong tag "
+            "prefixes, unclosed trailing tags, a missing reasoning block) instead "
+            "of asking the LLM to try again."
+        ),
+        "default": True,
+    },
+    {
+        "name": "response_mode",
+        "required": False,
+        "description": (
+            "How the LLM asks for actions: 'xml' for invoke_action tags in the "
+            "response text or 'tools' to offer the open agents' actions as tools. "
+            "'tools' needs a model and LLM service that support tool calling."
+        ),
+        "default": "xml",
+    },
+    {
+        "name": "prompt_cache_size",
+        "required": False,
+        "description": (
+            "The number of rendered agent catalogs to keep for reuse in the system "
+            "prompt. 0 disables the cache."
+        ),
+        "default": 64,
+    },
+    {
+        "name": "prompt_cache_user_properties",
+        "required": False,
+        "description": (
+            "The user properties that can change which actions are available to the "
+            "originator (e.g. through the filter_action middleware). They are part "
+            "of the prompt cache key."
+        ),
+        "default": ["identity", "user_info", "originator_scopes"],
+    },
+    {
+        "name": "prompt_layout",
+        "required": False,
+        "description": (
+            "'default' or 'stable'. 'stable' keeps the system prompt identical "
+            "between requests so that LLM providers can cache it: the tag prefix is "
+            "chosen once per process and the originator info and available files "
+            "are moved to the end of the user turn."
+        ),
+        "default": "default",
+    },
+    {
+        "name": "prompt_cache_breakpoints",
+        "required": False,
+        "description": (
+            "Mark the system prompt and the latest message with cache_control "
+            "breakpoints for providers that need them (e.g. Anthropic)."
+        ),
+        "default": False,
+    },
+    {
+        "name": "session_state",
+        "required": False,
+        "description": (
+            "Where to keep the per-session agent state. 'type' is 'memory' (the "
+            "default) or 'redis' (with redis_host, redis_port and redis_db) to "
+            "share it between orchestrators and keep it over restarts. Sessions "
+            "expire after 'time_to_live' seconds without use, the same as the "
+            "orchestrator history. The memory store also evicts the least recently "
+            "used sessions beyond 'max_sessions' (10000) or 'max_bytes' (0 for no "
+            "limit)."
+        ),
+        "default": {},
+    },
+    {
+        "name": "action_tracking",
+        "required": False,
+        "description": (
+            "Where to keep the action requests that are waiting for responses. "
+            "'type' is 'memory' (the default), where the responses must come back "
+            "to this orchestrator, or 'redis' (with redis_host, redis_port, "
+            "redis_db and time_to_live) so that orchestrator replicas on shared "
+            "queues can take any response and time out any request."
+        ),
+        "default": {},
+    },
+    {
+        "name": "partial_results_timeout",
+        "required": False,
+        "description": (
+            "Seconds to wait for all of an LLM response's actions before sending "
+            "the results so far back to the model, with the missing ones marked as "
+            "pending. The late results are sent in a follow up turn. 0 to always "
+            "wait for all of them."
+        ),
+        "default": 0,
+    },
+    {
+        "name": "concurrency_mode",
+        "required": False,
+        "description": (
+            "'thread' to process one stimulus at a time on the component's thread "
+            "or 'async' to process many at once on an event loop, with their LLM "
+            "requests streaming concurrently over the one broker request/response "
+            "connection. With 'async' a single instance is usually enough."
+        ),
+        "default": "thread",
+    },
+    {
+        "name": "max_concurrent_stimuli",
+        "required": False,
+        "description": (
+            "With concurrency_mode 'async', the most stimuli to process at once. "
+            "Once this many are in progress, the next waits on the input queue."
+        ),
+        "default": 100,
+    },
+    {
+        "name": "stimulus_limits",
+        "required": False,
+        "description": (
+            "The most that one stimulus can use over all of its reinvokes: "
+            "'llm_calls', 'input_characters' and 'output_characters' (sent to and "
+            "generated by the LLM) and 'actions'. Once a limit is reached, the "
+            "originator is told that the request was stopped. 0 means no limit. "
+            "The counts are in the stimulus_usage user property."
+        ),
+        "default": DEFAULT_STIMULUS_LIMITS,
+    },
+]
 info["input_schema"] = {
     "type": "object",
     "properties": {
@@ -98,6 +264,22 @@ info["output_schema"] = {
 }
 
 
+# The state of the stimulus being processed by the current asyncio task. In
+# 'thread' mode it is unset and the state is kept on the component.
+current_stimulus = contextvars.ContextVar("current_stimulus", default=None)
+
+
+class StimulusState:
+    """The per-stimulus state of an async stimulus task"""
+
+    __slots__ = ("message", "discarded", "early_dispatch_state")
+
+    def __init__(self, message):
+        self.message = message
+        self.discarded = False
+        self.early_dispatch_state = None
+
+
 class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
     """This is the component that handles request fromn users and forms the appropriate prompt for the LLM, makes the call, and parses the output and creates the appropriate ActionRequests"""
 
@@ -109,16 +291,133 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
                 self.orchestrator_state = OrchestratorState()
                 self.kv_store_set("orchestrator_state", self.orchestrator_state)
 
+        self.orchestrator_state.configure_session_state(
+            self.get_config("session_state")
+        )
+
         self.history = HistoryService(
             ORCHESTRATOR_HISTORY_CONFIG, identifier=ORCHESTRATOR_HISTORY_IDENTIFIER
         )
-        self.action_manager = ActionManager(self.flow_kv_store, self.flow_lock_manager)
+        self.action_manager = ActionManager(
+            self.flow_kv_store,
+            self.flow_lock_manager,
+            self.get_config("action_tracking"),
+        )
         self.stream_to_flow = self.get_config("stream_to_flow")
+        self.early_action_dispatch = self.get_config("early_action_dispatch")
+        self.repair_llm_responses = self.get_config("repair_llm_responses")
+        self.response_mode = self.get_config("response_mode")
+        self.prompt_cache_user_properties = self.get_config(
+            "prompt_cache_user_properties"
+        )
+        self.orchestrator_state.prompt_cache.set_max_size(
+            self.get_config("prompt_cache_size")
+        )
+        self.prompt_layout = self.get_config("prompt_layout")
+        if self.prompt_layout not in ("default", "stable"):
+            raise ValueError(
+                f"Invalid prompt_layout '{self.prompt_layout}' - must be 'default' or 'stable'"
+            )
+        self.prompt_cache_breakpoints = self.get_config("prompt_cache_breakpoints")
+        if self.response_mode not in ("xml", "tools"):
+            raise ValueError(
+                f"Invalid response_mode '{self.response_mode}' - must be 'xml' or 'tools'"
+            )
+        self.partial_results_timeout = self.get_config("partial_results_timeout")
+        self.stimulus_limits = self.get_config("stimulus_limits") or {}
+        # Actions sent while the current stimulus is still streaming
+        self.early_dispatch_state = None
+
+        self.concurrency_mode = self.get_config("concurrency_mode")
+        if self.concurrency_mode not in ("thread", "async"):
+            raise ValueError(
+                f"Invalid concurrency_mode '{self.concurrency_mode}' - must be 'thread' or 'async'"
+            )
+        self.stimulus_loop = None
+        if self.concurrency_mode == "async":
+            self.start_stimulus_loop()
+
+    def start_stimulus_loop(self):
+        """Start the event loop that the stimuli are processed on in 'async' mode"""
+        self.stimulus_loop = asyncio.new_event_loop()
+        self.stimulus_slots = threading.BoundedSemaphore(
+            self.get_config("max_concurrent_stimuli")
+        )
+        self.llm_multiplexer = BrokerRequestMultiplexer(
+            self.broker_request_response_controller, self.stimulus_loop
+        )
+        self.stimulus_loop_thread = threading.Thread(
+            target=self.stimulus_loop.run_forever,
+            name=f"{self.name}_stimulus_loop",
+            daemon=True,
+        )
+        self.stimulus_loop_thread.start()
+
+    def stop_component(self):
+        if self.stimulus_loop:
+            self.llm_multiplexer.stop()
+            self.stimulus_loop.call_soon_threadsafe(self.stimulus_loop.stop)
+
+    @property
+    def current_message(self):
+        stimulus = current_stimulus.get()
+        if stimulus is not None:
+            return stimulus.message
+        return self.__dict__.get("_current_message")
+
+    @current_message.setter
+    def current_message(self, message):
+        stimulus = current_stimulus.get()
+        if stimulus is not None:
+            stimulus.message = message
+        else:
+            self.__dict__["_current_message"] = message
+
+    @property
+    def current_message_has_been_discarded(self):
+        stimulus = current_stimulus.get()
+        if stimulus is not None:
+            return stimulus.discarded
+        return self.__dict__.get("_current_message_has_been_discarded", False)
+
+    @current_message_has_been_discarded.setter
+    def current_message_has_been_discarded(self, discarded):
+        stimulus = current_stimulus.get()
+        if stimulus is not None:
+            stimulus.discarded = discarded
+        else:
+            self.__dict__["_current_message_has_been_discarded"] = discarded
+
+    @property
+    def early_dispatch_state(self):
+        stimulus = current_stimulus.get()
+        if stimulus is not None:
+            return stimulus.early_dispatch_state
+        return self.__dict__.get("_early_dispatch_state")
+
+    @early_dispatch_state.setter
+    def early_dispatch_state(self, state):
+        stimulus = current_stimulus.get()
+        if stimulus is not None:
+            stimulus.early_dispatch_state = state
+        else:
+            self.__dict__["_early_dispatch_state"] = state
 
     def invoke(self, message: Message, data: Dict[str, Any]) -> Dict[str, Any]:
-        user_properties = message.get_user_properties()
-        user_properties["timestamp_start"] = time()
-        message.set_user_properties(user_properties)
+        if self.stimulus_loop:
+            # Wait for a free slot here so that the input queue backs up
+            self.stimulus_slots.acquire()
+            asyncio.run_coroutine_threadsafe(
+                self.process_stimulus_async(message, data), self.stimulus_loop
+            )
+            return None
+
+        self.start_stimulus(message, data)
+        exceeded = self.get_exceeded_stimulus_limits(message)
+        if exceeded:
+            return self.finish_stimulus(
+                message, self.end_stimulus_at_limit(message, exceeded)
+            )
 
         results = self.pre_llm(message, data)
         message.set_payload(results)
@@ -128,12 +427,155 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
 
         results = self.post_llm(message, results)
 
+        return self.finish_stimulus(message, results)
+
+    async def process_stimulus_async(self, message: Message, data):
+        """Process a stimulus as an asyncio task. The LLM request is awaited on the
+        event loop, and everything that can block - the history and action tracking
+        calls and sending messages - runs on the loop's worker threads."""
+        current_stimulus.set(StimulusState(message))
+        try:
+            self.start_stimulus(message, data)
+            exceeded = self.get_exceeded_stimulus_limits(message)
+            if exceeded:
+                results = await asyncio.to_thread(
+                    self.end_stimulus_at_limit, message, exceeded
+                )
+            else:
+                results = await self.pre_llm_async(message, data)
+                message.set_payload(results)
+
+                results = await self.llm_call_async(message, results)
+                message.set_payload(results)
+
+                results = await self.post_llm_async(message, results)
+
+            await asyncio.to_thread(self.send_stimulus_results, message, results)
+        except Exception as e:
+            log.error("Error processing stimulus: %s", str(e), exc_info=True)
+            self.handle_negative_acknowledgements(message, e)
+        finally:
+            self.stimulus_slots.release()
+
+    async def pre_llm_async(self, message: Message, data):
+        return await asyncio.to_thread(self.pre_llm, message, data)
+
+    async def post_llm_async(self, message: Message, data):
+        return await asyncio.to_thread(self.post_llm, message, data)
+
+    def send_stimulus_results(self, message: Message, results):
+        """Finish the stimulus and send its results on, as invoke's caller does in
+        'thread' mode"""
+        results = self.finish_stimulus(message, results)
+        if self.current_message_has_been_discarded:
+            message.call_acknowledgements()
+        elif results is not None:
+            self.process_post_invoke(results, message)
+
+    def start_stimulus(self, message: Message, data):
+        """Record the start time and how long the stimulus waited to be processed"""
+        user_properties = message.get_user_properties()
+        user_properties["timestamp_start"] = time()
+        # Only the action requests sent for this stimulus have a deadline
+        user_properties.pop(ACTION_DEADLINE_USER_PROPERTY, None)
+        message.set_user_properties(user_properties)
+
+        sent_time = user_properties.get("stimulus_sent_time")
+        if sent_time:
+            stimulus_type = (
+                "reinvoke" if data.get("action_response_reinvoke") else "user"
+            )
+            self.orchestrator_state.record_stimulus_wait(
+                stimulus_type, max(0.0, user_properties["timestamp_start"] - sent_time)
+            )
+
+    def get_exceeded_stimulus_limits(self, message: Message, new_actions=0):
+        return get_exceeded_limits(
+            get_stimulus_usage(message.get_user_properties()),
+            self.stimulus_limits,
+            new_actions,
+        )
+
+    def end_stimulus_at_limit(self, message: Message, exceeded):
+        """Tell the originator that the stimulus has been stopped at its limits and
+        complete the response"""
+        user_properties = message.get_user_properties()
+        log.warning(
+            "Stopping stimulus %s at its %s limit - usage: %s",
+            user_properties.get("stimulus_uuid"),
+            ", ".join(exceeded),
+            get_stimulus_usage(user_properties),
+        )
+        text = format_limit_reached_message(exceeded, self.stimulus_limits)
+        response_uuid = str(uuid.uuid4())
+        gateway_id = user_properties.get("gateway_id")
+        if self.stream_to_flow:
+            # On the same path as the streamed responses to keep them in order
+            self.send_to_flow(
+                self.stream_to_flow,
+                Message(
+                    payload={
+                        "content": text,
+                        "chunk": text,
+                        "response_uuid": response_uuid,
+                        "first_chunk": True,
+                        "last_chunk": True,
+                        "streaming": True,
+                        "check_reasoning": False,
+                    },
+                    user_properties=user_properties,
+                ),
+            )
+            self.send_to_flow(
+                self.stream_to_flow,
+                Message(
+                    payload={
+                        "response_complete": True,
+                        "streaming": True,
+                    },
+                    user_properties=user_properties,
+                    topic=f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/responseComplete/orchestrator/{gateway_id}",
+                ),
+            )
+            self.discard_current_message()
+            return None
+        return [
+            {
+                "payload": {
+                    "text": text,
+                    "streaming": True,
+                    "first_chunk": True,
+                    "last_chunk": True,
+                    "uuid": response_uuid,
+                },
+                "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/streamingResponse/orchestrator/{gateway_id}",
+            },
+            {
+                "payload": {},
+                "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/responseComplete/orchestrator/{gateway_id}",
+            },
+        ]
+
+    def finish_stimulus(self, message: Message, results):
+        """Record the end time and the actions that were called"""
         user_properties = message.get_user_properties()
         user_properties["timestamp_end"] = time()
+        # The reinvoke stimuli among the results are sent now, so their wait in the
+        # queue starts here. It is set on them alone, as the other results share
+        # the message's user properties.
+        for result in results or []:
+            if result.get("topic", "").endswith("/reinvokeModel"):
+                result["user_properties"] = {
+                    **(result.get("user_properties") or {}),
+                    "stimulus_sent_time": user_properties["timestamp_end"],
+                }
 
         actions_called = []
-        if results:
-            for result in results:
+        dispatched = results or []
+        if self.early_dispatch_state:
+            dispatched = self.early_dispatch_state["action_requests"] + dispatched
+        if dispatched:
+            for result in dispatched:
                 if result.get("payload", {}).get("action_name"):
                     actions_called.append(
                         {
@@ -205,7 +647,15 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
         input_data = self.get_user_input(chat_text)
         user_info = user_properties.get("user_info", {"email": "unknown"})
 
-        agent_state_yaml, examples = self.get_agents_yaml(user_properties)
+        agent_state_yaml, examples, tools = self.get_agents_prompt_info(user_properties)
+        stable_layout = self.prompt_layout == "stable"
+        if stable_layout:
+            tag_prefix = self.orchestrator_state.get_stable_tag_prefix()
+        else:
+            # Prefix with 't' as XML tags cannot start with a number
+            tag_prefix = "t" + str(random.randint(100, 999)) + "_"
+        # For repairing the response in post_llm
+        message.set_private_data("tag_prefix", tag_prefix)
         full_input = {
             "input_yaml": yaml.dump(input_data),
             "input": input_data,
@@ -217,15 +667,17 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
             "response_format_prompt": user_properties.get("response_format_prompt"),
             "originator_info": user_info,  # Do we need this?
             "agent_state_yaml": agent_state_yaml,
-            "tag_prefix": "t"
-            + str(random.randint(100, 999))
-            + "_",  # Prefix with 't' as XML tags cannot start with a number
+            "tag_prefix": tag_prefix,
             "available_files": available_files,
+            "stable_layout": stable_layout,
         }
 
         # Get the prompts
         gateway_history, memory_history = self.get_gateway_history(data)
-        system_prompt = SystemPrompt(full_input, examples)
+        if self.response_mode == "tools":
+            system_prompt = ToolSystemPrompt(full_input)
+        else:
+            system_prompt = SystemPrompt(full_input, examples)
         if action_response_reinvoke:
             user_prompt = ActionResponsePrompt(
                 {"input": chat_text, "tag_prefix": full_input["tag_prefix"]}
@@ -237,6 +689,8 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
             )
             if memory_history:
                 self.history.store_history(stimulus_uuid, "system", memory_history)
+        if stable_layout:
+            user_prompt += RequestContextPrompt(full_input)
 
         # Store the user prompt in the history
         self.history.store_history(stimulus_uuid, "user", user_prompt)
@@ -244,22 +698,60 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
         # Get the all the messages
         orchestrator_history = self.history.get_history(stimulus_uuid)
 
+        messages = [
+            {"role": "system", "content": system_prompt},
+            *orchestrator_history,
+        ]
+        if self.prompt_cache_breakpoints:
+            messages = add_cache_breakpoints(messages)
         result = {
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                *orchestrator_history,
-            ],
+            "messages": messages,
         }
+        if tools is not None:
+            result["tools"] = tools
 
         return result
 
     def post_llm(self, message: Message, data) -> Message:
         """Handle LLM responses"""
         content = data.get("content", "")
-        response_obj = parse_orchestrator_response(content, last_chunk=True)
+        add_stimulus_usage(
+            message.get_user_properties(), output_characters=len(content or "")
+        )
+        if self.response_mode == "tools":
+            # The actions come from the tool calls - the text only has content
+            response_obj = parse_orchestrator_response(
+                content, last_chunk=True, check_reasoning=False
+            )
+            response_obj["actions"] = tool_calls_to_actions(
+                data.get("tool_calls"), response_obj["errors"]
+            )
+        else:
+            response_obj = parse_orchestrator_response(content, last_chunk=True)
         user_properties = message.get_user_properties()
         session_id = user_properties.get("session_id")
 
+        if self.early_dispatch_state and self.early_dispatch_state["action_requests"]:
+            # Some actions are already running, so there is no going back to the model
+            return self.finish_early_dispatch(message, response_obj)
+
+        if (
+            self.repair_llm_responses
+            and self.response_mode == "xml"
+            and response_obj.get("errors")
+        ):
+            repaired_obj, repairs = repair_orchestrator_response(
+                content, response_obj, message.get_private_data("tag_prefix") or ""
+            )
+            if repairs:
+                log.info(
+                    "Repaired LLM response (%s) - errors were: %s",
+                    ", ".join(repairs),
+                    response_obj["errors"],
+                )
+                self.orchestrator_state.record_response_repair(repairs)
+                response_obj = repaired_obj
+
         # Check if there was a parsing error
         if (
             not response_obj
@@ -294,6 +786,7 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
                 session_id,
                 response_obj.get("current_subject_starting_id"),
             )
+            self.orchestrator_state.record_response_reinvoke()
             return [
                 {
                     "payload": {
@@ -311,6 +804,7 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
             # If there are errors, we need to send it to the orchestrator
             if "errors" in response_obj and len(response_obj["errors"]) > 0:
                 log.error("Errors in response: %s", response_obj["errors"])
+                self.orchestrator_state.record_response_reinvoke()
                 return [
                     {
                         "payload": {
@@ -369,7 +863,15 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
         # Pull out the action requests from the payload and add them to the action manager
         ars = [item["payload"] for item in action_requests]
 
-        self.action_manager.add_action_request(ars, message.get_user_properties())
+        if "actions" in self.get_exceeded_stimulus_limits(message, len(ars)):
+            return self.end_stimulus_at_limit(message, ["actions"])
+        add_stimulus_usage(message.get_user_properties(), actions=len(ars))
+
+        self.action_manager.add_action_request(
+            ars,
+            message.get_user_properties(),
+            partial_results_timeout=self.partial_results_timeout,
+        )
 
         return action_requests
 
@@ -384,10 +886,7 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
         Returns:
             Dict[str, Any]: The response from the LLM service.
         """
-        messages = data.get("messages", [])
-        llm_message = self._create_llm_message(
-            message, messages, {"type": "orchestrator"}
-        )
+        llm_message = self.create_orchestrator_llm_message(message, data)
         response_uuid = str(uuid.uuid4())
 
         try:
@@ -399,6 +898,185 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
             log.error("Error invoking LLM service: %s", e, exc_info=True)
             raise
 
+    async def llm_call_async(self, message: Message, data) -> Message:
+        """llm_call for 'async' mode - the request shares the broker request/response
+        connection with the other stimuli in progress"""
+        llm_message = self.create_orchestrator_llm_message(message, data)
+        response_uuid = str(uuid.uuid4())
+
+        try:
+            if self.llm_mode == "stream":
+                async with aclosing(
+                    self.llm_multiplexer.request_stream(
+                        llm_message, "input.payload:last_chunk"
+                    )
+                ) as responses:
+                    return await self._handle_streaming_async(
+                        message, llm_message, response_uuid, responses
+                    )
+            else:
+                response = await self.llm_multiplexer.request(llm_message)
+                return response.get_payload()
+        except Exception as e:
+            log.error("Error invoking LLM service: %s", e, exc_info=True)
+            raise
+
+    def create_orchestrator_llm_message(self, message: Message, data) -> Message:
+        """Create the LLM request for the prompt, count it in the stimulus usage and
+        reset the early dispatch state"""
+        messages = data.get("messages", [])
+        add_stimulus_usage(
+            message.get_user_properties(),
+            llm_calls=1,
+            input_characters=get_messages_characters(messages),
+        )
+        llm_message = self._create_llm_message(
+            message, messages, {"type": "orchestrator"}
+        )
+        if data.get("tools"):
+            llm_message.get_payload()["tools"] = data["tools"]
+        self.early_dispatch_state = None
+        if (
+            self.early_action_dispatch
+            and self.llm_mode == "stream"
+            and self.response_mode == "xml"
+        ):
+            self.early_dispatch_state = {
+                "parser": OrchestratorResponseParser(),
+                "action_list_id": None,
+                "action_requests": [],
+                "stopped": False,
+            }
+        return llm_message
+
+    def _process_streaming_batch(
+        self, input_message: Message, aggregate_result: str, last_chunk: bool
+    ):
+        """Send the actions that have completely streamed in so far. The last
+        chunk is left for post_llm to handle."""
+        state = self.early_dispatch_state
+        if not state or state["stopped"] or last_chunk:
+            return
+
+        response_obj = state["parser"].parse(aggregate_result, check_reasoning=False)
+        # Unclosed and incomplete tags are expected part way through the stream -
+        # anything else means the response is malformed and post_llm will deal with it
+        if any(
+            not error.startswith(("Unclosed", "Incomplete"))
+            for error in response_obj["errors"]
+        ):
+            state["stopped"] = True
+            return
+        if not response_obj["reasoning"]:
+            return
+
+        num_dispatched = len(state["action_requests"])
+        if len(response_obj["actions"]) <= num_dispatched:
+            return
+
+        user_properties = input_message.get_user_properties()
+        try:
+            action_requests = self.create_action_requests(
+                response_obj, user_properties, start_idx=num_dispatched
+            )
+        except ValueError as e:
+            log.warning("Not dispatching actions early: %s", str(e))
+            state["stopped"] = True
+            return
+
+        ars = [item["payload"] for item in action_requests]
+        if "actions" in self.get_exceeded_stimulus_limits(input_message, len(ars)):
+            # finish_early_dispatch reports the ones that can't be run
+            state["stopped"] = True
+            return
+        add_stimulus_usage(user_properties, actions=len(ars))
+        if state["action_list_id"] is None:
+            state["action_list_id"] = self.action_manager.add_action_request(
+                ars,
+                user_properties,
+                sealed=False,
+                partial_results_timeout=self.partial_results_timeout,
+            )
+        else:
+            self.action_manager.add_actions(state["action_list_id"], ars)
+        state["action_requests"].extend(action_requests)
+
+        # Send them on to the action request splitter right away
+        early_message = Message(user_properties=user_properties.copy())
+        early_message.set_previous(action_requests)
+        self.send_message(early_message)
+
+    def finish_early_dispatch(self, message: Message, response_obj: dict):
+        """Send the actions that were not dispatched while streaming and seal the
+        action list"""
+        state = self.early_dispatch_state
+        user_properties = message.get_user_properties()
+        if response_obj.get("errors"):
+            log.warning(
+                "Errors in response after actions were dispatched: %s",
+                response_obj["errors"],
+            )
+
+        action_requests = []
+        ars = []
+        start_idx = len(state["action_requests"])
+        for action_idx, action in enumerate(
+            response_obj.get("actions", [])[start_idx:], start_idx
+        ):
+            try:
+                if "actions" in self.get_exceeded_stimulus_limits(message, 1):
+                    raise ValueError(
+                        f"the request has reached its limit of {self.stimulus_limits['actions']} actions"
+                    )
+                action_request = self.create_action_request(
+                    action, action_idx, user_properties
+                )
+                add_stimulus_usage(user_properties, actions=1)
+                action_requests.append(action_request)
+                ars.append(action_request["payload"])
+            except ValueError as e:
+                # Record the error as the response so that the model sees it along
+                # with the results of the actions that did run
+                ars.append(
+                    {
+                        "agent_name": action.get("agent"),
+                        "action_name": action.get("action"),
+                        "action_params": action.get("parameters", {}),
+                        "action_idx": action_idx,
+                        "originator": ORCHESTRATOR_COMPONENT_NAME,
+                        "response": {"text": f"Action was not run: {str(e)}"},
+                    }
+                )
+
+        action_list_id = state["action_list_id"]
+        if ars:
+            self.action_manager.add_actions(action_list_id, ars)
+        action_list = self.action_manager.seal_action_request(action_list_id)
+
+        events = action_requests
+        if action_list:
+            # All the responses came back while the model was still streaming
+            response_text, files = action_list.format_ai_response()
+            events.append(
+                {
+                    "payload": {
+                        "text": response_text,
+                        "files": files,
+                        "identity": user_properties.get("identity"),
+                        "channel": user_properties.get("channel"),
+                        "thread_ts": user_properties.get("thread_ts"),
+                        "action_response_reinvoke": True,
+                    },
+                    "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/stimulus/orchestrator/reinvokeModel",
+                }
+            )
+            self.action_manager.delete_action_request(action_list_id)
+
+        if not events:
+            self.discard_current_message()
+            return None
+        return events
+
     def get_gateway_history(self, data):
         gateway_history = data.get("history", [])
         memory_history = None
@@ -450,61 +1128,110 @@ class OrchestratorStimulusProcessorComponent(LLMRequestComponent):
                         examples.extend(popped_examples)
         return examples
 
-    def get_agents_yaml(self, user_properties: dict):
-        agents = copy.deepcopy(
+    def get_agents_prompt_info(self, user_properties: dict):
+        """Get the agent catalog yaml, the action examples and (in tools mode) the
+        tools for the prompt, reusing them from the prompt cache if nothing they
+        depend on has changed"""
+        prompt_cache = self.orchestrator_state.prompt_cache
+        key = self.get_prompt_cache_key(user_properties)
+        cached = prompt_cache.get(key)
+        if cached is not None:
+            return cached
+
+        agents = self.get_agents(user_properties)
+        agent_state_yaml, examples = self.get_agents_yaml(agents)
+        tools = create_action_tools(agents) if self.response_mode == "tools" else None
+        prompt_cache.set(key, (agent_state_yaml, examples, tools))
+        return agent_state_yaml, examples, tools
+
+    def get_prompt_cache_key(self, user_properties: dict):
+        # The version must be read before the agents are, so that a registration
+        # in between leaves the entry under a version that is never used again
+        registry_version = self.orchestrator_state.get_registry_version()
+        session_id = user_properties.get("session_id", "")
+        agent_states = tuple(
+            sorted(
+                (agent_name, agent_state.get("state"))
+                for agent_name, agent_state in self.orchestrator_state.get_agent_state(
+                    session_id
+                ).items()
+            )
+        )
+        properties = tuple(
+            (name, json.dumps(user_properties.get(name), sort_keys=True, default=str))
+            for name in self.prompt_cache_user_properties or []
+        )
+        return (registry_version, self.response_mode, agent_states, properties)
+
+    def get_agents(self, user_properties: dict):
+        return copy.deepcopy(
             self.orchestrator_state.get_agents_and_actions(user_properties)
         )
+
+    def get_agents_yaml(self, agents: dict):
         examples = self.extract_examples_from_actions(agents)
         agents_yaml = yaml.dump(agents)
         return agents_yaml, examples
 
-    def create_action_requests(self, response_obj: dict, user_properties: dict) -> list:
-        """Create ActionRequests from the response object"""
+    def create_action_requests(
+        self, response_obj: dict, user_properties: dict, start_idx: int = 0
+    ) -> list:
+        """Create ActionRequests from the response object, starting at the
+        action with index start_idx"""
 
         action_requests = []
 
         if "actions" not in response_obj:
             return action_requests
 
-        action_idx = 0
-        for action in response_obj["actions"]:
-            action_name = action.get("action")
-            agent_name = action.get("agent")
-            action_details = self.orchestrator_state.get_agent_action(
-                agent_name, action_name
+        action_idx = start_idx
+        for action in response_obj["actions"][start_idx:]:
+            action_requests.append(
+                self.create_action_request(action, action_idx, user_properties)
             )
-            if not action_details:
-                raise ValueError(
-                    f"Action not found in agent: {agent_name}, {action_name}"
-                )
-            middleware_service = MiddlewareService()
-            if middleware_service.get("validate_action_request")(
-                user_properties, action_details
-            ):
-                action_params = action.get("parameters", {})
+            action_idx += 1
 
-                action_requests.append(
-                    {
-                        "payload": {
-                            "agent_name": agent_name,
-                            "action_name": action_name,
-                            "action_params": action_params,
-                            "action_idx": action_idx,
-                            "originator": ORCHESTRATOR_COMPONENT_NAME,
-                        },
-                        "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/actionRequest/orchestrator/agent/{agent_name}/{action_name}",
-                    }
-                )
-                action_idx += 1
+        return action_requests
 
-            else:
-                log.error(
-                    "Unauthorized to perform action: %s, %s",
-                    agent_name,
-                    action_name,
-                )
-                raise ValueError(
-                    f"Unauthorized to perform action: {agent_name}, {action_name}"
-                )
+    def create_action_request(
+        self, action: dict, action_idx: int, user_properties: dict
+    ) -> dict:
+        """Create a single ActionRequest - raises ValueError if the action can't be run"""
+        action_name = action.get("action")
+        agent_name = action.get("agent")
+        action_details = self.orchestrator_state.get_agent_action(
+            agent_name, action_name
+        )
+        if not action_details:
+            raise ValueError(f"Action not found in agent: {agent_name}, {action_name}")
+        middleware_service = MiddlewareService()
+        if not middleware_service.get("validate_action_request")(
+            user_properties, action_details
+        ):
+            log.error(
+                "Unauthorized to perform action: %s, %s",
+                agent_name,
+                action_name,
+            )
+            raise ValueError(
+                f"Unauthorized to perform action: {agent_name}, {action_name}"
+            )
 
-        return action_requests
+        action_params = action.get("parameters", {})
+        payload = {
+            "agent_name": agent_name,
+            "action_name": action_name,
+            "action_params": action_params,
+            "action_idx": action_idx,
+            "originator": ORCHESTRATOR_COMPONENT_NAME,
+        }
+        if action_details.get("timeout"):
+            payload["timeout"] = action_details.get("timeout")
+        # Agents skip the action if it is still waiting to run once the
+        # orchestrator has timed it out
+        deadline = time() + (action_details.get("timeout") or ACTION_REQUEST_TIMEOUT)
+        return {
+            "payload": payload,
+            "topic": f"{os.getenv('SOLACE_AGENT_MESH_NAMESPACE')}solace-agent-mesh/v1/actionRequest/orchestrator/agent/{agent_name}/{action_name}",
+            "user_properties": {ACTION_DEADLINE_USER_PROPERTY: deadline},
+        }
@@ -5,9 +5,14 @@ from datetime import datetime
 from solace_ai_connector.components.component_base import ComponentBase
 from solace_ai_connector.common.log import log
 from solace_ai_connector.common.message import Message
-from ...common.utils import parse_orchestrator_response, strip_text_after_invoke_action
+from ...common.utils import OrchestratorResponseParser, strip_text_after_invoke_action
 from ...services.history_service import HistoryService
 from ...services.file_service import FileService
+from ...services.llm_service.components.llm_request_component import (
+    pop_streaming_snapshot_request,
+    request_streaming_snapshot,
+)
+from ...orchestrator.orchestrator_tools import format_tool_calls_for_history
 from ...orchestrator.orchestrator_main import (
     ORCHESTRATOR_HISTORY_IDENTIFIER,
     ORCHESTRATOR_HISTORY_CONFIG,
@@ -85,18 +90,46 @@ class OrchestratorStreamingOutputComponent(ComponentBase):
                 # Just discard the data
                 self.discard_current_message()
                 return None
-            if last_chunk:
-                self.delete_response_state(response_uuid)
-                if stimulus_uuid:
-                    # Temporary change to remove any bare text and files after the last invoke_action tag
-                    stripped_text = strip_text_after_invoke_action(text)
-                    self.history.store_history(
-                        stimulus_uuid, "assistant", stripped_text
-                    )
 
-        obj = parse_orchestrator_response(
-            text, last_chunk=last_chunk, check_reasoning=check_reasoning
-        )
+        sequence = data.get("sequence")
+        if sequence is not None and not self.accept_streaming_delta(
+            sequence, text is not None, response_state, response_uuid
+        ):
+            self.discard_current_message()
+            return None
+
+        if not first_chunk and last_chunk:
+            self.delete_response_state(response_uuid)
+            self.clear_snapshot_request(response_state, response_uuid)
+            if stimulus_uuid:
+                # Temporary change to remove any bare text and files after the last invoke_action tag
+                stripped_text = strip_text_after_invoke_action(text)
+                if data.get("tool_calls"):
+                    # Keep a record of the calls so the LLM knows what it asked for
+                    stripped_text = "\n".join(
+                        filter(
+                            None,
+                            [
+                                stripped_text,
+                                format_tool_calls_for_history(data["tool_calls"]),
+                            ],
+                        )
+                    )
+                self.history.store_history(stimulus_uuid, "assistant", stripped_text)
+
+        # Only the newly arrived text is parsed - the parser keeps the state
+        # for everything before it
+        parser = response_state["parser"]
+        if text is None and sequence is not None:
+            obj = parser.feed(
+                data.get("chunk", ""),
+                last_chunk=last_chunk,
+                check_reasoning=check_reasoning,
+            )
+        else:
+            obj = parser.parse(
+                text, last_chunk=last_chunk, check_reasoning=check_reasoning
+            )
 
         if not obj or isinstance(obj, str) or not obj.get("content"):
             log.debug("Error parsing LLM output: %s", obj)
@@ -222,6 +255,46 @@ class OrchestratorStreamingOutputComponent(ComponentBase):
         response_state["streaming_started"] = True
         return output, output.get("text") or ""
 
+    def accept_streaming_delta(
+        self, sequence, has_snapshot, response_state, response_uuid
+    ):
+        """Check the sequence number of a delta mode chunk. If a chunk went missing,
+        ask the sender for a full snapshot and drop chunks until it arrives."""
+        if has_snapshot:
+            response_state["next_sequence"] = sequence + 1
+            response_state["awaiting_snapshot"] = False
+            return True
+
+        if response_state.get("awaiting_snapshot"):
+            return False
+
+        expected_sequence = response_state.get("next_sequence", 0)
+        if sequence != expected_sequence:
+            log.warning(
+                "Missing streaming chunk for response %s: expected %s but got %s. "
+                "Requesting a snapshot",
+                response_uuid,
+                expected_sequence,
+                sequence,
+            )
+            response_state["awaiting_snapshot"] = True
+            response_state["snapshot_requested"] = True
+            request_streaming_snapshot(
+                self.flow_kv_store, self.flow_lock_manager, response_uuid
+            )
+            return False
+
+        response_state["next_sequence"] = sequence + 1
+        return True
+
+    def clear_snapshot_request(self, response_state, response_uuid):
+        """Remove any snapshot request for the finished response that the sender
+        didn't take - it may have already sent its last chunk when it was made"""
+        if response_state.get("snapshot_requested"):
+            pop_streaming_snapshot_request(
+                self.flow_kv_store, self.flow_lock_manager, response_uuid
+            )
+
     def get_current_chunk(self, full_text, previous_chunk_index):
         """Use the previous_chunk_index to get the current chunk of text from the full_text"""
 
@@ -238,6 +311,7 @@ class OrchestratorStreamingOutputComponent(ComponentBase):
             delta = current_time - response_state["create_time"]
             if delta.total_seconds() > 60:
                 del self._response_state[response_uuid]
+                self.clear_snapshot_request(response_state, response_uuid)
 
     def get_response_state(self, response_uuid):
         """Get the state of a response"""
@@ -249,6 +323,7 @@ class OrchestratorStreamingOutputComponent(ComponentBase):
             "create_time": datetime.now(),
             "streaming_content_idx": 0,
             "previous_chunk_index": 0,
+            "parser": OrchestratorResponseParser(),
         }
         self._response_state[response_uuid] = response_state
         self.age_out_response_state()
@@ -1,9 +1,17 @@
+import copy
+import random
 from datetime import datetime, timedelta
 from ..services.middleware_service.middleware_service import MiddlewareService
 import threading
+from types import MappingProxyType
 from solace_ai_connector.common.log import log
 from ..common.action_response import ActionResponse
+from ..common.stats_logger import StatsLogger
 from ..common.time import TEN_MINUTES, THIRTY_MINUTES
+from ..common.utils import get_summary_hash
+from .prompt_cache import PromptCache
+from .session_state_store import create_session_state_store
+from .registry_store import create_registry_store, save_registry_snapshot
 
 
 ORCHESTRATOR_HISTORY_IDENTIFIER = "orchestrator"
@@ -26,7 +34,7 @@ class OrchestratorState:
     _instance = None
     _lock = threading.Lock()
     _config = None
-    _session_state = {}
+    _session_lock = threading.Lock()
 
     @classmethod
     def set_config(cls, config):
@@ -39,84 +47,250 @@ class OrchestratorState:
         return cls._instance
 
     def __init__(self):
-        if not hasattr(self, "registered_agents"):
-            self.registered_agents = {}
+        if not hasattr(self, "registry"):
+            # Replaced, never modified, whenever the registered agents change, so
+            # that lookups don't need the lock
+            self.registry = AgentRegistrySnapshot(0, {})
+            # Agent catalog parts of the prompt - keyed on the registry version, so
+            # it is cleared whenever that changes
+            self.prompt_cache = PromptCache()
+            # Where the registry is saved for the next start, if anywhere
+            self.registry_store = None
+            # Saves are done outside the lock, one at a time, skipping any
+            # snapshot older than the last one saved
+            self.registry_save_lock = threading.Lock()
+            self.saved_registry_version = 0
+        if not hasattr(self, "response_repair_stats"):
+            # How often a malformed LLM response was fixed locally rather than
+            # sending it back to the LLM
+            self.response_repair_stats = {"repaired": 0, "reinvoked": 0, "repairs": {}}
+        if not hasattr(self, "stimulus_wait_stats"):
+            # How long stimuli waited on their queues, by stimulus type
+            self.stimulus_wait_stats = {}
+        if not hasattr(self, "stats_logger"):
+            # Logged on each action_manager timer event
+            self.stats_logger = StatsLogger("Orchestrator", self.get_stats)
+        if not hasattr(self, "session_state_store"):
+            # Expires along with the orchestrator's history by default
+            self.session_state_config = {
+                "time_to_live": ORCHESTRATOR_HISTORY_CONFIG["time_to_live"]
+            }
+            self.session_state_store = create_session_state_store(
+                self.session_state_config
+            )
 
     def register_agent(self, agent):
+        # Agents send the hash with their summary, but work it out for any that don't
+        summary_hash = agent.pop("summary_hash", None) or get_summary_hash(agent)
         with self._lock:
             agent_name = agent.get("agent_name")
+            existing_agent = self.registry.agents.get(agent_name)
+            if existing_agent and existing_agent.get("summary_hash") == summary_hash:
+                # Nothing has changed, so the registry version stays the same
+                self._reset_agent_ttl(existing_agent)
+                return
+
             agent["state"] = "closed"
+            agent["summary_hash"] = summary_hash
+            self._reset_agent_ttl(agent)
+            agents = dict(self.registry.agents)
+            agents[agent_name] = agent
+            self._set_registry(agents)
+        self._save_registry()
 
-            # Always update the agent information
-            self.registered_agents[agent_name] = agent
+    def refresh_agent(self, agent_name, summary_hash):
+        """Handle a registration heartbeat. Returns False if the agent's summary
+        isn't known, in which case the full registration must be asked for."""
+        with self._lock:
+            agent = self.registry.agents.get(agent_name)
+            if not agent or agent.get("summary_hash") != summary_hash:
+                return False
+            self._reset_agent_ttl(agent)
+            return True
 
-            # Reset its TTL
-            self.registered_agents[agent_name][
-                "expire_time"
-            ] = datetime.now() + timedelta(
-                milliseconds=self._config.get("agent_ttl_ms")
-            )
+    def _reset_agent_ttl(self, agent):
+        agent["expire_time"] = datetime.now() + timedelta(
+            milliseconds=self._config.get("agent_ttl_ms")
+        )
 
     def get_registered_agents(self):
-        with self._lock:
-            return self.registered_agents
+        return self.registry.agents
 
     def get_agent_action(self, agent_name, action_name):
-        with self._lock:
-            agent = self.registered_agents.get(agent_name)
-            if not agent:
-                return None
-            actions = agent.get("actions")
-            if not actions:
-                return None
-            for action in actions:
-                if action is None:
-                    continue
-                for action_obj_name, action_obj in action.items():
-                    if action_obj_name == action_name:
-                        return action_obj
-            return None
+        return self.registry.actions.get((agent_name, action_name))
 
     def age_out_agents(self):
         with self._lock:
             now = datetime.now()
+            agents = dict(self.registry.agents)
             agents_to_remove = []
-            for agent_name, agent in self.registered_agents.items():
+            for agent_name, agent in agents.items():
                 if agent.get("expire_time", datetime.max) < now:
                     log.warning("Agent %s has expired. Removing.", agent_name)
                     agents_to_remove.append(agent_name)
             for agent_name in agents_to_remove:
-                del self.registered_agents[agent_name]
+                del agents[agent_name]
+            if agents_to_remove:
+                self._set_registry(agents)
+        self._save_registry()
 
     def delete_agent(self, agent_name):
         with self._lock:
-            if agent_name in self.registered_agents:
-                del self.registered_agents[agent_name]
+            if agent_name in self.registry.agents:
+                agents = dict(self.registry.agents)
+                del agents[agent_name]
+                self._set_registry(agents)
+        self._save_registry()
+
+    def get_stable_tag_prefix(self):
+        """A tag prefix that stays the same for the life of the process, for the
+        stable prompt layout"""
+        with self._lock:
+            if not getattr(self, "stable_tag_prefix", None):
+                # Prefix with 't' as XML tags cannot start with a number
+                self.stable_tag_prefix = "t" + str(random.randint(100, 999)) + "_"
+            return self.stable_tag_prefix
+
+    def get_registry_version(self):
+        return self.registry.version
+
+    def _set_registry(self, agents):
+        """Swap in a new registry snapshot - must be called with the lock held, and
+        followed by _save_registry once it is released"""
+        self.registry = AgentRegistrySnapshot(self.registry.version + 1, agents)
+        self.prompt_cache.clear()
+
+    def _save_registry(self):
+        """Save the current registry snapshot if it hasn't been yet. It must be
+        called without the lock held, so that registrations don't wait on the I/O."""
+        if not self.registry_store:
+            return
+        with self.registry_save_lock:
+            registry = self.registry
+            if registry.version <= self.saved_registry_version:
+                return
+            save_registry_snapshot(self.registry_store, registry.agents)
+            self.saved_registry_version = registry.version
+
+    def configure_registry_store(self, config):
+        """Set where the registry is saved (see registry_store). The first
+        component to configure it wins."""
+        with self._lock:
+            if self.registry_store is None:
+                self.registry_store = create_registry_store(config)
+
+    def load_registry_snapshot(self, provisional_ttl_ms):
+        """Add the agents from the saved registry that haven't registered yet. They
+        expire after provisional_ttl_ms unless they register again before then.
+        Returns the number of agents added."""
+        if not self.registry_store:
+            return 0
+        try:
+            snapshot = self.registry_store.load()
+        except Exception as e:
+            log.error("Failed to load the agent registry snapshot: %s", str(e))
+            return 0
+        with self._lock:
+            agents = dict(self.registry.agents)
+            expire_time = datetime.now() + timedelta(milliseconds=provisional_ttl_ms)
+            num_loaded = 0
+            for agent_name, agent in snapshot.items():
+                if agent_name in agents:
+                    # It has already registered
+                    continue
+                agent["state"] = "closed"
+                agent["expire_time"] = expire_time
+                agents[agent_name] = agent
+                num_loaded += 1
+            if num_loaded:
+                self._set_registry(agents)
+        self._save_registry()
+        return num_loaded
+
+    def record_response_repair(self, repairs):
+        with self._lock:
+            self.response_repair_stats["repaired"] += 1
+            for repair in repairs:
+                self.response_repair_stats["repairs"][repair] = (
+                    self.response_repair_stats["repairs"].get(repair, 0) + 1
+                )
+
+    def record_response_reinvoke(self):
+        with self._lock:
+            self.response_repair_stats["reinvoked"] += 1
+
+    def get_response_repair_stats(self):
+        with self._lock:
+            return copy.deepcopy(self.response_repair_stats)
+
+    def record_stimulus_wait(self, stimulus_type, wait_time):
+        with self._lock:
+            stats = self.stimulus_wait_stats.setdefault(
+                stimulus_type, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["count"] += 1
+            stats["total_seconds"] += wait_time
+            stats["max_seconds"] = max(stats["max_seconds"], wait_time)
+
+    def get_stimulus_wait_stats(self):
+        """The queue wait times by stimulus type ('user' or 'reinvoke')"""
+        with self._lock:
+            return {
+                stimulus_type: {
+                    **stats,
+                    "average_seconds": stats["total_seconds"] / stats["count"],
+                }
+                for stimulus_type, stats in self.stimulus_wait_stats.items()
+            }
+
+    def get_stats(self):
+        return {
+            "response_repair": self.get_response_repair_stats(),
+            "stimulus_wait": self.get_stimulus_wait_stats(),
+            "session_state": self.get_session_state_stats(),
+        }
+
+    def configure_session_state(self, config):
+        """Change where the session state is kept. The config is the session
+        time_to_live plus the settings for its type (see session_state_store)."""
+        config = {**self.session_state_config, **(config or {})}
+        with self._session_lock:
+            if config != self.session_state_config:
+                self.session_state_store = create_session_state_store(config)
+                self.session_state_config = config
+
+    def get_session_state_stats(self):
+        return self.session_state_store.get_stats()
 
     def get_session_state(self, session_id):
-        if not session_id in self._session_state:
-            self._session_state[session_id] = {}
-        return self._session_state[session_id]
+        """Get the session's state. It must not be modified - use the setters."""
+        return self.session_state_store.get(session_id)
+
+    def _set_session_value(self, session_id, key, value):
+        """Must be called with the session lock held"""
+        session_state = dict(self.session_state_store.get(session_id))
+        session_state[key] = value
+        self.session_state_store.set(session_id, session_state)
 
     def get_agent_state(self, session_id):
-        session_state = self.get_session_state(session_id)
-        if "agent_state" not in session_state:
-            session_state["agent_state"] = {
-                "global": {"agent_name": "global", "state": "open"}
-            }
-        return session_state["agent_state"]
+        agent_state = self.get_session_state(session_id).get("agent_state")
+        if not agent_state:
+            agent_state = {"global": {"agent_name": "global", "state": "open"}}
+        return agent_state
 
     def set_agent_state(self, session_id, agent_state):
-        session_state = self.get_session_state(session_id)
-        session_state["agent_state"] = agent_state
+        with self._session_lock:
+            self._set_session_value(session_id, "agent_state", agent_state)
 
     def get_current_subject_starting_id(self, session_id):
         session_state = self.get_session_state(session_id)
         return session_state.get("current_subject_starting_id")
 
     def set_current_subject_starting_id(self, session_id, current_subject_starting_id):
-        session_state = self.get_session_state(session_id)
-        session_state["current_subject_starting_id"] = current_subject_starting_id
+        with self._session_lock:
+            self._set_session_value(
+                session_id, "current_subject_starting_id", current_subject_starting_id
+            )
 
     def update_agent_state(
         self, agent_name: str, new_state: str, session_id
@@ -124,18 +298,20 @@ class OrchestratorState:
         """
         Handle an app state change. Return whether or not
         """
-        with self._lock:
+        with self._session_lock:
             if agent_name == "global":
                 return None
             old_state = "closed"
-            conversation_agent_state = self.get_agent_state(session_id)
+            conversation_agent_state = dict(self.get_agent_state(session_id))
             if agent_name in conversation_agent_state:
                 old_state = conversation_agent_state[agent_name].get("state", "closed")
             conversation_agent_state[agent_name] = {
                 "agent_name": agent_name,
                 "state": new_state,
             }
-            self.set_agent_state(session_id, conversation_agent_state)
+            self._set_session_value(
+                session_id, "agent_state", conversation_agent_state
+            )
             if old_state == "closed" and new_state == "open":
                 return ActionResponse(
                     invoke_model_again=True,
@@ -146,15 +322,16 @@ class OrchestratorState:
         session_id = user_properties.get("session_id", "")
         result = {}
         middleware_service = MiddlewareService()
+        session_agent_state = self.get_agent_state(session_id)
 
-        for agent_name, agent in self.registered_agents.items():
+        for agent_name, agent in self.registry.agents.items():
             actions = agent.get("actions", [])
             filtered_actions = middleware_service.get("filter_action")(
                 user_properties, actions
             )
 
             if filtered_actions:
-                agent_state = self.get_agent_state(session_id).get(agent_name, {})
+                agent_state = session_agent_state.get(agent_name, {})
                 state = agent_state.get("state", "closed")
 
                 result[agent_name] = {
@@ -170,3 +347,23 @@ class OrchestratorState:
                     result[agent_name]["actions"] = filtered_actions
 
         return result
+
+
+class AgentRegistrySnapshot:
+    """A read only view of the registered agents at one registry version, with the
+    agents' actions indexed by (agent_name, action_name)"""
+
+    __slots__ = ("version", "agents", "actions")
+
+    def __init__(self, version, agents):
+        self.version = version
+        self.agents = MappingProxyType(agents)
+        actions = {}
+        for agent_name, agent in agents.items():
+            for action in agent.get("actions") or []:
+                if action is None:
+                    continue
+                for action_name, action_obj in action.items():
+                    # The first one wins, as it did when the actions were searched
+                    actions.setdefault((agent_name, action_name), action_obj)
+        self.actions = MappingProxyType(actions)
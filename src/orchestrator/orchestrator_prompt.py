@@ -1,7 +1,9 @@
+from functools import lru_cache
 from typing import Dict, Any, List
 import yaml
 from ..services.file_service import FS_PROTOCOL, Types, LLM_QUERY_OPTIONS, TRANSFORMERS
 from solace_ai_connector.common.log import log
+from .orchestrator_tools import TOOL_NAME_SEPARATOR
 
 # Cap the number of examples so we don't overwhelm the LLM
 MAX_SYSTEM_PROMPT_EXAMPLES = 6
@@ -32,6 +34,14 @@ fixed_examples = [
 
 
 def get_file_handling_prompt(tp: str) -> str:
+    # The prompt only depends on the tag prefix, so it is built once with a
+    # placeholder for it
+    return get_file_handling_prompt_template().replace("{tp}", tp)
+
+
+@lru_cache(maxsize=1)
+def get_file_handling_prompt_template() -> str:
+    tp = "{tp}"
     parameters_desc = ""
     parameter_examples = ""
 
@@ -46,9 +56,6 @@ def get_file_handling_prompt(tp: str) -> str:
     parameters_desc = "\n     ".join(parameters_desc.split("\n"))
     parameter_examples = "\n     ".join(parameter_examples.split("\n"))
 
-    parameters_desc = parameters_desc.replace("{tp}", tp)
-    parameter_examples = parameter_examples.replace("{tp}", tp)
-
     if parameter_examples:
         parameter_examples = f"""
     Here are some examples of how to use the query parameters:
@@ -153,6 +160,59 @@ def create_examples(
     return "\n".join([example.replace("{tp}", tp) for example in formatted_examples])
 
 
+def get_request_context(info: Dict[str, Any]) -> str:
+    """The parts of the system prompt that are specific to the originator"""
+    available_files = ""
+    if info.get("available_files"):
+        blocks = "\n\n".join(info["available_files"])
+        available_files = (
+            "\n<available_files>\n"
+            "The following files are available for access, only use them if needed:\n"
+            f"\n{blocks}\n"
+            "</available_files>\n"
+        )
+
+    return (
+        "<stimulus_originator_metadata>\n"
+        f"{info['originator_info_yaml']}\n"
+        "</stimulus_originator_metadata>\n"
+        f"{available_files}"
+    )
+
+
+def RequestContextPrompt(info: Dict[str, Any]) -> str:
+    """The originator specific context that the stable layout moves from the
+    system prompt to the end of the user turn. This keeps the system prompt the
+    same between requests so that the LLM provider can cache it."""
+    tp = info["tag_prefix"]
+    return f"\n<{tp}request_context>\n{get_request_context(info)}</{tp}request_context>\n"
+
+
+def add_cache_breakpoints(messages: List[dict]) -> List[dict]:
+    """Mark the system prompt and the last message as prompt cache breakpoints.
+    The content of those messages becomes a list of content blocks, which
+    LiteLLM passes on to providers that support cache_control."""
+    if not messages:
+        return messages
+    messages = list(messages)
+    indexes = {0, len(messages) - 1}
+    for idx in indexes:
+        message = messages[idx]
+        if not isinstance(message.get("content"), str):
+            continue
+        messages[idx] = {
+            **message,
+            "content": [
+                {
+                    "type": "text",
+                    "text": message["content"],
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ],
+        }
+    return messages
+
+
 def SystemPrompt(info: Dict[str, Any], action_examples: List[str]) -> str:
     tp = info["tag_prefix"]
     response_format_prompt = info.get("response_format_prompt", "") or ""
@@ -164,19 +224,8 @@ def SystemPrompt(info: Dict[str, Any], action_examples: List[str]) -> str:
         else ""
     )
 
-    available_files = ""
-    if (
-        info.get("available_files")
-        and info.get("available_files") is not None
-        and len(info["available_files"]) > 0
-    ):
-        blocks = "\n\n".join(info["available_files"])
-        available_files = (
-            "\n<available_files>\n"
-            "The following files are available for access, only use them if needed:\n"
-            f"\n{blocks}\n"
-            "</available_files>\n"
-        )
+    # With the stable layout these go in the user turn - see RequestContextPrompt
+    request_context = "" if info.get("stable_layout") else get_request_context(info)
 
     # Merged
     examples = create_examples(fixed_examples, action_examples, tp)
@@ -295,10 +344,72 @@ The assistant's behavior aligns with the system purpose specified below:
 {examples}
 </examples>
 
-<stimulus_originator_metadata>
-{info["originator_info_yaml"]}
-</stimulus_originator_metadata>
-{available_files}
+{request_context}
+
+{response_guidelines_prompt}
+"""
+
+
+def ToolSystemPrompt(info: Dict[str, Any]) -> str:
+    """The system prompt for the tool calling response mode. The actions of the
+    open agents are offered as tools, so there are no action examples or
+    invoke_action rules here."""
+    tp = info["tag_prefix"]
+    response_format_prompt = info.get("response_format_prompt", "") or ""
+    response_format_prompt = response_format_prompt.replace("{{tag_prefix}}", tp)
+    response_guidelines_prompt = (
+        f"<response_guidelines>\nConsider the following when generating a response to the originator:\n"
+        f"{response_format_prompt}</response_guidelines>"
+        if response_format_prompt
+        else ""
+    )
+
+    request_context = "" if info.get("stable_layout") else get_request_context(info)
+
+    handling_files = get_file_handling_prompt(tp)
+
+    return f"""
+Note to avoid unintended collisions, all tag names in the assistant response will start with the value `{tp}`
+<orchestrator_info>
+You are an assistant serving as the orchestrator in an AI agentic system. Your primary functions are to:
+1. Receive stimuli from external sources via the system Gateway
+2. Call the tools of the system agents to address these stimuli
+3. Formulate responses based on the tool results
+
+This process is iterative, where the assistant is reinvoked with the tool results at each step.
+
+The assistant's behavior aligns with the system purpose specified below:
+  <system_purpose>
+  {info["system_purpose"]}
+  </system_purpose>
+  <orchestrator_rules>
+  The assistant (in the role of orchestrator) will:
+  - Each tool is an action of an open agent and is named <agent_name>{TOOL_NAME_SEPARATOR}<action_name>.
+  - Manage system agents by opening and closing them as needed with the global{TOOL_NAME_SEPARATOR}change_agent_status tool:
+    1. Closed agents are listed below but their actions are not available as tools until the agent is opened.
+    2. If closed agents are needed for the next step, open only the required agents and give a brief status update.
+    3. After opening agents, the assistant will be reinvoked with the new tools.
+  - Call the tools to break the stimulus down into smaller tasks. Multiple tools can be called at once and they will run in parallel.
+  - Agents and their actions do not maintain state between calls. Provide full context in the arguments of each call.
+  - After calling tools, end the response and wait for the results. NEVER guess or fill in the results.
+  - The assistant will not guess at an answer. No answer is better than a wrong answer.
+  - When the response has no tool calls, its text is returned to the gateway and the stimulus is complete.
+  - All text in the response is sent back to the gateway, so it must be written for the originator.
+  - Responses that are just letting the originator know that progress is being made should be enclosed in <{tp}status_update/> tags. They should be brief and to the point.
+  - For large grouped output, such as a list of items or a big code block (> 10 lines), create a file by surrounding the output with the tags <{tp}file name="filename" mime_type="mimetype"><data> the content </data></{tp}file>.
+  - Preserve clickable links from tool results that retrieve external knowledge. Only copy links and never create them.
+  - The assistant is concise and professional. It will not thank the user for their request or thank the tools for their results.
+  </orchestrator_rules>
+  <handling_files>
+  {handling_files}
+  </handling_files>
+</orchestrator_info>
+
+<agents-in-yaml>
+{info["agent_state_yaml"]}
+</agents-in-yaml>
+
+{request_context}
 
 {response_guidelines_prompt}
 """
@@ -0,0 +1,107 @@
+"""Helpers for the orchestrator's tool calling response mode, where agent actions
+are offered to the LLM as tools instead of being described in the prompt"""
+
+import json
+import re
+
+# Separates the agent and action names in a tool name. Tool names may only
+# contain letters, digits, underscores and dashes.
+TOOL_NAME_SEPARATOR = "__"
+MAX_TOOL_NAME_LENGTH = 64
+
+
+def get_tool_name(agent_name: str, action_name: str) -> str:
+    """Get the name of the tool for an agent's action"""
+    return f"{agent_name}{TOOL_NAME_SEPARATOR}{action_name}"
+
+
+def split_tool_name(tool_name: str):
+    """Get the agent and action names back from a tool name"""
+    if not tool_name or TOOL_NAME_SEPARATOR not in tool_name:
+        return None, None
+    agent_name, action_name = tool_name.split(TOOL_NAME_SEPARATOR, 1)
+    return agent_name, action_name
+
+
+def parse_param_summary(param_summary: str):
+    """Split an action's prompt summary param, 'name (description)', into its parts"""
+    match = re.match(r"^\s*([\w\-]+)\s*\((.*)\)\s*$", param_summary, re.DOTALL)
+    if match:
+        return match.group(1), match.group(2).strip()
+    return param_summary.strip(), ""
+
+
+def create_action_tools(agents: dict) -> list:
+    """Create the tool definitions for all the actions of the open agents.
+
+    agents is in the form returned by OrchestratorState.get_agents_and_actions"""
+    tools = []
+    for agent_name, agent in agents.items():
+        for action in agent.get("actions") or []:
+            if not action:
+                continue
+            for action_name, action_summary in action.items():
+                tool_name = get_tool_name(agent_name, action_name)
+                if len(tool_name) > MAX_TOOL_NAME_LENGTH:
+                    continue
+                properties = {}
+                for param in action_summary.get("params") or []:
+                    param_name, param_desc = parse_param_summary(param)
+                    properties[param_name] = {
+                        "type": "string",
+                        "description": param_desc,
+                    }
+                tools.append(
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": tool_name,
+                            "description": action_summary.get("desc", ""),
+                            "parameters": {
+                                "type": "object",
+                                "properties": properties,
+                            },
+                        },
+                    }
+                )
+    return tools
+
+
+def tool_calls_to_actions(tool_calls: list, errors: list) -> list:
+    """Convert the LLM's tool calls into actions in the same form as the ones
+    from parse_orchestrator_response. Problems are added to errors."""
+    actions = []
+    for tool_call in tool_calls or []:
+        tool_name = tool_call.get("name")
+        agent_name, action_name = split_tool_name(tool_name)
+        if not agent_name:
+            errors.append(f"Unknown tool: {tool_name}")
+            continue
+        arguments = tool_call.get("arguments") or "{}"
+        try:
+            parameters = json.loads(arguments)
+        except json.JSONDecodeError:
+            errors.append(f"Invalid JSON arguments for tool {tool_name}")
+            continue
+        if not isinstance(parameters, dict):
+            errors.append(f"Arguments for tool {tool_name} must be an object")
+            continue
+        actions.append(
+            {
+                "agent": agent_name,
+                "action": action_name,
+                "parameters": parameters,
+            }
+        )
+    return actions
+
+
+def format_tool_calls_for_history(tool_calls: list) -> str:
+    """Describe the tool calls in text so that they can be kept in the history"""
+    lines = []
+    for tool_call in tool_calls or []:
+        lines.append(
+            f"[Called tool {tool_call.get('name')} with arguments "
+            f"{tool_call.get('arguments') or '{}'}]"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,51 @@
+"""Bounded cache for the parts of the orchestrator prompt that are built from the agent registry"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_PROMPT_CACHE_SIZE = 64
+
+
+class PromptCache:
+    """A thread safe LRU cache. Entries are evicted once there are more than max_size."""
+
+    def __init__(self, max_size=DEFAULT_PROMPT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set_max_size(self, max_size):
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            if self.max_size <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self):
+        while len(self._entries) > max(self.max_size, 0):
+            self._entries.popitem(last=False)
@@ -0,0 +1,110 @@
+"""Stores for a snapshot of the registered agents, so that a restarted orchestrator
+knows about them before they next register"""
+
+import json
+import os
+import tempfile
+
+from solace_ai_connector.common.log import log
+
+REGISTRY_STORES = ["file", "redis"]
+DEFAULT_REGISTRY_SNAPSHOT_KEY = "orchestrator:agent_registry"
+
+# Set on each agent by the orchestrator rather than sent by the agent
+REGISTRY_ONLY_AGENT_FIELDS = ["expire_time", "state"]
+
+
+def get_registry_snapshot_data(agents: dict) -> str:
+    """Serialize the agents' summaries"""
+    return json.dumps(
+        {
+            agent_name: {
+                key: value
+                for key, value in agent.items()
+                if key not in REGISTRY_ONLY_AGENT_FIELDS
+            }
+            for agent_name, agent in agents.items()
+        }
+    )
+
+
+class FileRegistryStore:
+    """Keeps the snapshot in a local JSON file. It is replaced atomically so that a
+    crash part way through a save leaves the previous snapshot."""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.path = self.config.get("path")
+        if not self.path:
+            raise ValueError("A 'path' is needed for the file registry snapshot")
+
+    def save(self, agents: dict):
+        data = get_registry_snapshot_data(agents)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(data)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+
+class RedisRegistryStore:
+    """Keeps the snapshot in Redis, where all the orchestrator instances share it"""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "Please install the redis package to use the RedisRegistryStore.\n\t$ pip install redis"
+            )
+
+        self.key = self.config.get("key", DEFAULT_REGISTRY_SNAPSHOT_KEY)
+        self.redis_client = redis.Redis(
+            host=self.config.get("redis_host", "localhost"),
+            port=self.config.get("redis_port", 6379),
+            db=self.config.get("redis_db", 0),
+            decode_responses=True,
+        )
+
+    def save(self, agents: dict):
+        self.redis_client.set(self.key, get_registry_snapshot_data(agents))
+
+    def load(self) -> dict:
+        data = self.redis_client.get(self.key)
+        return json.loads(data) if data else {}
+
+
+def create_registry_store(config=None):
+    """Create the registry snapshot store for the config's type, or None if there
+    is no config"""
+    if not config:
+        return None
+    store_type = config.get("type", "file")
+    if store_type == "file":
+        return FileRegistryStore(config)
+    if store_type == "redis":
+        return RedisRegistryStore(config)
+    raise ValueError(
+        f"Unsupported registry snapshot store: {store_type} - must be one of {REGISTRY_STORES}"
+    )
+
+
+def save_registry_snapshot(store, agents: dict):
+    """Save the snapshot, logging rather than raising on failure - registration
+    must carry on without it"""
+    try:
+        store.save(agents)
+    except Exception as e:
+        log.error("Failed to save the agent registry snapshot: %s", str(e))
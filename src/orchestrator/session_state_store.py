@@ -0,0 +1,154 @@
+"""Stores for the orchestrator's per-session state - which agents are open in each
+session and where its current subject starts"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from ..common.time import THIRTY_MINUTES
+
+DEFAULT_SESSION_STATE_TIME_TO_LIVE = THIRTY_MINUTES
+DEFAULT_MAX_SESSIONS = 10_000
+SESSION_STATE_STORES = ["memory", "redis"]
+
+
+def get_session_state_size(state: dict) -> int:
+    """The approximate size of a session's state in bytes"""
+    return len(json.dumps(state, default=str))
+
+
+class MemorySessionStateStore:
+    """Keeps the session state in memory. Sessions are dropped once they haven't been
+    used for time_to_live seconds, and the least recently used ones are evicted when
+    there are more than max_sessions or they take more than max_bytes (0 for no limit).
+    """
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.time_to_live = self.config.get(
+            "time_to_live", DEFAULT_SESSION_STATE_TIME_TO_LIVE
+        )
+        self.max_sessions = self.config.get("max_sessions", DEFAULT_MAX_SESSIONS)
+        self.max_bytes = self.config.get("max_bytes", 0)
+        # session_id -> (state, last_active_time, size), least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_bytes = 0
+        self.num_expired = 0
+        self.num_evicted = 0
+
+    def get(self, session_id: str) -> dict:
+        with self._lock:
+            self._delete_expired(time.time())
+            entry = self._sessions.get(session_id)
+            if not entry:
+                return {}
+            self._sessions[session_id] = (entry[0], time.time(), entry[2])
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def set(self, session_id: str, state: dict):
+        size = get_session_state_size(state)
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = (state, time.time(), size)
+            self.num_bytes += size
+            self._delete_expired(time.time())
+            self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "type": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self.num_bytes,
+                "expired": self.num_expired,
+                "evicted": self.num_evicted,
+            }
+
+    def _remove(self, session_id):
+        entry = self._sessions.pop(session_id, None)
+        if entry:
+            self.num_bytes -= entry[2]
+
+    def _delete_expired(self, now):
+        # The sessions are in the order they were last used, so the expired ones
+        # are all at the start
+        while self._sessions:
+            session_id, (_, last_active_time, _) = next(iter(self._sessions.items()))
+            if now - last_active_time <= self.time_to_live:
+                break
+            self._remove(session_id)
+            self.num_expired += 1
+
+    def _evict(self):
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions
+            or (self.max_bytes and self.num_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._sessions)))
+            self.num_evicted += 1
+
+
+class RedisSessionStateStore:
+    """Keeps the session state in Redis, so that it survives restarts and is shared
+    by all the orchestrator instances. Redis expires the sessions after time_to_live
+    seconds without use."""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "Please install the redis package to use the RedisSessionStateStore.\n\t$ pip install redis"
+            )
+
+        self.time_to_live = int(
+            self.config.get("time_to_live", DEFAULT_SESSION_STATE_TIME_TO_LIVE)
+        )
+        self.redis_client = redis.Redis(
+            host=self.config.get("redis_host", "localhost"),
+            port=self.config.get("redis_port", 6379),
+            db=self.config.get("redis_db", 0),
+            decode_responses=True,
+        )
+
+    def _get_key(self, session_id):
+        return f"sessions:{session_id}:orchestrator_state"
+
+    def get(self, session_id: str) -> dict:
+        pipeline = self.redis_client.pipeline()
+        pipeline.get(self._get_key(session_id))
+        pipeline.expire(self._get_key(session_id), self.time_to_live)
+        data, _ = pipeline.execute()
+        return json.loads(data) if data else {}
+
+    def set(self, session_id: str, state: dict):
+        self.redis_client.set(
+            self._get_key(session_id), json.dumps(state), ex=self.time_to_live
+        )
+
+    def delete(self, session_id: str):
+        self.redis_client.delete(self._get_key(session_id))
+
+    def get_stats(self) -> dict:
+        return {"type": "redis"}
+
+
+def create_session_state_store(config=None):
+    """Create the session state store for the config's type ('memory' by default)"""
+    config = config or {}
+    store_type = config.get("type", "memory")
+    if store_type == "memory":
+        return MemorySessionStateStore(config)
+    if store_type == "redis":
+        return RedisSessionStateStore(config)
+    raise ValueError(
+        f"Unsupported session state store: {store_type} - must be one of {SESSION_STATE_STORES}"
+    )
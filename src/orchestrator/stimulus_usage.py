@@ -0,0 +1,85 @@
+"""The resources used by a stimulus over all of its LLM calls and actions.
+
+The counts travel with the stimulus in its user properties - through the action
+requests, the agents' responses and the reinvokes - so any orchestrator replica can
+check them against the limits."""
+
+STIMULUS_USAGE_USER_PROPERTY = "stimulus_usage"
+
+STIMULUS_USAGE_COUNTERS = [
+    "llm_calls",
+    "input_characters",
+    "output_characters",
+    "actions",
+]
+
+DEFAULT_STIMULUS_LIMITS = {"llm_calls": 30}
+
+STIMULUS_LIMIT_DESCRIPTIONS = {
+    "llm_calls": "calls to the language model",
+    "input_characters": "characters sent to the language model",
+    "output_characters": "characters generated by the language model",
+    "actions": "actions",
+}
+
+
+def get_stimulus_usage(user_properties):
+    usage = (user_properties or {}).get(STIMULUS_USAGE_USER_PROPERTY) or {}
+    return {counter: int(usage.get(counter, 0)) for counter in STIMULUS_USAGE_COUNTERS}
+
+
+def add_stimulus_usage(user_properties, **amounts):
+    """Add to the stimulus' counters in the user properties and return them"""
+    usage = get_stimulus_usage(user_properties)
+    for counter, amount in amounts.items():
+        if counter not in usage:
+            raise ValueError(f"Unknown stimulus usage counter: {counter}")
+        usage[counter] += amount
+    user_properties[STIMULUS_USAGE_USER_PROPERTY] = usage
+    return usage
+
+
+def get_exceeded_limits(usage, limits, new_actions=0):
+    """Get the counters that are over their limits. The LLM counters stop the next
+    LLM call once they reach their limit. The action count only stops the new
+    actions, so that the model can still answer with the results it has. A limit
+    of 0 or None means no limit."""
+    exceeded = []
+    for counter in STIMULUS_USAGE_COUNTERS:
+        limit = (limits or {}).get(counter)
+        if not limit:
+            continue
+        if counter == "actions":
+            if new_actions and usage.get(counter, 0) + new_actions > limit:
+                exceeded.append(counter)
+        elif usage.get(counter, 0) >= limit:
+            exceeded.append(counter)
+    return exceeded
+
+
+def get_messages_characters(messages):
+    """The number of characters in the content of the LLM request messages"""
+    total = 0
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += len(content)
+        elif isinstance(content, list):
+            # Content blocks, e.g. with cache breakpoints
+            total += sum(
+                len(block.get("text") or "")
+                for block in content
+                if isinstance(block, dict)
+            )
+    return total
+
+
+def format_limit_reached_message(exceeded, limits):
+    reasons = ", ".join(
+        f"{limits[counter]} {STIMULUS_LIMIT_DESCRIPTIONS[counter]}"
+        for counter in exceeded
+    )
+    return (
+        "I had to stop working on this request because it reached its limit of "
+        f"{reasons}. Please try again with a simpler or more specific request."
+    )
@@ -1,7 +1,36 @@
 from abc import ABC, abstractmethod
 
+# The session fields that hold lists of entries. Providers that can store these
+# natively (lists, rows, arrays) do, so that adding an entry doesn't rewrite the rest.
+ENTRY_FIELDS = ["history", "files"]
+
+def get_trimmed_entries(entries: list, keep_last: int = None, drop_last: int = 0) -> list:
+    """
+    The entries left by BaseHistoryProvider.trim_entries.
+    """
+    entries = entries[:max(0, len(entries) - drop_last)]
+    if keep_last is not None:
+        entries = entries[max(0, len(entries) - keep_last):]
+    return entries
+
+def get_session_tail(session: dict, field: str, num_entries: int) -> dict:
+    """
+    The part of the session that BaseHistoryProvider.get_session_tail returns.
+    """
+    if not session:
+        return {}
+    tail = {key: value for key, value in session.items() if key not in ENTRY_FIELDS}
+    entries = session.get(field, [])
+    tail[field] = entries[max(0, len(entries) - num_entries):]
+    return tail
+
+
 class BaseHistoryProvider(ABC):
 
+    # Whether other processes can read and write the sessions too, as they can
+    # in a database that several instances use
+    is_shared = True
+
     def __init__(self, config=None):
         self.config = config or {}
     
@@ -22,6 +51,38 @@ class BaseHistoryProvider(ABC):
         """
         raise NotImplementedError("Method not implemented")
     
+    def get_session_tail(self, session_id: str, field: str, num_entries: int) -> dict:
+        """
+        Retrieve the session with only the last entries of one of its lists and
+        none of its other lists, for callers that only need the latest entries.
+
+        :param session_id: The session identifier.
+        :param field: The list to read, one of ENTRY_FIELDS.
+        :param num_entries: The number of entries to read from the end of the list.
+        :return: The session metadata, or an empty dict if there is no session.
+        """
+        return get_session_tail(self.get_session(session_id), field, num_entries)
+
+    def get_recent_history(self, session_id: str) -> dict:
+        """
+        Retrieve the session for building a prompt from its history. Providers
+        may return only the most recent history entries, so the result must not
+        be written back.
+
+        :param session_id: The session identifier.
+        :return: The session metadata, or an empty dict if there is no session.
+        """
+        return self.get_session(session_id)
+
+    def get_sessions(self, session_ids: list[str]) -> dict:
+        """
+        Retrieve several sessions.
+
+        :param session_ids: The session identifiers.
+        :return: The sessions by their identifiers.
+        """
+        return {session_id: self.get_session(session_id) for session_id in session_ids}
+
     @abstractmethod
     def delete_session(self, session_id: str):
         """
@@ -42,6 +103,33 @@ class BaseHistoryProvider(ABC):
         raise NotImplementedError("Method not implemented")
     
 
+    def set_time_to_live(self, time_to_live) -> bool:
+        """
+        Have the store delete sessions that have not been written to for the given
+        number of seconds, if it can do so by itself.
+
+        :param time_to_live: The time to live in seconds.
+        :return: Whether the store will expire the sessions.
+        """
+        return False
+
+    def delete_inactive_sessions(self, last_active_time: float) -> bool:
+        """
+        Delete the sessions last active before the given time in the store itself,
+        if it can do so without reading each session.
+
+        :param last_active_time: The time, in seconds since the epoch.
+        :return: Whether the store deleted the sessions.
+        """
+        return False
+
+    def flush(self, session_id: str = None):
+        """
+        Write any changes that are held back, for the session or for all sessions.
+
+        :param session_id: The session identifier, or None for all sessions.
+        """
+
     def update_session(self, session_id: str, data: dict):
         """
         Update data in the store using the partial data provided.
@@ -51,4 +139,35 @@ class BaseHistoryProvider(ABC):
         """
         history = self.get_session(session_id).copy()
         history.update(data)
-        self.store_session(session_id, history)
\ No newline at end of file
+        self.store_session(session_id, history)
+
+    def append_entries(self, session_id: str, field: str, entries: list, updates: dict = None):
+        """
+        Append entries to one of the session's lists, creating the session if needed.
+
+        :param session_id: The session identifier.
+        :param field: The list to append to, one of ENTRY_FIELDS.
+        :param entries: The entries to append.
+        :param updates: Other session fields to set at the same time.
+        """
+        history = self.get_session(session_id).copy()
+        history[field] = [*history.get(field, []), *entries]
+        history.update(updates or {})
+        self.store_session(session_id, history)
+
+    def trim_entries(self, session_id: str, field: str, keep_last: int = None, drop_last: int = 0, updates: dict = None):
+        """
+        Remove entries from one of the session's lists: first the last drop_last of
+        them, then all but the last keep_last of those that remain. Both count from
+        the end, so that they don't depend on how many older entries there are.
+
+        :param session_id: The session identifier.
+        :param field: The list to trim, one of ENTRY_FIELDS.
+        :param keep_last: The number of entries to keep, or None to keep them all.
+        :param drop_last: The number of entries to remove from the end.
+        :param updates: Other session fields to set at the same time.
+        """
+        history = self.get_session(session_id).copy()
+        history[field] = get_trimmed_entries(history.get(field, []), keep_last, drop_last)
+        history.update(updates or {})
+        self.store_session(session_id, history)
@@ -0,0 +1,392 @@
+"""
+A write-behind cache of sessions in front of another history provider.
+"""
+import copy
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from solace_ai_connector.common.log import log
+
+from .base_history_provider import BaseHistoryProvider, ENTRY_FIELDS, get_session_tail, get_trimmed_entries
+
+DEFAULT_CACHE_MAX_BYTES = 50_000_000
+DEFAULT_CACHE_FLUSH_INTERVAL = 1
+
+
+class _FieldChanges:
+    """
+    The changes to one of the session's lists since the last flush, as a trim of
+    the stored entries followed by an append of the new ones.
+    """
+    def __init__(self):
+        # The number of stored entries removed from the end
+        self.drop_last = 0
+        # The number of stored entries left, or None if they are all left
+        self.keep_last = None
+        # The number of stored entries in the cache, to count keep_last from
+        self.num_stored = None
+        self.new_entries = []
+        # Whether the whole list is replaced by new_entries
+        self.replaced = False
+
+    def append(self, entries):
+        self.new_entries = [*self.new_entries, *entries]
+
+    def trim(self, num_cached, keep_last, drop_last):
+        if self.replaced:
+            self.new_entries = get_trimmed_entries(self.new_entries, keep_last, drop_last)
+            return
+        if self.num_stored is None:
+            self.num_stored = num_cached - len(self.new_entries)
+        if drop_last > len(self.new_entries):
+            dropped = min(drop_last - len(self.new_entries), self.num_stored)
+            self.drop_last += dropped
+            self.num_stored -= dropped
+            if self.keep_last is not None:
+                self.keep_last = min(self.keep_last, self.num_stored)
+        self.new_entries = self.new_entries[:max(0, len(self.new_entries) - drop_last)]
+        if keep_last is not None:
+            if keep_last < self.num_stored + len(self.new_entries):
+                kept_stored = max(0, keep_last - len(self.new_entries))
+                self.keep_last = kept_stored if self.keep_last is None else min(self.keep_last, kept_stored)
+                self.num_stored = min(self.num_stored, kept_stored)
+            self.new_entries = self.new_entries[max(0, len(self.new_entries) - keep_last):]
+
+    def replace(self, entries):
+        self.replaced = True
+        self.new_entries = list(entries)
+
+
+class _CachedSession:
+    def __init__(self, session_id, data):
+        self.session_id = session_id
+        # Replaced rather than changed in place, so that a flush can write it
+        # without holding the lock
+        self.data = data
+        self.size = len(json.dumps(data))
+        # When the session was last written to the provider, or as near as is known,
+        # as the provider's time to live restarts from there
+        self.active_time = data.get("last_active_time") or time.time()
+        # Guards data and the pending changes
+        self.lock = threading.Lock()
+        # Serializes the flushes, so that they reach the provider in order
+        self.flush_lock = threading.Lock()
+        self.reset_changes()
+        # The provider calls of earlier flushes that are still to be made, in
+        # order. A flush that fails leaves its remaining calls here to be retried
+        # before any later changes.
+        self.pending_writes = []
+
+    def reset_changes(self):
+        self.field_changes = {}
+        self.updates = {}
+        # The whole session is to be stored, or deleted if it is empty
+        self.replaced = False
+
+    def has_changes(self):
+        return bool(self.replaced or self.field_changes or self.updates)
+
+    def is_dirty(self):
+        return bool(self.has_changes() or self.pending_writes)
+
+    def get_field_changes(self, field):
+        if field not in self.field_changes:
+            self.field_changes[field] = _FieldChanges()
+        return self.field_changes[field]
+
+    def set_data(self, data):
+        self.data = data
+        self.size = len(json.dumps(data))
+
+
+class CachedHistoryProvider(BaseHistoryProvider):
+    """
+    Keeps the most recently used sessions in memory, up to a total size of
+    max_bytes. Reads of a cached session don't go to the provider, and changes
+    are applied to the cached session and written to the provider together -
+    every flush_interval seconds, when flush is called at the end of a turn, or
+    before the session is evicted. A session's flushes are written in order, and
+    those that fail are retried before any later changes.
+
+    The changes are worked out from the cached session, so nothing else may write
+    to a session while it is cached. In front of a provider that other instances
+    share, that needs each session's requests to go to one instance, which the
+    sticky_sessions setting says is the case.
+
+    If the provider expires the sessions itself, cached sessions are dropped once
+    they have been inactive for the time to live, so that they are read from the
+    provider again rather than served or written after it has expired them.
+    """
+    def __init__(self, provider: BaseHistoryProvider, config=None):
+        super().__init__(config)
+        if provider.is_shared and not self.config.get("sticky_sessions"):
+            raise ValueError(
+                "The session cache can only be used in front of a history provider "
+                "that other instances share if each session's requests go to the same "
+                "instance. Set 'sticky_sessions' in the session_cache config if they do."
+            )
+        self.provider = provider
+        self.max_bytes = self.config.get("max_bytes", DEFAULT_CACHE_MAX_BYTES)
+        self.flush_interval = self.config.get("flush_interval", DEFAULT_CACHE_FLUSH_INTERVAL)
+        self.sessions = OrderedDict()
+        self.total_size = 0
+        self.time_to_live = None
+        self.lock = threading.Lock()
+        self._stop_signal = threading.Event()
+        self._flush_thread = None
+        if self.flush_interval:
+            self._flush_thread = threading.Thread(target=self._flush_task, daemon=True)
+            self._flush_thread.start()
+
+    def _flush_task(self):
+        while not self._stop_signal.wait(self.flush_interval):
+            try:
+                self.flush()
+                self._drop_expired_sessions()
+            except Exception as e:
+                log.error("Error flushing the history cache: %s", e)
+
+    def stop(self):
+        """
+        Stop the flush thread and write the remaining changes.
+        """
+        self._stop_signal.set()
+        if self._flush_thread:
+            self._flush_thread.join()
+        self.flush()
+
+    def _has_expired(self, cached: _CachedSession) -> bool:
+        """
+        Whether the provider may have expired the session. Must be called with
+        the lock and the session's lock held.
+        """
+        return bool(
+            self.time_to_live
+            and not cached.is_dirty()
+            and time.time() - cached.active_time > self.time_to_live
+        )
+
+    def _drop_expired_sessions(self):
+        with self.lock:
+            for session_id, cached in list(self.sessions.items()):
+                with cached.lock:
+                    if self._has_expired(cached):
+                        del self.sessions[session_id]
+                        self.total_size -= cached.size
+
+    def _get_cached_session(self, session_id: str) -> _CachedSession:
+        """
+        Get the session's cache entry, reading the session from the provider on a
+        miss or if it may have expired there.
+        """
+        with self.lock:
+            cached = self.sessions.get(session_id)
+            if cached:
+                with cached.lock:
+                    expired = self._has_expired(cached)
+                if not expired:
+                    self.sessions.move_to_end(session_id)
+                    return cached
+                del self.sessions[session_id]
+                self.total_size -= cached.size
+        data = self.provider.get_session(session_id)
+        with self.lock:
+            # Another thread may have read it in the meantime
+            if session_id not in self.sessions:
+                self.sessions[session_id] = _CachedSession(session_id, data)
+                self.total_size += self.sessions[session_id].size
+            return self.sessions[session_id]
+
+    def _change(self, session_id: str, apply):
+        """
+        Apply a change to the cached session, then evict sessions if over budget.
+        """
+        while True:
+            cached = self._get_cached_session(session_id)
+            with cached.lock:
+                # Evicted since it was looked up - its changes have been written,
+                # so read it again
+                if self.sessions.get(session_id) is not cached:
+                    continue
+                previous_size = cached.size
+                apply(cached)
+                cached.set_data(cached.data)
+                # Written to the provider by the next flush
+                cached.active_time = time.time()
+            break
+        with self.lock:
+            self.total_size += cached.size - previous_size
+        self._evict()
+
+    def _evict(self):
+        while True:
+            with self.lock:
+                if self.total_size <= self.max_bytes or len(self.sessions) <= 1:
+                    return
+                session_id = next(iter(self.sessions))
+                cached = self.sessions[session_id]
+            # Write the changes first, and keep the session if that fails
+            if not self._flush_session(cached):
+                return
+            with self.lock, cached.lock:
+                if self.sessions.get(session_id) is cached and not cached.is_dirty():
+                    del self.sessions[session_id]
+                    self.total_size -= cached.size
+                elif session_id in self.sessions:
+                    # Changed again while it was written
+                    self.sessions.move_to_end(session_id)
+
+    def flush(self, session_id: str = None):
+        """
+        Write the pending changes of the session, or of every session, to the provider.
+        """
+        with self.lock:
+            if session_id is None:
+                sessions = list(self.sessions.values())
+            else:
+                sessions = [self.sessions[session_id]] if session_id in self.sessions else []
+        for cached in sessions:
+            self._flush_session(cached)
+
+    def _flush_session(self, cached: _CachedSession) -> bool:
+        with cached.flush_lock:
+            with cached.lock:
+                if cached.has_changes():
+                    cached.pending_writes.extend(self._get_writes(
+                        cached.session_id, cached.data, cached.replaced, cached.field_changes, cached.updates
+                    ))
+                    cached.reset_changes()
+                writes = list(cached.pending_writes)
+            for write in writes:
+                try:
+                    write()
+                except Exception as e:
+                    log.error("Failed to write the cached history of session %s: %s", cached.session_id, e)
+                    # The rest are retried by the next flush
+                    return False
+                with cached.lock:
+                    cached.pending_writes.pop(0)
+            return True
+
+    def _get_writes(self, session_id, data, replaced, field_changes, updates) -> list:
+        """
+        The provider calls that make the changes, in order.
+        """
+        provider = self.provider
+        if replaced:
+            if data:
+                return [functools.partial(provider.store_session, session_id, data)]
+            return [functools.partial(provider.delete_session, session_id)]
+
+        writes = []
+        updates = dict(updates)
+        for field, changes in field_changes.items():
+            if changes.replaced:
+                updates[field] = changes.new_entries
+                continue
+            if changes.drop_last or changes.keep_last is not None:
+                writes.append(functools.partial(
+                    provider.trim_entries, session_id, field, keep_last=changes.keep_last, drop_last=changes.drop_last
+                ))
+            if changes.new_entries:
+                # The other changes go with the first append
+                writes.append(functools.partial(provider.append_entries, session_id, field, changes.new_entries, updates))
+                updates = {}
+        if updates:
+            writes.append(functools.partial(provider.update_session, session_id, updates))
+        return writes
+
+    def get_session(self, session_id: str) -> dict:
+        # A copy, so that the caller can't change the cached session
+        return copy.deepcopy(self._get_cached_session(session_id).data)
+
+    def get_session_tail(self, session_id: str, field: str, num_entries: int) -> dict:
+        data = self._get_cached_session(session_id).data
+        return copy.deepcopy(get_session_tail(data, field, num_entries))
+
+    def store_session(self, session_id: str, data: dict):
+        data = copy.deepcopy(data)
+        def apply(cached):
+            cached.data = dict(data)
+            cached.reset_changes()
+            cached.replaced = True
+        self._change(session_id, apply)
+
+    def delete_session(self, session_id: str):
+        def apply(cached):
+            cached.data = {}
+            cached.reset_changes()
+            cached.replaced = True
+        self._change(session_id, apply)
+
+    def update_session(self, session_id: str, data: dict):
+        data = copy.deepcopy(data)
+        def apply(cached):
+            cached.data = {**cached.data, **data}
+            if cached.replaced:
+                return
+            for key, value in data.items():
+                if key in ENTRY_FIELDS:
+                    cached.get_field_changes(key).replace(value)
+                else:
+                    cached.updates[key] = value
+        self._change(session_id, apply)
+
+    def append_entries(self, session_id: str, field: str, entries: list, updates: dict = None):
+        entries, updates = copy.deepcopy((entries, updates))
+        def apply(cached):
+            cached.data = {
+                **cached.data,
+                field: [*cached.data.get(field, []), *entries],
+                **(updates or {}),
+            }
+            if cached.replaced:
+                return
+            cached.get_field_changes(field).append(entries)
+            cached.updates.update(updates or {})
+        self._change(session_id, apply)
+
+    def trim_entries(self, session_id: str, field: str, keep_last: int = None, drop_last: int = 0, updates: dict = None):
+        updates = copy.deepcopy(updates)
+        def apply(cached):
+            entries = cached.data.get(field, [])
+            cached.data = {
+                **cached.data,
+                field: get_trimmed_entries(entries, keep_last, drop_last),
+                **(updates or {}),
+            }
+            if cached.replaced:
+                return
+            cached.get_field_changes(field).trim(len(entries), keep_last, drop_last)
+            cached.updates.update(updates or {})
+        self._change(session_id, apply)
+
+    def get_all_sessions(self) -> list[str]:
+        self.flush()
+        return self.provider.get_all_sessions()
+
+    def get_sessions(self, session_ids: list[str]) -> dict:
+        self.flush()
+        return self.provider.get_sessions(session_ids)
+
+    def set_time_to_live(self, time_to_live) -> bool:
+        if not self.provider.set_time_to_live(time_to_live):
+            return False
+        self.time_to_live = time_to_live
+        return True
+
+    def delete_inactive_sessions(self, last_active_time: float) -> bool:
+        self.flush()
+        if not self.provider.delete_inactive_sessions(last_active_time):
+            return False
+        # Forget the cached sessions that the provider has just deleted
+        with self.lock:
+            for session_id, cached in list(self.sessions.items()):
+                with cached.lock:
+                    if not cached.is_dirty() and cached.data.get("last_active_time", last_active_time) < last_active_time:
+                        del self.sessions[session_id]
+                        self.total_size -= cached.size
+        return True
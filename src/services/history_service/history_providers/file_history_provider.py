@@ -1,18 +1,35 @@
 import json
 import os
-from .base_history_provider import BaseHistoryProvider
+import tempfile
+import threading
+from .base_history_provider import BaseHistoryProvider, get_trimmed_entries
+
+DEFAULT_MAX_LOG_RECORDS = 100
+# Sessions share this many locks
+NUM_SESSION_LOCKS = 64
 
 class FileHistoryProvider(BaseHistoryProvider):
     """
     A simple file-based history provider for storing session data.
+
+    Each session is an append-only JSON Lines file of changes: a full "store" record
+    followed by "append", "trim" and "update" records. Reading replays the records,
+    and once there are more than 'max_log_records' of them the file is compacted
+    back to a single "store" record. Writers of a session, including the
+    compaction, hold its lock, so no record is appended to a file that is being
+    replaced.
     """
+    # Its directory is taken to be local to the instance
+    is_shared = False
     def __init__(self, config=None):
         super().__init__(config)
 
         if not self.config.get("path"):
             raise ValueError("Missing required configuration for FileHistoryProvider, Missing 'path' in configs.")
-        
+
         self.path = self.config.get("path")
+        self.max_log_records = self.config.get("max_log_records", DEFAULT_MAX_LOG_RECORDS)
+        self.session_locks = [threading.RLock() for _ in range(NUM_SESSION_LOCKS)]
 
         if not self._exists(self.path):
             os.makedirs(self.path, exist_ok=True)
@@ -24,8 +41,44 @@ class FileHistoryProvider(BaseHistoryProvider):
         :param session_id: The session identifier.
         :return: A formatted file path.
         """
+        return os.path.join(self.path, f"sessions_{session_id}_history.jsonl")
+
+    def _get_session_lock(self, session_id):
+        return self.session_locks[hash(session_id) % NUM_SESSION_LOCKS]
+
+    def _get_legacy_key(self, session_id):
+        """
+        The file path of a session stored as a single JSON document.
+        """
         return os.path.join(self.path, f"sessions_{session_id}_history.json")
 
+    def _migrate_legacy_file(self, session_id):
+        """
+        Convert a session stored as a single JSON document to the log format.
+        """
+        legacy_path = self._get_legacy_key(session_id)
+        if not self._exists(legacy_path):
+            return
+        with self._get_session_lock(session_id):
+            if self._exists(self._get_key(session_id)) or not self._exists(legacy_path):
+                return
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except json.JSONDecodeError:
+                data = {}
+            self.store_session(session_id, data)
+            os.remove(legacy_path)
+
+    def _append_record(self, session_id: str, record: dict):
+        """
+        Add a change to the end of the session's file.
+        """
+        self._migrate_legacy_file(session_id)
+        with self._get_session_lock(session_id):
+            with open(self._get_key(session_id), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
     def store_session(self, session_id: str, data: dict):
         """
         Store the session metadata.
@@ -33,9 +86,31 @@ class FileHistoryProvider(BaseHistoryProvider):
         :param session_id: The session identifier.
         :param data: The session data to be stored.
         """
-        file_path = self._get_key(session_id)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(json.dumps(data))
+        # Replace the file atomically so that readers never see it half written
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "store", "data": data}) + "\n")
+            with self._get_session_lock(session_id):
+                os.replace(temp_path, self._get_key(session_id))
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def update_session(self, session_id: str, data: dict):
+        self._append_record(session_id, {"op": "update", "updates": data})
+
+    def append_entries(self, session_id: str, field: str, entries: list, updates: dict = None):
+        self._append_record(session_id, {"op": "append", "field": field, "entries": entries, "updates": updates or {}})
+
+    def trim_entries(self, session_id: str, field: str, keep_last: int = None, drop_last: int = 0, updates: dict = None):
+        self._append_record(session_id, {
+            "op": "trim",
+            "field": field,
+            "keep_last": keep_last,
+            "drop_last": drop_last,
+            "updates": updates or {},
+        })
 
     def get_session(self, session_id: str)->dict:
         """
@@ -44,31 +119,72 @@ class FileHistoryProvider(BaseHistoryProvider):
         :param session_id: The session identifier.
         :return: The session metadata as a dictionary.
         """
+        self._migrate_legacy_file(session_id)
         file_path = self._get_key(session_id)
         if not self._exists(file_path):
             return {}
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {}
+
+        data, num_records = self._read_log(file_path)
+        if num_records > self.max_log_records:
+            # Read it again under the lock, so that no record is appended between
+            # the read and the compaction
+            with self._get_session_lock(session_id):
+                if not self._exists(file_path):
+                    return {}
+                data, num_records = self._read_log(file_path)
+                if num_records > self.max_log_records:
+                    self.store_session(session_id, data)
+        return data
+
+    def _read_log(self, file_path: str) -> tuple[dict, int]:
+        """
+        Replay the records of a session's file.
+
+        :return: The session data and the number of records.
+        """
+        data = {}
+        num_records = 0
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A partly written last line
+                    continue
+                num_records += 1
+                if record["op"] == "store":
+                    data = record["data"]
+                elif record["op"] == "append":
+                    data[record["field"]] = [*data.get(record["field"], []), *record["entries"]]
+                elif record["op"] == "trim":
+                    data[record["field"]] = get_trimmed_entries(
+                        data.get(record["field"], []), record["keep_last"], record["drop_last"]
+                    )
+                data.update(record.get("updates", {}))
+        return data, num_records
 
     def get_all_sessions(self) -> list[str]:
         """
         Retrieve all session identifiers.
         """
-        return [f[9:-13] for f in os.listdir(self.path) if f.startswith("sessions_") and f.endswith("_history.json")]
-    
+        sessions = set()
+        for f in os.listdir(self.path):
+            if f.startswith("sessions_") and f.endswith("_history.jsonl"):
+                sessions.add(f[9:-14])
+            elif f.startswith("sessions_") and f.endswith("_history.json"):
+                sessions.add(f[9:-13])
+        return list(sessions)
+
     def delete_session(self, session_id: str):
         """
         Delete the session.
 
         :param session_id: The session identifier.
         """
-        file_path = self._get_key(session_id)
-        if self._exists(file_path):
-            os.remove(file_path)
+        with self._get_session_lock(session_id):
+            for file_path in (self._get_key(session_id), self._get_legacy_key(session_id)):
+                if self._exists(file_path):
+                    os.remove(file_path)
 
     def _exists(self, path: str):
         return os.path.exists(path)
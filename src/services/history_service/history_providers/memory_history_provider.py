@@ -2,13 +2,14 @@
 Memory history provider
 """
 
-from .base_history_provider import BaseHistoryProvider
+from .base_history_provider import BaseHistoryProvider, get_trimmed_entries
 
 
 class MemoryHistoryProvider(BaseHistoryProvider):
     """
     A history provider that stores history in memory.
     """
+    is_shared = False
 
     def __init__(self, config=None):
         super().__init__(config)
@@ -20,6 +21,19 @@ class MemoryHistoryProvider(BaseHistoryProvider):
         
         self.history[session_id].update(data)
 
+    def update_session(self, session_id, data):
+        self.store_session(session_id, data)
+
+    def append_entries(self, session_id, field, entries, updates=None):
+        session = self.history.setdefault(session_id, {})
+        session[field] = [*session.get(field, []), *entries]
+        session.update(updates or {})
+
+    def trim_entries(self, session_id, field, keep_last=None, drop_last=0, updates=None):
+        session = self.history.setdefault(session_id, {})
+        session[field] = get_trimmed_entries(session.get(field, []), keep_last, drop_last)
+        session.update(updates or {})
+
     def get_session(self, session_id):
         if session_id not in self.history:
             return {}
@@ -1,7 +1,7 @@
 """
 MongoDB-based history provider for storing session data.
 """
-from .base_history_provider import BaseHistoryProvider
+from .base_history_provider import BaseHistoryProvider, ENTRY_FIELDS
 
 class MongoDBHistoryProvider(BaseHistoryProvider):
     """
@@ -41,6 +41,44 @@ class MongoDBHistoryProvider(BaseHistoryProvider):
         """
         self.collection.update_one(self._get_key(session_id), {"$set": {"data": data}}, upsert=True)
     
+    def update_session(self, session_id: str, data: dict):
+        self.collection.update_one(
+            self._get_key(session_id),
+            {"$set": {f"data.{key}": value for key, value in data.items()}},
+            upsert=True,
+        )
+
+    def append_entries(self, session_id: str, field: str, entries: list, updates: dict = None):
+        update = {"$push": {f"data.{field}": {"$each": entries}}}
+        if updates:
+            update["$set"] = {f"data.{key}": value for key, value in updates.items()}
+        self.collection.update_one(self._get_key(session_id), update, upsert=True)
+
+    def trim_entries(self, session_id: str, field: str, keep_last: int = None, drop_last: int = 0, updates: dict = None):
+        if not drop_last:
+            update = {}
+            if keep_last is not None:
+                update["$push"] = {f"data.{field}": {"$each": [], "$slice": -keep_last}}
+            if updates:
+                update["$set"] = {f"data.{key}": value for key, value in updates.items()}
+            if update:
+                self.collection.update_one(self._get_key(session_id), update, upsert=True)
+            return
+
+        entries = {"$ifNull": [f"$data.{field}", []]}
+        remaining = {"$subtract": [{"$size": entries}, drop_last]}
+        if keep_last is not None:
+            remaining = {"$min": [remaining, keep_last]}
+        start = {"$subtract": [{"$size": entries}, {"$add": [remaining, drop_last]}]}
+        # An update pipeline, so that the end of the list is removed in the database
+        new_fields = {
+            f"data.{field}": {
+                "$cond": [{"$gt": [remaining, 0]}, {"$slice": [entries, start, remaining]}, []]
+            },
+            **{f"data.{key}": {"$literal": value} for key, value in (updates or {}).items()},
+        }
+        self.collection.update_one(self._get_key(session_id), [{"$set": new_fields}], upsert=True)
+
     def get_session(self, session_id: str)->dict:
         """
         Retrieve the session.
@@ -51,6 +89,22 @@ class MongoDBHistoryProvider(BaseHistoryProvider):
         document = self.collection.find_one(self._get_key(session_id))
         return document.get("data") if document else {}
     
+    def get_session_tail(self, session_id: str, field: str, num_entries: int) -> dict:
+        """
+        Retrieve the session with only the last entries of one of its lists.
+        """
+        projection = {f"data.{other}": 0 for other in ENTRY_FIELDS if other != field}
+        if num_entries:
+            projection[f"data.{field}"] = {"$slice": -num_entries}
+        else:
+            projection[f"data.{field}"] = 0
+        document = self.collection.find_one(self._get_key(session_id), projection)
+        if not document:
+            return {}
+        data = document.get("data", {})
+        data.setdefault(field, [])
+        return data
+
     def get_all_sessions(self) -> list[str]:
         """
         Retrieve all session identifiers.
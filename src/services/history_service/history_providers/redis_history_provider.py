@@ -2,11 +2,17 @@
 A history provider that stores history in Redis.
 """
 import json
-from .base_history_provider import BaseHistoryProvider
+from .base_history_provider import BaseHistoryProvider, ENTRY_FIELDS
+
+DEFAULT_SCAN_COUNT = 1000
 
 class RedisHistoryProvider(BaseHistoryProvider):
     """
     A history provider that stores history in Redis.
+
+    A session is a hash of its fields, with each of the ENTRY_FIELDS in a list of
+    its own so that entries are added with RPUSH and removed with LTRIM. Given a
+    time to live, Redis expires the session's keys itself.
     """
     def __init__(self, config=None):
         super().__init__(config)
@@ -14,14 +20,67 @@ class RedisHistoryProvider(BaseHistoryProvider):
             import redis
         except ImportError:
             raise ImportError("Please install the redis package to use the RedisHistoryProvider.\n\t$ pip install redis")
-        
-        self.redis_client = redis.Redis(
-            host=self.config.get("redis_host", "localhost"),
-            port=self.config.get("redis_port", 6379),
-            db=self.config.get("redis_db", 0),
-            decode_responses=True  # Ensures string output
-        )
-    
+
+        self.response_error = redis.exceptions.ResponseError
+        self.watch_error = redis.exceptions.WatchError
+        self.is_cluster = bool(self.config.get("redis_cluster"))
+        self.scan_count = self.config.get("redis_scan_count", DEFAULT_SCAN_COUNT)
+        self.time_to_live = None
+        self.redis_client = self._create_client(redis)
+
+    def _create_client(self, redis):
+        """
+        Create the client for a single server, a cluster or the master of a
+        sentinel-monitored group, as configured.
+        """
+        options = {
+            "decode_responses": True,  # Ensures string output
+            "password": self.config.get("redis_password"),
+        }
+        if self.config.get("redis_max_connections"):
+            options["max_connections"] = self.config.get("redis_max_connections")
+
+        if self.config.get("redis_sentinels"):
+            from redis.sentinel import Sentinel
+            sentinels = [
+                tuple(sentinel.split(":")) if isinstance(sentinel, str) else tuple(sentinel)
+                for sentinel in self.config.get("redis_sentinels")
+            ]
+            sentinel = Sentinel(
+                [(host, int(port)) for host, port in sentinels],
+                sentinel_kwargs={"password": self.config.get("redis_sentinel_password")},
+            )
+            return sentinel.master_for(
+                self.config.get("redis_sentinel_master", "mymaster"),
+                db=self.config.get("redis_db", 0),
+                **options,
+            )
+
+        if self.is_cluster:
+            from redis.cluster import RedisCluster
+            if self.config.get("redis_url"):
+                return RedisCluster.from_url(self.config.get("redis_url"), **options)
+            return RedisCluster(
+                host=self.config.get("redis_host", "localhost"),
+                port=self.config.get("redis_port", 6379),
+                **options,
+            )
+
+        if self.config.get("redis_url"):
+            pool = redis.ConnectionPool.from_url(self.config.get("redis_url"), **options)
+        else:
+            pool = redis.ConnectionPool(
+                host=self.config.get("redis_host", "localhost"),
+                port=self.config.get("redis_port", 6379),
+                db=self.config.get("redis_db", 0),
+                **options,
+            )
+        return redis.Redis(connection_pool=pool)
+
+    def set_time_to_live(self, time_to_live) -> bool:
+        self.time_to_live = time_to_live
+        return True
+
     def _get_key(self, session_id):
         """
         Generate a Redis key with a specific prefix for a session.
@@ -29,7 +88,106 @@ class RedisHistoryProvider(BaseHistoryProvider):
         :param session_id: The session identifier.
         :return: A formatted Redis key string.
         """
-        return f"sessions:{session_id}:history"
+        return f"sessions:{self._get_key_id(session_id)}:history"
+
+    def _get_key_id(self, session_id):
+        # In a cluster, the hash tag puts all of the session's keys in the same
+        # slot, so that they can be used together in a pipeline
+        return f"{{{session_id}}}" if self.is_cluster else session_id
+
+    def _get_entries_key(self, session_id, field):
+        """
+        The key of the list holding one of the session's ENTRY_FIELDS.
+        """
+        return f"sessions:{self._get_key_id(session_id)}:{field}_entries"
+
+    def _get_keys(self, session_id):
+        return [self._get_key(session_id), *(self._get_entries_key(session_id, field) for field in ENTRY_FIELDS)]
+
+    def _pipeline(self):
+        # Cluster pipelines can't be transactions
+        return self.redis_client.pipeline(transaction=not self.is_cluster)
+
+    def _add_expiry(self, pipeline, session_id):
+        """
+        Add the commands that restart the expiry of the session's keys.
+        """
+        if self.time_to_live:
+            for key in self._get_keys(session_id):
+                pipeline.pexpire(key, int(self.time_to_live * 1000))
+
+    def _add_updates(self, pipeline, session_id, updates):
+        """
+        Add the commands that set the given session fields to the pipeline.
+        """
+        fields = {}
+        for key, value in (updates or {}).items():
+            if key in ENTRY_FIELDS:
+                entries_key = self._get_entries_key(session_id, key)
+                pipeline.delete(entries_key)
+                if value:
+                    pipeline.rpush(entries_key, *(json.dumps(entry) for entry in value))
+            else:
+                fields[key] = json.dumps(value)
+        if fields:
+            pipeline.hset(self._get_key(session_id), mapping=fields)
+
+    def _execute(self, session_id, add_commands):
+        """
+        Run the commands in a transaction, converting a session left in the
+        single JSON string layout first if need be. That is checked beforehand,
+        as Redis doesn't roll back the commands of a transaction that ran before
+        one failed on the old key.
+        """
+        self._migrate_legacy_session(session_id)
+        pipeline = self._pipeline()
+        add_commands(pipeline)
+        return pipeline.execute()
+
+    def _read(self, session_id, add_commands):
+        """
+        Run read only commands in a transaction. They fail on a session in the
+        old layout without changing anything, so it is only converted then.
+        """
+        for attempt in range(2):
+            pipeline = self._pipeline()
+            add_commands(pipeline)
+            try:
+                return pipeline.execute()
+            except self.response_error as e:
+                if attempt or "WRONGTYPE" not in str(e) or not self._migrate_legacy_session(session_id):
+                    raise
+
+    def _migrate_legacy_session(self, session_id) -> bool:
+        key = self._get_key(session_id)
+        if self.is_cluster:
+            # Clusters were not supported with the old layout
+            return False
+        if self.redis_client.type(key) != "string":
+            return False
+        with self.redis_client.pipeline() as pipeline:
+            try:
+                # Another client converting it at the same time would add the
+                # old entries twice, so the conversion fails if the key changes
+                pipeline.watch(key)
+                if pipeline.type(key) != "string":
+                    return True
+                data = json.loads(pipeline.get(key) or "{}")
+                pipeline.multi()
+                # Entries may have been appended to the lists already, as that
+                # doesn't touch the old key, so put the old entries in front of them
+                pipeline.delete(key)
+                for field in ENTRY_FIELDS:
+                    entries = data.pop(field, None)
+                    if entries:
+                        pipeline.lpush(self._get_entries_key(session_id, field), *(json.dumps(entry) for entry in reversed(entries)))
+                self._add_updates(pipeline, session_id, data)
+                self._add_expiry(pipeline, session_id)
+                pipeline.execute()
+            except self.watch_error:
+                # It was converted by the other client
+                pass
+        return True
 
     def store_session(self, session_id: str, data: dict):
         """
@@ -38,7 +196,52 @@ class RedisHistoryProvider(BaseHistoryProvider):
         :param session_id: The session identifier.
         :param data: The session data to be stored.
         """
-        self.redis_client.set(self._get_key(session_id), json.dumps(data))
+        def add_commands(pipeline):
+            pipeline.delete(*self._get_keys(session_id))
+            self._add_updates(pipeline, session_id, data)
+            self._add_expiry(pipeline, session_id)
+        self._execute(session_id, add_commands)
+
+    def update_session(self, session_id: str, data: dict):
+        def add_commands(pipeline):
+            self._add_updates(pipeline, session_id, data)
+            self._add_expiry(pipeline, session_id)
+        self._execute(session_id, add_commands)
+
+    def append_entries(self, session_id: str, field: str, entries: list, updates: dict = None):
+        def add_commands(pipeline):
+            if entries:
+                pipeline.rpush(self._get_entries_key(session_id, field), *(json.dumps(entry) for entry in entries))
+            self._add_updates(pipeline, session_id, updates)
+            self._add_expiry(pipeline, session_id)
+        self._execute(session_id, add_commands)
+
+    def trim_entries(self, session_id: str, field: str, keep_last: int = None, drop_last: int = 0, updates: dict = None):
+        def add_commands(pipeline):
+            entries_key = self._get_entries_key(session_id, field)
+            if keep_last == 0:
+                # -(0 + drop_last) would be a start of 0 when nothing is dropped, keeping everything
+                pipeline.delete(entries_key)
+            else:
+                start = 0 if keep_last is None else -(keep_last + drop_last)
+                pipeline.ltrim(entries_key, start, -1 - drop_last)
+            self._add_updates(pipeline, session_id, updates)
+            self._add_expiry(pipeline, session_id)
+        self._execute(session_id, add_commands)
+
+    def _add_get_session(self, pipeline, session_id):
+        pipeline.hgetall(self._get_key(session_id))
+        for field in ENTRY_FIELDS:
+            pipeline.lrange(self._get_entries_key(session_id, field), 0, -1)
+
+    def _parse_session(self, results) -> dict:
+        fields, *entry_lists = results
+        if not fields and not any(entry_lists):
+            return {}
+        data = {key: json.loads(value) for key, value in fields.items()}
+        for field, entries in zip(ENTRY_FIELDS, entry_lists):
+            data[field] = [json.loads(entry) for entry in entries]
+        return data
 
     def get_session(self, session_id: str)->dict:
         """
@@ -47,20 +250,58 @@ class RedisHistoryProvider(BaseHistoryProvider):
         :param session_id: The session identifier.
         :return: The session metadata as a dictionary.
         """
-        data = self.redis_client.get(self._get_key(session_id))
-        return json.loads(data) if data else {}
+        return self._parse_session(self._read(session_id, lambda pipeline: self._add_get_session(pipeline, session_id)))
+
+    def get_session_tail(self, session_id: str, field: str, num_entries: int) -> dict:
+        """
+        Retrieve the session with only the last entries of one of its lists.
+        """
+        def add_commands(pipeline):
+            pipeline.hgetall(self._get_key(session_id))
+            # LRANGE key 1 0 is empty, where a start of -0 would be the whole list
+            start, end = (-num_entries, -1) if num_entries else (1, 0)
+            pipeline.lrange(self._get_entries_key(session_id, field), start, end)
+        fields, entries = self._read(session_id, add_commands)
+        if not fields and not entries:
+            return {}
+        data = {key: json.loads(value) for key, value in fields.items()}
+        data[field] = [json.loads(entry) for entry in entries]
+        return data
+
+    def get_sessions(self, session_ids: list[str]) -> dict:
+        """
+        Retrieve several sessions in one round trip.
+        """
+        # Not a transaction, as the sessions may be on different cluster nodes
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for session_id in session_ids:
+            self._add_get_session(pipeline, session_id)
+        results = pipeline.execute(raise_on_error=False)
+
+        sessions = {}
+        num_commands = 1 + len(ENTRY_FIELDS)
+        for index, session_id in enumerate(session_ids):
+            session_results = results[index * num_commands:(index + 1) * num_commands]
+            if any(isinstance(result, Exception) for result in session_results):
+                # Left in the old layout, which get_session converts
+                sessions[session_id] = self.get_session(session_id)
+            else:
+                sessions[session_id] = self._parse_session(session_results)
+        return sessions
 
     def get_all_sessions(self) -> list[str]:
         """
         Retrieve all session identifiers.
         """
-        keys = self.redis_client.keys("sessions:*:history")
-        return [key.split(":")[1] for key in keys]
-    
+        # SCAN rather than KEYS, which blocks the server while it goes through every key
+        keys = self.redis_client.scan_iter(match="sessions:*:history", count=self.scan_count)
+        key_ids = {key[len("sessions:"):-len(":history")] for key in keys}
+        return [key_id[1:-1] if self.is_cluster else key_id for key_id in key_ids]
+
     def delete_session(self, session_id: str):
         """
         Delete the session.
 
         :param session_id: The session identifier.
         """
-        self.redis_client.delete(self._get_key(session_id))
\ No newline at end of file
+        self.redis_client.delete(*self._get_keys(session_id))
@@ -1,8 +1,13 @@
 import json
 
-from .base_history_provider import BaseHistoryProvider
+from solace_ai_connector.common.log import log
+
+from .base_history_provider import BaseHistoryProvider, ENTRY_FIELDS
 from ....common.postgres_database import PostgreSQLDatabase
 from ....common.mysql_database import MySQLDatabase
+from ....common.sql_connection_pool import DEFAULT_POOL_MAX_SIZE, DEFAULT_POOL_MIN_SIZE
+
+DEFAULT_ENTRIES_READ_LIMIT = 200
 
 
 class DatabaseFactory:
@@ -23,60 +28,318 @@ class DatabaseFactory:
 class SQLHistoryProvider(BaseHistoryProvider):
     """
     A history provider that stores session history in a SQL database.
+
+    The sessions table has a row per session, with its last active time in an
+    indexed column and its other fields in a JSON document. Each entry of its
+    ENTRY_FIELDS is a row of the entries table, which is deleted along with the
+    session, so adding or removing entries doesn't rewrite the session and
+    expiring sessions is a single DELETE.
     """
     def __init__(self, config=None):
         super().__init__(config)
         self.db_type = self.config.get("db_type", "postgres")
         self.table_name = self.config.get("table_name", "session_history")
+        self.entries_table_name = f"{self.table_name}_entries"
+        self.entries_read_limit = self.config.get("entries_read_limit", DEFAULT_ENTRIES_READ_LIMIT)
         self.db = DatabaseFactory.get_database(
             self.db_type,
             host=self.config.get("sql_host"),
             user=self.config.get("sql_user"),
             password=self.config.get("sql_password"),
             database=self.config.get("sql_database"),
+            pool_min_size=self.config.get("sql_pool_min_size", DEFAULT_POOL_MIN_SIZE),
+            pool_max_size=self.config.get("sql_pool_max_size", DEFAULT_POOL_MAX_SIZE),
         )
         self._ensure_table_exists()
     
     def _ensure_table_exists(self):
         """
-        Ensures the required table exists in the database.
+        Ensures the required tables exist in the database, migrating a sessions
+        table from the layout that kept everything in its data column.
         """
+        columns = self._get_columns(self.table_name)
+        if columns and "last_active_time" not in columns:
+            self.migrate_blob_layout()
+            return
+
+        # MySQL can't have a TEXT primary key
+        session_id_type = "TEXT" if self.db_type == "postgres" else "VARCHAR(255)"
         query = f"""
         CREATE TABLE IF NOT EXISTS {self.table_name} (
-            session_id TEXT PRIMARY KEY,
+            session_id {session_id_type} PRIMARY KEY,
+            last_active_time DOUBLE PRECISION,
             data JSON
         )
         """
         self.db.execute(query)
-    
-    def store_session(self, session_id: str, data: dict):
+        self._ensure_last_active_time_index()
+        self._ensure_entries_table_exists(session_id_type)
+        if columns:
+            # In case a migration stopped after adding the column
+            self._set_last_active_times()
+
+    def _get_columns(self, table_name: str) -> list[str]:
         """
-        Store or update session metadata.
+        The column names of the table, or an empty list if there is no such table.
+        """
+        schema = "current_schema()" if self.db_type == "postgres" else "DATABASE()"
+        query = f"""
+        SELECT column_name AS column_name FROM information_schema.columns
+        WHERE table_schema = {schema} AND table_name = %s
         """
+        cursor = self.db.execute(query, (table_name,))
+        return [row["column_name"] for row in cursor.fetchall()]
+
+    def _ensure_last_active_time_index(self):
+        index_name = f"{self.table_name}_last_active_time_idx"
+        if self.db_type == "postgres":
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {self.table_name} (last_active_time)")
+            return
+        query = """
+        SELECT COUNT(*) AS count FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """
+        if not self.db.execute(query, (self.table_name, index_name)).fetchone()["count"]:
+            self.db.execute(f"CREATE INDEX {index_name} ON {self.table_name} (last_active_time)")
+
+    def _ensure_entries_table_exists(self, session_id_type: str):
         query = f"""
-        INSERT INTO {self.table_name} (session_id, data) 
-        VALUES (%s, %s) 
-        ON CONFLICT (session_id) DO UPDATE 
-        SET data = EXCLUDED.data
+        CREATE TABLE IF NOT EXISTS {self.entries_table_name} (
+            session_id {session_id_type} NOT NULL,
+            field VARCHAR(32) NOT NULL,
+            position BIGINT NOT NULL,
+            entry JSON,
+            PRIMARY KEY (session_id, field, position),
+            FOREIGN KEY (session_id) REFERENCES {self.table_name} (session_id) ON DELETE CASCADE
+        )
+        """
+        self.db.execute(query)
+
+    def migrate_blob_layout(self):
+        """
+        Migrate a sessions table that kept each session as a single JSON document:
+        move the entries to the entries table, then add and index the
+        last_active_time column. This runs when the provider starts and finds the
+        old layout. Each session is moved in a transaction and the column is only
+        added at the end, so a migration that stops part way is finished on the
+        next start.
+        """
+        session_id_type = "TEXT" if self.db_type == "postgres" else "VARCHAR(255)"
+        self._ensure_entries_table_exists(session_id_type)
+
+        rows = self.db.execute(f"SELECT session_id, data FROM {self.table_name}").fetchall()
+        num_migrated = 0
+        for row in rows:
+            data = row["data"] if isinstance(row["data"], dict) else json.loads(row["data"] or "{}")
+            # Moved before the migration stopped
+            if not any(field in data for field in ENTRY_FIELDS):
+                continue
+            with self.db.transaction() as transaction:
+                for field in ENTRY_FIELDS:
+                    self._delete_entries(transaction, row["session_id"], field)
+                    self._insert_entries(transaction, row["session_id"], field, data.get(field, []))
+                query = f"UPDATE {self.table_name} SET data = %s WHERE session_id = %s"
+                data = {key: value for key, value in data.items() if key not in ENTRY_FIELDS}
+                transaction.execute(query, (json.dumps(data), row["session_id"]))
+            num_migrated += 1
+
+        self.db.execute(f"ALTER TABLE {self.table_name} ADD COLUMN last_active_time DOUBLE PRECISION")
+        self._ensure_last_active_time_index()
+        self._set_last_active_times()
+        log.info("Migrated %d sessions in %s to the entries table", num_migrated, self.table_name)
+
+    def _set_last_active_times(self):
+        """
+        Fill the last_active_time column of the migrated sessions from their data.
+        """
+        value = (
+            "CAST(data->>'last_active_time' AS DOUBLE PRECISION)" if self.db_type == "postgres"
+            else "JSON_EXTRACT(data, '$.last_active_time')"
+        )
+        self.db.execute(f"UPDATE {self.table_name} SET last_active_time = {value} WHERE last_active_time IS NULL")
+
+    def _get_data(self, db, session_id: str, for_update: bool = False):
+        """
+        The session's fields other than its entries, or None if there is no session.
+        """
+        query = f"SELECT last_active_time, data FROM {self.table_name} WHERE session_id = %s"
+        if for_update:
+            query += " FOR UPDATE"
+        row = db.execute(query, (session_id,)).fetchone()
+        if not row:
+            return None
+        data = row["data"] if isinstance(row["data"], dict) else json.loads(row["data"] or "{}")
+        if row["last_active_time"] is not None:
+            data["last_active_time"] = row["last_active_time"]
+        return data
+
+    def _lock_session(self, transaction, session_id: str) -> dict:
+        """
+        Create the session's row if there isn't one, and lock it until the end of
+        the transaction so that other writers of the session wait for this one.
+        Returns the session's fields other than its entries.
+        """
+        query = f"""
+        INSERT INTO {self.table_name} (session_id, data) VALUES (%s, %s)
+        ON CONFLICT (session_id) DO NOTHING
         """ if self.db_type == "postgres" else f"""
-        INSERT INTO {self.table_name} (session_id, data) 
-        VALUES (%s, %s) 
-        ON DUPLICATE KEY UPDATE data = VALUES(data)
+        INSERT INTO {self.table_name} (session_id, data) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE session_id = session_id
         """
-        self.db.execute(query, (session_id, json.dumps(data)))
-    
+        transaction.execute(query, (session_id, json.dumps({})))
+        return self._get_data(transaction, session_id, for_update=True)
+
+    def _write(self, session_id: str, write):
+        """
+        Run write(transaction, data) in a transaction holding the lock on the
+        session, where data is the session's fields other than its entries.
+        """
+        with self.db.transaction() as transaction:
+            write(transaction, self._lock_session(transaction, session_id))
+
+    def _store_data(self, transaction, session_id: str, data: dict):
+        last_active_time = data.get("last_active_time")
+        data = {key: value for key, value in data.items() if key != "last_active_time"}
+        query = f"UPDATE {self.table_name} SET last_active_time = %s, data = %s WHERE session_id = %s"
+        transaction.execute(query, (last_active_time, json.dumps(data), session_id))
+
+    def _get_entries(self, session_id: str, field: str, limit: int = None) -> list:
+        """
+        The last limit entries of the list, or all of them.
+        """
+        query = f"""
+        SELECT entry FROM {self.entries_table_name}
+        WHERE session_id = %s AND field = %s ORDER BY position DESC
+        """
+        params = (session_id, field)
+        if limit is not None:
+            query += " LIMIT %s"
+            params += (limit,)
+        cursor = self.db.execute(query, params)
+        return [
+            row["entry"] if not isinstance(row["entry"], str) else json.loads(row["entry"])
+            for row in reversed(cursor.fetchall())
+        ]
+
+    def _insert_entries(self, transaction, session_id: str, field: str, entries: list):
+        """
+        Add the entries after the last one, in a single INSERT. The caller holds
+        the lock on the session, so no other writer takes the same positions.
+        """
+        if not entries:
+            return
+        query = f"""
+        SELECT MAX(position) AS last_position FROM {self.entries_table_name}
+        WHERE session_id = %s AND field = %s
+        """
+        row = transaction.execute(query, (session_id, field)).fetchone()
+        position = row["last_position"] if row and row.get("last_position") is not None else 0
+        query = f"""
+        INSERT INTO {self.entries_table_name} (session_id, field, position, entry)
+        VALUES {", ".join(["(%s, %s, %s, %s)"] * len(entries))}
+        """
+        params = []
+        for entry in entries:
+            position += 1
+            params.extend((session_id, field, position, json.dumps(entry)))
+        transaction.execute(query, params)
+
+    def _delete_entries(self, transaction, session_id: str, field: str, comparison: str = None, position: int = None):
+        query = f"DELETE FROM {self.entries_table_name} WHERE session_id = %s AND field = %s"
+        if comparison:
+            query += f" AND position {comparison} %s"
+            transaction.execute(query, (session_id, field, position))
+        else:
+            transaction.execute(query, (session_id, field))
+
+    def _get_position_from_end(self, transaction, session_id: str, field: str, offset: int):
+        """
+        The position of the entry with offset entries after it, or None.
+        """
+        query = f"""
+        SELECT position FROM {self.entries_table_name}
+        WHERE session_id = %s AND field = %s ORDER BY position DESC LIMIT 1 OFFSET %s
+        """
+        row = transaction.execute(query, (session_id, field, offset)).fetchone()
+        return row["position"] if row else None
+
+    def _apply_updates(self, transaction, session_id: str, data: dict, updates: dict):
+        """
+        Set the given session fields, replacing the entries of any ENTRY_FIELDS.
+        """
+        if not updates:
+            return
+        self._store_data(transaction, session_id, {
+            **data,
+            **{key: value for key, value in updates.items() if key not in ENTRY_FIELDS},
+        })
+        for key, value in updates.items():
+            if key in ENTRY_FIELDS:
+                self._delete_entries(transaction, session_id, key)
+                self._insert_entries(transaction, session_id, key, value)
+
+    def store_session(self, session_id: str, data: dict):
+        """
+        Store or update session metadata.
+        """
+        def write(transaction, _):
+            self._store_data(transaction, session_id, {key: value for key, value in data.items() if key not in ENTRY_FIELDS})
+            for field in ENTRY_FIELDS:
+                self._delete_entries(transaction, session_id, field)
+                self._insert_entries(transaction, session_id, field, data.get(field, []))
+        self._write(session_id, write)
+
+    def update_session(self, session_id: str, data: dict):
+        self._write(session_id, lambda transaction, stored: self._apply_updates(transaction, session_id, stored, data))
+
+    def append_entries(self, session_id: str, field: str, entries: list, updates: dict = None):
+        def write(transaction, stored):
+            self._apply_updates(transaction, session_id, stored, updates)
+            self._insert_entries(transaction, session_id, field, entries)
+        self._write(session_id, write)
+
+    def trim_entries(self, session_id: str, field: str, keep_last: int = None, drop_last: int = 0, updates: dict = None):
+        def write(transaction, stored):
+            # Find the position of the last entry to drop at each end, then delete up to it
+            if drop_last > 0:
+                position = self._get_position_from_end(transaction, session_id, field, drop_last - 1)
+                if position is not None:
+                    self._delete_entries(transaction, session_id, field, ">=", position)
+            if keep_last is not None:
+                position = self._get_position_from_end(transaction, session_id, field, keep_last)
+                if position is not None:
+                    self._delete_entries(transaction, session_id, field, "<=", position)
+            self._apply_updates(transaction, session_id, stored, updates)
+        self._write(session_id, write)
+
     def get_session(self, session_id: str) -> dict:
         """
         Retrieve a session by ID.
         """
-        query = f"SELECT data FROM {self.table_name} WHERE session_id = %s"
-        cursor = self.db.execute(query, (session_id,))
-        row = cursor.fetchone()
-        if not row.get("data"):
+        data = self._get_data(self.db, session_id)
+        if data is None:
             return {}
-        data = row["data"] if isinstance(row["data"], dict) else json.loads(row["data"])
+        for field in ENTRY_FIELDS:
+            data[field] = self._get_entries(session_id, field)
         return data
     
+    def get_session_tail(self, session_id: str, field: str, num_entries: int) -> dict:
+        """
+        Retrieve a session by ID, with only the last num_entries of one of its lists.
+        """
+        data = self._get_data(self.db, session_id)
+        if data is None:
+            return {}
+        data[field] = self._get_entries(session_id, field, num_entries)
+        return data
+
+    def get_recent_history(self, session_id: str) -> dict:
+        """
+        Retrieve a session by ID, with only the last entries_read_limit entries
+        of its history.
+        """
+        return self.get_session_tail(session_id, "history", self.entries_read_limit)
+
     def get_all_sessions(self) -> list[str]:
         """
         Retrieve all session identifiers.
@@ -84,10 +347,15 @@ class SQLHistoryProvider(BaseHistoryProvider):
         query = f"SELECT session_id FROM {self.table_name}"
         cursor = self.db.execute(query)
         return [row["session_id"] for row in cursor.fetchall()]
+
+    def delete_inactive_sessions(self, last_active_time: float) -> bool:
+        query = f"DELETE FROM {self.table_name} WHERE last_active_time < %s"
+        self.db.execute(query, (last_active_time,))
+        return True
     
     def delete_session(self, session_id: str):
         """
-        Delete a session by ID, ensuring only one row is deleted.
+        Delete a session by ID, along with its entries.
         """
-        query = f"DELETE FROM {self.table_name} WHERE session_id = %s LIMIT 1"
-        self.db.execute(query, (session_id,))
\ No newline at end of file
+        query = f"DELETE FROM {self.table_name} WHERE session_id = %s"
+        self.db.execute(query, (session_id,))
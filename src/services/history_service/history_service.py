@@ -9,7 +9,8 @@ from ...common.time import ONE_HOUR, FIVE_MINUTES, ONE_DAY
 from ...common.constants import HISTORY_MEMORY_ROLE, HISTORY_ACTION_ROLE, HISTORY_USER_ROLE, HISTORY_ASSISTANT_ROLE
 from ..common import AutoExpiry, AutoExpirySingletonMeta
 from .history_providers.index import HistoryProviderFactory
-from .history_providers.base_history_provider import BaseHistoryProvider
+from .history_providers.cached_history_provider import CachedHistoryProvider
+from .history_providers.base_history_provider import BaseHistoryProvider, ENTRY_FIELDS
 from .long_term_memory.long_term_memory import LongTermMemory
 
 DEFAULT_PROVIDER = "memory"
@@ -17,6 +18,11 @@ DEFAULT_PROVIDER = "memory"
 DEFAULT_MAX_TURNS = 40
 DEFAULT_MAX_CHARACTERS = 50_000
 DEFAULT_SUMMARY_TIME_TO_LIVE = ONE_DAY * 5
+EXPIRY_CHECK_BATCH_SIZE = 100
+# The number of entries at the end of the history first read to add an entry,
+# and the number of messages (not actions) it must have if there are more
+HISTORY_TAIL_SIZE = 8
+MIN_HISTORY_TAIL_MESSAGES = 3
 
 DEFAULT_HISTORY_POLICY = {
     "max_turns": DEFAULT_MAX_TURNS,
@@ -54,6 +60,14 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
             self.history_policy
         )
 
+        # Optionally cache the sessions in memory and write their changes behind
+        session_cache_config = self.config.get("session_cache")
+        if session_cache_config:
+            self.history_provider = CachedHistoryProvider(
+                self.history_provider,
+                session_cache_config if isinstance(session_cache_config, dict) else {},
+            )
+
         if self.use_long_term_memory:
             # Setting up the long-term memory service
             self.long_term_memory_config = self.config.get("long_term_memory_config", {})
@@ -69,8 +83,11 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
                 store_config
             )
 
-        # Start the background thread for auto-expiry
-        self._start_auto_expiry_thread(self.expiration_check_interval)
+        # Start the background thread for auto-expiry, unless the provider expires
+        # the sessions itself. Long-term memory needs the thread, as it summarizes
+        # the history when it expires.
+        if self.use_long_term_memory or not self.history_provider.set_time_to_live(self.time_to_live):
+            self._start_auto_expiry_thread(self.expiration_check_interval)
 
     def _get_history_provider(self, provider_type:str, module_path:str="", config:dict={}):
         """
@@ -98,15 +115,23 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
     def _delete_expired_items(self):
         """Checks all history entries and deletes those that have exceeded max_time_to_live."""
         current_time = time.time()
-        sessions = self.history_provider.get_all_sessions()
-        for session_id in sessions:
-            session = self.history_provider.get_session(session_id)
-            if not session:
-                continue
-            elapsed_time = current_time - session["last_active_time"]
-            if elapsed_time > self.time_to_live:
-                self.clear_history(session_id)
-                log.debug("History for session %s has expired", session_id)
+        # Without long-term memory, expired sessions are simply deleted, which
+        # some providers can do in one query
+        if not self.use_long_term_memory and self.history_provider.delete_inactive_sessions(
+            current_time - self.time_to_live
+        ):
+            return
+
+        session_ids = self.history_provider.get_all_sessions()
+        for start in range(0, len(session_ids), EXPIRY_CHECK_BATCH_SIZE):
+            sessions = self.history_provider.get_sessions(session_ids[start:start + EXPIRY_CHECK_BATCH_SIZE])
+            for session_id, session in sessions.items():
+                if not session:
+                    continue
+                elapsed_time = current_time - session["last_active_time"]
+                if elapsed_time > self.time_to_live:
+                    self.clear_history(session_id)
+                    log.debug("History for session %s has expired", session_id)
 
     def _get_empty_history_entry(self):
         """
@@ -154,60 +179,118 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
 
         return assistant_message, history[:index]
     
-    def _filter_actions(self, history:list) -> list:
+    def _get_num_trailing_actions(self, history:list) -> int:
         """
-        Filter out action entries from the history.
+        Get the number of action entries at the end of the history.
         """
-        return [entry for entry in history if entry["role"] != HISTORY_ACTION_ROLE]
-    
-    def store_history(self, session_id: str, role: str, content: Union[str, dict], other_history_props: dict = {}):
+        num_actions = 0
+        for entry in reversed(history):
+            if entry["role"] != HISTORY_ACTION_ROLE:
+                break
+            num_actions += 1
+        return num_actions
+
+    def _get_new_session_fields(self) -> dict:
         """
-        Store a new entry in the history.
+        Get the fields other than the entry lists of a new session.
+        """
+        return {
+            key: value for key, value in self._get_empty_history_entry().items()
+            if key not in ENTRY_FIELDS
+        }
 
-        :param session_id: The session identifier.
-        :param role: The role of the entry to be stored in the history.
-        :param content: The content of the entry to be stored in the history.
-        :param other_history_props: Other history properties such as user identifier.
+    def _get_history_tail(self, session_id: str) -> dict:
         """
-        if not content:
-            return
-        
-        user_identity = other_history_props.get("identity", session_id)
-        
-        history = self.history_provider.get_session(session_id).copy()
-        if not history:
-            history = self._get_empty_history_entry()
+        Get the session with only as much of the end of its history as a new entry
+        needs: the trailing actions and, before them, the last entries that the new
+        entry is merged with or that long-term memory looks at.
+        """
+        num_entries = HISTORY_TAIL_SIZE
+        while True:
+            session = self.history_provider.get_session_tail(session_id, "history", num_entries)
+            entries = session.get("history", [])
+            if (
+                len(entries) < num_entries
+                or len(entries) - self._get_num_trailing_actions(entries) >= MIN_HISTORY_TAIL_MESSAGES
+            ):
+                return session
+            num_entries *= 2
+
+    def _add_history_entry(self, history: dict, role: str, content: str) -> Tuple[list, dict, int, int]:
+        """
+        Add a new entry to the end of the history entries.
+
+        :return: The new entries, the new entry, the number of stored entries it
+            replaces at the end and the new number of turns.
+        """
+        entries = history["history"]
+        num_turns = history["num_turns"]
 
+        # Actions are only ever at the end of the history, as every message either
+        # merges them (assistant) or removes them (user), so removing them is a trim
+        # from the end
         if role == HISTORY_ASSISTANT_ROLE:
-            content, history["history"] = self._merge_assistant_with_actions(content, history["history"])
+            content, entries = self._merge_assistant_with_actions(content, entries)
         elif role == HISTORY_USER_ROLE:
-            history["history"] = self._filter_actions(history["history"])
+            entries = entries[:len(entries) - self._get_num_trailing_actions(entries)]
 
         if (
             self.history_policy.get("enforce_alternate_message_roles")
-            and history["num_turns"] > 0
+            and num_turns > 0
             # Check if the last entry was by the same role
-            and history["history"]
-            and history["history"][-1]["role"] == role
+            and entries
+            and entries[-1]["role"] == role
         ):
-            # Append to last entry
-            history["history"][-1]["content"] += "\n\n" + content
+            # Replace the last entry with one that has both contents
+            new_entry = {**entries[-1], "content": entries[-1]["content"] + "\n\n" + content}
+            entries = entries[:-1]
         else:
             # Add the new entry
-            history["history"].append(
-                {"role": role, "content": content}
-            )
+            new_entry = {"role": role, "content": content}
             # Update the number of turns
-            history["num_turns"] += 1
+            num_turns += 1
+        drop_last = len(history["history"]) - len(entries)
+        return [*entries, new_entry], new_entry, drop_last, num_turns
+
+    def _needs_truncation(self, num_turns: int, num_characters: int) -> bool:
+        return bool(
+            (self.history_policy.get("max_characters") and num_characters > self.history_policy.get("max_characters"))
+            or num_turns > self.history_policy.get("max_turns")
+        )
+
+    def store_history(self, session_id: str, role: str, content: Union[str, dict], other_history_props: dict = {}):
+        """
+        Store a new entry in the history.
+
+        Only the end of the history is read, unless it has to be truncated.
+
+        :param session_id: The session identifier.
+        :param role: The role of the entry to be stored in the history.
+        :param content: The content of the entry to be stored in the history.
+        :param other_history_props: Other history properties such as user identifier.
+        """
+        if not content:
+            return
+        
+        user_identity = other_history_props.get("identity", session_id)
+
+        stored_history = self._get_history_tail(session_id)
+        # Fields to set on the session along with the new entry
+        updates = {} if stored_history else self._get_new_session_fields()
+        history = {**self._get_empty_history_entry(), **stored_history}
+        entries, new_entry, drop_last, num_turns = self._add_history_entry(history, role, content)
 
         # Update the length
-        history["num_characters"] += len(str(content))
-        # Update the last active time
-        history["last_active_time"] = time.time()
+        num_characters = history["num_characters"] + len(str(content))
+
+        if self._needs_truncation(num_turns, num_characters):
+            # Truncation counts from the start of the history, so it needs all of it
+            history = {**self._get_empty_history_entry(), **self.history_provider.get_session(session_id)}
+            entries, new_entry, drop_last, num_turns = self._add_history_entry(history, role, content)
 
         # Extract memory from the last 2 messages if use long term memory is enabled
-        if self.use_long_term_memory and role == HISTORY_USER_ROLE and len(history["history"]) > 2:
-            recent_messages = history["history"][-3:-1].copy()
+        if self.use_long_term_memory and role == HISTORY_USER_ROLE and len(entries) > 2:
+            recent_messages = entries[-3:-1].copy()
             def background_task():
                 memory = self.long_term_memory_service.extract_memory_from_chat(recent_messages)
 
@@ -221,45 +304,61 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
             threading.Thread(target=background_task).start()
 
         # Check if active session history requires truncation
-        if ((self.history_policy.get("max_characters") and (history["num_characters"] > self.history_policy.get("max_characters"))) 
-            or history["num_turns"] > self.history_policy.get("max_turns")):
+        cut_off_index = 0
+        if self._needs_truncation(num_turns, num_characters):
             
-            cut_off_index = 0
-            if history["num_turns"] > self.history_policy.get("max_turns"):
+            if num_turns > self.history_policy.get("max_turns"):
                 cut_off_index = max(0, int(self.history_policy.get("max_turns") * 0.5)) # 40% of max_turns
 
-            if self.history_policy.get("max_characters") and (history["num_characters"] > self.history_policy.get("max_characters")):
+            if self.history_policy.get("max_characters") and (num_characters > self.history_policy.get("max_characters")):
                 index = 0
                 characters = 0
-                while characters < self.history_policy.get("max_characters") and index < len(history["history"]) - 1:
-                    characters += len(str(history["history"][index]["content"]))
+                while characters < self.history_policy.get("max_characters") and index < len(entries) - 1:
+                    characters += len(str(entries[index]["content"]))
                     index += 1
                 cut_off_index = max(cut_off_index, index)
 
-            cut_off_index = min(cut_off_index, len(history["history"])) # Ensure cut_off_index is within bounds 
+            # Ensure cut_off_index is within bounds and keeps the new entry
+            cut_off_index = min(cut_off_index, len(entries) - 1)
 
             if self.use_long_term_memory:
-                cut_of_history = history["history"][:cut_off_index].copy()
+                cut_of_history = entries[:cut_off_index].copy()
                 def background_summary_task():
                     summary = self.long_term_memory_service.summarize_chat(cut_of_history)
                     updated_summary = self.long_term_memory_service.update_summary(history["summary"], summary)
 
-                    fetched_history = self.history_provider.get_session(session_id).copy()
-                    if fetched_history:
-                        fetched_history["summary"] = updated_summary
-                        self.history_provider.store_session(session_id, fetched_history)
+                    if self.history_provider.get_session(session_id):
+                        self.history_provider.update_session(session_id, {"summary": updated_summary})
 
                 threading.Thread(target=background_summary_task).start()
 
-            history["history"] = history["history"][cut_off_index:]
-            history["num_characters"] = sum(len(str(entry["content"])) for entry in history["history"])
-            history["num_turns"] = len(history["history"])
-            history["last_active_time"] = time.time()
+            entries = entries[cut_off_index:]
+            num_characters = sum(len(str(entry["content"])) for entry in entries)
+            num_turns = len(entries)
+
+        updates.update({
+            "num_turns": num_turns,
+            "num_characters": num_characters,
+            "last_active_time": time.time(),
+        })
 
-        # Update the session history
-        return self.history_provider.store_session(session_id, history)
+        # Update the session history with only the changed entries. The new entry
+        # is added after the trim, so it is not counted in keep_last.
+        if cut_off_index or drop_last:
+            keep_last = len(entries) - 1 if cut_off_index else None
+            self.history_provider.trim_entries(session_id, "history", keep_last=keep_last, drop_last=drop_last)
+        return self.history_provider.append_entries(session_id, "history", [new_entry], updates)
 
 
+    def flush(self, session_id:str=None):
+        """
+        Write the session's cached changes to the history provider, e.g. at the end
+        of a turn. Does nothing without the session cache.
+
+        :param session_id: The session identifier, or None for all sessions.
+        """
+        self.history_provider.flush(session_id)
+
     def get_history(self, session_id:str, other_history_props: dict = {}) -> list:
         """
         Retrieve the entire history.
@@ -268,7 +367,7 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
         :param other_history_props: Other history properties such as user identifier.
         :return: The complete history.
         """
-        history = self.history_provider.get_session(session_id)
+        history = self.history_provider.get_recent_history(session_id)
         messages = history.get("history", [])
 
         if self.use_long_term_memory:
@@ -297,18 +396,14 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
         if not actions:
             return
         
-        history = self.history_provider.get_session(session_id).copy()
-        if not history:
-            history = self._get_empty_history_entry()
-
-        for action in actions:
-            history["history"].append(
-                {"role": HISTORY_ACTION_ROLE, "content": action}
-            )
-
-        history["last_active_time"] = time.time()
-
-        return self.history_provider.store_session(session_id, history)
+        # No need to read the session first - the other fields of a session
+        # started by actions are set by the next message
+        return self.history_provider.append_entries(
+            session_id,
+            "history",
+            [{"role": HISTORY_ACTION_ROLE, "content": action} for action in actions],
+            {"last_active_time": time.time()},
+        )
     
 
     def store_file(self, session_id:str, file:dict):
@@ -321,19 +416,16 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
         if not file:
             return
         
-        history = self.history_provider.get_session(session_id).copy()
-        if not history:
-            history = self._get_empty_history_entry()
+        history = self.history_provider.get_session(session_id)
+        updates = {} if history else self._get_new_session_fields()
 
         # Check duplicate
-        for f in history["files"]:
+        for f in history.get("files", []):
             if f.get("url") and f.get("url") == file.get("url"):
                 return
 
-        history["files"].append(file)
-        history["last_active_time"] = time.time()
-
-        return self.history_provider.store_session(session_id, history)
+        updates["last_active_time"] = time.time()
+        return self.history_provider.append_entries(session_id, "files", [file], updates)
 
     def get_files(self, session_id:str) -> list:
         """
@@ -348,16 +440,17 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
         
         files = []
         current_time = time.time()
-        all_files = history["files"].copy()
+        all_files = history.get("files", [])
 
         for file in all_files:
             expiration_timestamp = file.get("expiration_timestamp")
             if expiration_timestamp and current_time > expiration_timestamp:
-                history["files"].remove(file)
                 continue
             files.append(file)
 
-        self.history_provider.store_session(session_id, history)
+        # Only write the session back if some files have expired
+        if len(files) != len(all_files):
+            self.history_provider.update_session(session_id, {"files": files})
         return files
 
 
@@ -371,9 +464,10 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
         :param clear_files: Whether to clear associated files. Default is True.
         """
 
-        history = self.history_provider.get_session(session_id).copy()
+        history = self.history_provider.get_session(session_id)
         if not history:
             return
+        history = {**self._get_empty_history_entry(), **history}
         
         if history.get("history") or (clear_files and history.get("files")):
             cut_off_index = max(0, len(history["history"]) - keep_levels)
@@ -384,21 +478,20 @@ class HistoryService(AutoExpiry, metaclass=AutoExpirySingletonMeta):
                     summary = self.long_term_memory_service.summarize_chat(cut_off_history)
                     updated_summary = self.long_term_memory_service.update_summary(history["summary"], summary)
 
-                    fetched_history = self.history_provider.get_session(session_id).copy()
-                    if fetched_history:
-                        fetched_history["summary"] = updated_summary
-                        self.history_provider.store_session(session_id, fetched_history)
+                    if self.history_provider.get_session(session_id):
+                        self.history_provider.update_session(session_id, {"summary": updated_summary})
                 threading.Thread(target=background_task).start()
 
-            history["history"] = [] if keep_levels <= 0 else history["history"][-keep_levels:]
-            history["num_turns"] = keep_levels
-            history["num_characters"] = sum(len(str(entry["content"])) for entry in history["history"])
-            history["last_active_time"] = time.time()
-
+            kept_history = history["history"][cut_off_index:]
+            updates = {
+                "num_turns": keep_levels,
+                "num_characters": sum(len(str(entry["content"])) for entry in kept_history),
+                "last_active_time": time.time(),
+            }
             if clear_files:
-                history["files"] = []
+                updates["files"] = []
 
-            return self.history_provider.store_session(session_id, history)
+            return self.history_provider.trim_entries(session_id, "history", keep_last=max(0, keep_levels), updates=updates)
         
         # Summaries get cleared at a longer expiry time
         elif  self.use_long_term_memory and history.get("summary"):
@@ -0,0 +1,230 @@
+"""LiteLLM chat model component that can offer tools to the model"""
+
+import uuid
+import time
+
+import litellm
+from litellm import APIConnectionError
+from solace_ai_connector.common.log import log
+from solace_ai_connector.common.message import Message
+from solace_ai_connector.components.general.llm.litellm.litellm_chat_model_base import (
+    LiteLLMChatModelBase,
+    litellm_chat_info_base,
+)
+
+info = litellm_chat_info_base.copy()
+info["class_name"] = "LiteLLMToolChatModel"
+info["description"] = (
+    "LiteLLM chat component. If the request has a list of tools, they are "
+    "passed to the model and its tool calls are returned in 'tool_calls' "
+    "along with the text content."
+)
+
+
+class LiteLLMToolChatModel(LiteLLMChatModelBase):
+    """LiteLLM chat model that passes tools through to the model"""
+
+    def __init__(self, **kwargs):
+        super().__init__(info, **kwargs)
+
+    def invoke(self, message, data):
+        """invoke the model"""
+        tools = data.get("tools")
+        if not tools:
+            return super().invoke(message, data)
+
+        messages = data.get("messages", [])
+        stream = data.get("stream", self.llm_mode == "stream")
+
+        if stream:
+            return self.invoke_tool_stream(message, messages, tools)
+        else:
+            return self.invoke_tool_non_stream(messages, tools)
+
+    def load_balance_with_tools(self, messages, tools, stream):
+        """load balance the messages, offering the tools to the model"""
+        model = self.load_balancer_config[0]["model_name"]
+        try:
+            response = self.router.completion(
+                model=model,
+                messages=messages,
+                tools=tools,
+                stream=stream,
+                **({"stream_options": {"include_usage": True}} if stream else {}),
+            )
+        except litellm.BadRequestError as e:
+            if "ContextWindowExceededError" in str(e):
+                log.error("Context window exceeded error")
+                return self.context_exceeded_response(model)
+            log.error("Bad request error.")
+            raise ValueError("Error LiteLLM bad request") from None
+        except Exception:
+            log.error("LiteLLM API connection error.")
+            raise ValueError("Error LiteLLM API connection") from None
+
+        log.debug("Load balancer responded")
+        return response
+
+    def invoke_tool_non_stream(self, messages, tools):
+        """invoke the model with tools without streaming"""
+        try:
+            start_time = time.time()
+            response = self.load_balance_with_tools(messages, tools, stream=False)
+            processing_time = round(time.time() - start_time, 3)
+            log.debug("Completion processing time: %s seconds", processing_time)
+
+            self.send_metrics(
+                response.usage.prompt_tokens,
+                response.usage.completion_tokens,
+                response.usage.total_tokens,
+                processing_time,
+            )
+            response_message = response.choices[0].message
+            tool_calls = [
+                {
+                    "id": tool_call.id,
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments,
+                }
+                for tool_call in response_message.tool_calls or []
+            ]
+            return {"content": response_message.content or "", "tool_calls": tool_calls}
+        except APIConnectionError as e:
+            log.error("Error invoking LiteLLM")
+            return {"content": str(e), "handle_error": True}
+        except Exception:
+            log.error("Error invoking LiteLLM")
+            raise ValueError("Error invoking LiteLLM") from None
+
+    def invoke_tool_stream(self, message, messages, tools):
+        """invoke the model with tools and stream the text and tool calls"""
+        response_uuid = str(uuid.uuid4())
+        if self.set_response_uuid_in_user_properties:
+            message.set_data("input.user_properties:response_uuid", response_uuid)
+
+        aggregate_result = ""
+        current_batch = ""
+        tool_calls = []
+        first_chunk = True
+        start_time = time.time()
+
+        try:
+            response = self.load_balance_with_tools(messages, tools, stream=True)
+
+            for chunk in response:
+                delta = chunk.choices[0].delta if chunk.choices else None
+                if delta and delta.tool_calls:
+                    add_tool_call_deltas(tool_calls, delta.tool_calls)
+                if delta and delta.content is not None:
+                    aggregate_result += delta.content
+                    current_batch += delta.content
+                    if len(current_batch.split()) >= self.stream_batch_size:
+                        self.send_tool_streaming_message(
+                            message,
+                            current_batch,
+                            aggregate_result,
+                            tool_calls,
+                            response_uuid,
+                            first_chunk,
+                            False,
+                        )
+                        current_batch = ""
+                        first_chunk = False
+                if getattr(chunk, "usage", None):
+                    processing_time = round(time.time() - start_time, 3)
+                    log.debug("Completion processing time: %s seconds", processing_time)
+                    self.send_metrics(
+                        chunk.usage.prompt_tokens,
+                        chunk.usage.completion_tokens,
+                        chunk.usage.total_tokens,
+                        processing_time,
+                    )
+
+        except APIConnectionError as e:
+            log.error("Error invoking LiteLLM")
+            return {
+                "content": str(e),
+                "response_uuid": response_uuid,
+                "handle_error": True,
+            }
+        except Exception:
+            log.error("Error invoking LiteLLM")
+            raise ValueError("Error invoking LiteLLM") from None
+
+        if self.stream_to_next_component:
+            # Just return the last chunk
+            return {
+                "content": aggregate_result,
+                "chunk": current_batch,
+                "tool_calls": tool_calls,
+                "response_uuid": response_uuid,
+                "first_chunk": first_chunk,
+                "last_chunk": True,
+                "streaming": True,
+            }
+
+        if self.stream_to_flow:
+            self.send_tool_streaming_message(
+                message,
+                current_batch,
+                aggregate_result,
+                tool_calls,
+                response_uuid,
+                first_chunk,
+                True,
+            )
+
+        return {
+            "content": aggregate_result,
+            "tool_calls": tool_calls,
+            "response_uuid": response_uuid,
+        }
+
+    def send_tool_streaming_message(
+        self,
+        input_message,
+        chunk,
+        aggregate_result,
+        tool_calls,
+        response_uuid,
+        first_chunk=False,
+        last_chunk=False,
+    ):
+        """Send a streamed batch along with the tool calls seen so far"""
+        result = {
+            "chunk": chunk,
+            "content": aggregate_result,
+            # Copied since the tool calls keep changing as the stream continues
+            "tool_calls": [dict(tool_call) for tool_call in tool_calls],
+            "response_uuid": response_uuid,
+            "first_chunk": first_chunk,
+            "last_chunk": last_chunk,
+            "streaming": True,
+        }
+        message = Message(
+            payload=result,
+            user_properties=input_message.get_user_properties(),
+        )
+        if self.stream_to_flow:
+            self.send_to_flow(self.stream_to_flow, message)
+        elif self.stream_to_next_component:
+            self.process_post_invoke(result, message)
+
+
+def add_tool_call_deltas(tool_calls, deltas):
+    """Merge streamed tool call deltas into the list of tool calls"""
+    for delta in deltas:
+        index = getattr(delta, "index", None)
+        if index is None:
+            index = len(tool_calls)
+        while len(tool_calls) <= index:
+            tool_calls.append({"id": None, "name": "", "arguments": ""})
+        tool_call = tool_calls[index]
+        if getattr(delta, "id", None):
+            tool_call["id"] = delta.id
+        function = getattr(delta, "function", None)
+        if function:
+            if function.name:
+                tool_call["name"] += function.name
+            if function.arguments:
+                tool_call["arguments"] += function.arguments
@@ -1,5 +1,6 @@
 """LLM Request Component for performing LLM service requests."""
 
+import asyncio
 import uuid
 from typing import Dict, Any
 
@@ -8,6 +9,8 @@ from solace_ai_connector.common.log import log
 from solace_ai_connector.common.message import Message
 from solace_ai_connector.common.utils import ensure_slash_on_end
 
+STREAMING_SNAPSHOT_REQUESTS_KEY = "llm_streaming_snapshot_requests"
+
 info = {
     "class_name": "LLMRequestComponent",
     "description": "Component that performs LLM service requests",
@@ -51,6 +54,17 @@ info = {
             "description": "The minimum number of words in a single streaming result.",
             "default": 15,
         },
+        {
+            "name": "stream_delta_mode",
+            "required": False,
+            "description": (
+                "Send only the new text of each streamed batch along with a sequence "
+                "number, instead of also sending the full aggregated response. The "
+                "receiver must rebuild the response and request a full snapshot if a "
+                "batch is missing. The last batch always carries the full response."
+            ),
+            "default": False,
+        },
     ],
     "input_schema": {
         "type": "object",
@@ -106,6 +120,21 @@ info = {
                 "type": "boolean",
                 "description": "Whether this is a streaming response",
             },
+            "tool_calls": {
+                "type": "array",
+                "description": (
+                    "The tool calls made by the model, if tools were offered in "
+                    "the request"
+                ),
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "arguments": {"type": "string"},
+                    },
+                },
+            },
         },
         "required": ["content"],
     },
@@ -128,6 +157,7 @@ class LLMRequestComponent(ComponentBase):
         self.stream_to_next_component = self.get_config("stream_to_next_component")
         self.llm_mode = self.get_config("llm_mode")
         self.stream_batch_size = self.get_config("stream_batch_size")
+        self.stream_delta_mode = self.get_config("stream_delta_mode")
 
         if self.stream_to_flow and self.stream_to_next_component:
             raise ValueError(
@@ -192,53 +222,168 @@ class LLMRequestComponent(ComponentBase):
         Returns:
             Dict[str, Any]: The final response from the LLM service.
         """
-        aggregate_result = ""
-        current_batch = ""
-        first_chunk = True
-
+        stream = self._create_stream_state(llm_message, response_uuid)
         for response_message, last_message in self.do_broker_request_response(
             llm_message,
             stream=True,
             streaming_complete_expression="input.payload:last_chunk",
         ):
-            # Only process if the stimulus UUIDs correlate
-            if not self._correlate_request_and_response(input_message, response_message):
-                log.error("Mismatched request and response stimulus UUIDs: %s %s",
-                        self._get_user_propery(input_message, "stimulus_uuid"),
-                        self._get_user_propery(response_message, "stimulus_uuid"))                
-                raise ValueError("Mismatched request and response stimulus UUIDs")
-
-            payload = response_message.get_payload()
-            content = payload.get("chunk", "")
-            aggregate_result += content
-            current_batch += content
-
-            if payload.get("handle_error", False):
-                log.error("Error invoking LLM service: %s", payload.get("content", ""), exc_info=True)
-                aggregate_result = payload.get("content", None)
-                last_message = True
-
-            if len(current_batch.split()) >= self.stream_batch_size or last_message:
-                self._send_streaming_chunk(
-                    input_message,
-                    current_batch,
-                    aggregate_result,
-                    response_uuid,
-                    first_chunk,
-                    last_message,
-                )
-                current_batch = ""
-                first_chunk = False
+            if self._add_streamed_response(
+                input_message, stream, response_message, last_message
+            ):
+                break
+
+        return self._get_streamed_result(stream)
 
+    async def _handle_streaming_async(
+        self,
+        input_message: Message,
+        llm_message: Message,
+        response_uuid: str,
+        responses,
+    ) -> Dict[str, Any]:
+        """
+        The same as _handle_streaming, for responses from an async iterator.
+
+        Args:
+            input_message (Message): The original input message.
+            llm_message (Message): The message that was sent to the LLM service.
+            response_uuid (str): The UUID for the response.
+            responses: Async iterator of (response message, last message) pairs.
+
+        Returns:
+            Dict[str, Any]: The final response from the LLM service.
+        """
+        stream = self._create_stream_state(llm_message, response_uuid)
+        async for response_message, last_message in responses:
+            last_message = self._add_to_stream(
+                input_message, stream, response_message, last_message
+            )
+            if self._is_batch_ready(stream, last_message):
+                # Sending the batch, and whatever _process_streaming_batch does with
+                # it, can block, so it runs on a worker thread rather than holding
+                # up the event loop
+                await asyncio.to_thread(
+                    self._send_streamed_batch, input_message, stream, last_message
+                )
             if last_message:
                 break
 
+        return self._get_streamed_result(stream)
+
+    @staticmethod
+    def _create_stream_state(llm_message: Message, response_uuid: str) -> dict:
         return {
-            "content": aggregate_result,
             "response_uuid": response_uuid,
+            "aggregate_result": "",
+            "current_batch": "",
+            "first_chunk": True,
+            "sequence": 0,
+            "tool_calls": [] if llm_message.get_payload().get("tools") else None,
+        }
+
+    def _add_streamed_response(
+        self,
+        input_message: Message,
+        stream: dict,
+        response_message: Message,
+        last_message: bool,
+    ) -> bool:
+        """
+        Add a streamed response message to the stream, sending a chunk once
+        there is a batch of words. Returns whether the stream is complete.
+        """
+        last_message = self._add_to_stream(
+            input_message, stream, response_message, last_message
+        )
+        if self._is_batch_ready(stream, last_message):
+            self._send_streamed_batch(input_message, stream, last_message)
+        return bool(last_message)
+
+    def _add_to_stream(
+        self,
+        input_message: Message,
+        stream: dict,
+        response_message: Message,
+        last_message: bool,
+    ) -> bool:
+        """
+        Add a streamed response message's content to the stream. Returns whether
+        it is the last message, which an error response also is.
+        """
+        # Only process if the stimulus UUIDs correlate
+        if not self._correlate_request_and_response(input_message, response_message):
+            log.error("Mismatched request and response stimulus UUIDs: %s %s",
+                    self._get_user_propery(input_message, "stimulus_uuid"),
+                    self._get_user_propery(response_message, "stimulus_uuid"))
+            raise ValueError("Mismatched request and response stimulus UUIDs")
+
+        payload = response_message.get_payload()
+        content = payload.get("chunk", "")
+        stream["aggregate_result"] += content
+        stream["current_batch"] += content
+        if stream["tool_calls"] is not None and payload.get("tool_calls"):
+            # Each batch carries all the tool calls seen so far
+            stream["tool_calls"] = payload["tool_calls"]
+
+        if payload.get("handle_error", False):
+            log.error("Error invoking LLM service: %s", payload.get("content", ""), exc_info=True)
+            stream["aggregate_result"] = payload.get("content", None)
+            last_message = True
+
+        return last_message
+
+    def _is_batch_ready(self, stream: dict, last_message: bool) -> bool:
+        return bool(
+            len(stream["current_batch"].split()) >= self.stream_batch_size
+            or last_message
+        )
+
+    def _send_streamed_batch(self, input_message: Message, stream: dict, last_message: bool):
+        """
+        Send the stream's current batch as a chunk and act on it.
+        """
+        self._send_streaming_chunk(
+            input_message,
+            stream["current_batch"],
+            stream["aggregate_result"],
+            stream["response_uuid"],
+            stream["first_chunk"],
+            last_message,
+            stream["sequence"],
+            stream["tool_calls"],
+        )
+        self._process_streaming_batch(
+            input_message, stream["aggregate_result"], last_message
+        )
+        stream["current_batch"] = ""
+        stream["first_chunk"] = False
+        stream["sequence"] += 1
+
+    @staticmethod
+    def _get_streamed_result(stream: dict) -> Dict[str, Any]:
+        result = {
+            "content": stream["aggregate_result"],
+            "response_uuid": stream["response_uuid"],
             "streaming": True,
             "last_chunk": True,
         }
+        if stream["tool_calls"] is not None:
+            result["tool_calls"] = stream["tool_calls"]
+        return result
+
+    def _process_streaming_batch(
+        self, input_message: Message, aggregate_result: str, last_chunk: bool
+    ):
+        """
+        Called after each streamed batch has been sent. Subclasses can override this
+        to act on the partial response while the LLM is still streaming.
+
+        Args:
+            input_message (Message): The original input message.
+            aggregate_result (str): The aggregated result so far.
+            last_chunk (bool): Whether this is the last chunk.
+        """
 
     def _create_llm_message(self, message: Message, messages: list, source_info: dict) -> Message:
         """
@@ -274,6 +419,8 @@ class LLMRequestComponent(ComponentBase):
         response_uuid: str,
         first_chunk: bool,
         last_chunk: bool,
+        sequence: int = 0,
+        tool_calls: list = None,
     ):
         """
         Send a streaming chunk to the specified flow or next component.
@@ -285,15 +432,30 @@ class LLMRequestComponent(ComponentBase):
             response_uuid (str): The UUID of the response.
             first_chunk (bool): Whether this is the first chunk.
             last_chunk (bool): Whether this is the last chunk.
+            sequence (int): The sequence number of the chunk within the response.
+            tool_calls (list): The tool calls so far, if tools were offered to the model.
         """
         payload = {
             "chunk": chunk,
-            "content": aggregate_result,
             "response_uuid": response_uuid,
             "first_chunk": first_chunk,
             "last_chunk": last_chunk,
             "streaming": True,
         }
+        if self.stream_delta_mode:
+            # Only send the full response if it was asked for or if this is the end
+            payload["sequence"] = sequence
+            snapshot_requested = pop_streaming_snapshot_request(
+                self.flow_kv_store, self.flow_lock_manager, response_uuid
+            )
+            if last_chunk or snapshot_requested:
+                payload["content"] = aggregate_result
+        else:
+            payload["content"] = aggregate_result
+        if tool_calls is not None:
+            # The text of a tool calling response has no reasoning block
+            payload["tool_calls"] = tool_calls
+            payload["check_reasoning"] = False
         message = Message(
             payload=payload,
             user_properties=input_message.get_user_properties(),
@@ -315,3 +477,25 @@ class LLMRequestComponent(ComponentBase):
         return (LLMRequestComponent._get_user_propery(request_msg, correlation_key) == 
             LLMRequestComponent._get_user_propery(response_msg, correlation_key))
 
+
+
+def request_streaming_snapshot(kv_store, lock_manager, response_uuid):
+    """Ask the sender of a delta mode stream to include the full response in its next chunk"""
+    with lock_manager.get_lock(STREAMING_SNAPSHOT_REQUESTS_KEY):
+        requests = kv_store.get(STREAMING_SNAPSHOT_REQUESTS_KEY)
+        if requests is None:
+            requests = set()
+            kv_store.set(STREAMING_SNAPSHOT_REQUESTS_KEY, requests)
+        requests.add(response_uuid)
+
+
+def pop_streaming_snapshot_request(kv_store, lock_manager, response_uuid):
+    """Return whether a snapshot was requested for the response, clearing the request"""
+    with lock_manager.get_lock(STREAMING_SNAPSHOT_REQUESTS_KEY):
+        requests = kv_store.get(STREAMING_SNAPSHOT_REQUESTS_KEY)
+        if not requests or response_uuid not in requests:
+            return False
+        requests.discard(response_uuid)
+        if not requests:
+            kv_store.set(STREAMING_SNAPSHOT_REQUESTS_KEY, None)
+        return True
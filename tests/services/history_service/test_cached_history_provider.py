@@ -0,0 +1,175 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from solace_agent_mesh.services.history_service.history_providers.cached_history_provider import CachedHistoryProvider
+from solace_agent_mesh.services.history_service.history_providers.memory_history_provider import MemoryHistoryProvider
+
+
+class RecordingHistoryProvider(MemoryHistoryProvider):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.calls = []
+
+    def get_session(self, session_id):
+        self.calls.append("get_session")
+        return super().get_session(session_id)
+
+    def append_entries(self, session_id, field, entries, updates=None):
+        self.calls.append(("append_entries", field, entries))
+        super().append_entries(session_id, field, entries, updates)
+
+    def trim_entries(self, session_id, field, keep_last=None, drop_last=0, updates=None):
+        self.calls.append(("trim_entries", field, keep_last, drop_last))
+        super().trim_entries(session_id, field, keep_last, drop_last, updates)
+
+    def update_session(self, session_id, data):
+        self.calls.append(("update_session", data))
+        super().update_session(session_id, data)
+
+
+class ExpiringHistoryProvider(RecordingHistoryProvider):
+    def set_time_to_live(self, time_to_live):
+        return True
+
+
+class FailingHistoryProvider(RecordingHistoryProvider):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.failures = 0
+
+    def append_entries(self, session_id, field, entries, updates=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Connection lost")
+        super().append_entries(session_id, field, entries, updates)
+
+    def store_session(self, session_id, data):
+        self.calls.append("store_session")
+        super().store_session(session_id, data)
+
+
+class SharedHistoryProvider(RecordingHistoryProvider):
+    is_shared = True
+
+
+class TestCachedHistoryProvider(unittest.TestCase):
+    def get_providers(self, max_bytes=1_000_000):
+        provider = RecordingHistoryProvider()
+        return provider, CachedHistoryProvider(provider, {"flush_interval": 0, "max_bytes": max_bytes})
+
+    def test_reads_through_once(self):
+        provider, cached = self.get_providers()
+        provider.append_entries("session1", "history", [1])
+        provider.calls = []
+
+        self.assertEqual(cached.get_session("session1")["history"], [1])
+        self.assertEqual(cached.get_session("session1")["history"], [1])
+        self.assertEqual(cached.get_session_tail("session1", "history", 1), {"history": [1]})
+        self.assertEqual(provider.calls, ["get_session"])
+
+    def test_changes_are_coalesced(self):
+        provider, cached = self.get_providers()
+        provider.append_entries("session1", "history", [1, 2, 3])
+        provider.calls = []
+
+        cached.append_entries("session1", "history", [4], {"num_turns": 4})
+        cached.append_entries("session1", "history", [5])
+        cached.trim_entries("session1", "history", keep_last=3, drop_last=1)
+        cached.append_entries("session1", "files", [{"url": "a"}])
+        cached.update_session("session1", {"summary": "abc"})
+        self.assertEqual(provider.calls, ["get_session"])
+
+        cached.flush("session1")
+        self.assertEqual(
+            provider.calls[1:],
+            [
+                ("trim_entries", "history", 2, 0),
+                ("append_entries", "history", [4]),
+                ("append_entries", "files", [{"url": "a"}]),
+            ],
+        )
+        self.assertEqual(
+            provider.get_session("session1"),
+            {"history": [2, 3, 4], "files": [{"url": "a"}], "num_turns": 4, "summary": "abc"},
+        )
+
+        provider.calls = []
+        cached.flush("session1")
+        self.assertEqual(provider.calls, [])
+
+    def test_eviction_writes_changes(self):
+        provider, cached = self.get_providers(max_bytes=100)
+        cached.append_entries("session1", "history", ["a" * 60])
+        cached.append_entries("session2", "history", ["b" * 60])
+
+        self.assertEqual(list(cached.sessions), ["session2"])
+        self.assertEqual(provider.get_session("session1")["history"], ["a" * 60])
+        self.assertEqual(cached.get_session("session1")["history"], ["a" * 60])
+
+    def test_delete_session(self):
+        provider, cached = self.get_providers()
+        cached.append_entries("session1", "history", [1])
+        cached.flush()
+        cached.delete_session("session1")
+        self.assertEqual(cached.get_session("session1"), {})
+
+        cached.flush()
+        self.assertEqual(provider.get_session("session1"), {})
+
+    def test_expired_sessions_are_read_again(self):
+        provider = ExpiringHistoryProvider()
+        cached = CachedHistoryProvider(provider, {"flush_interval": 0})
+        self.assertTrue(cached.set_time_to_live(60))
+        cached.append_entries("session1", "history", [1], {"last_active_time": time.time()})
+        cached.flush()
+
+        # The provider expires the session
+        provider.delete_session("session1")
+        self.assertEqual(cached.get_session("session1")["history"], [1])
+        with patch("time.time", return_value=time.time() + 61):
+            self.assertEqual(cached.get_session("session1"), {})
+
+    def test_time_to_live_is_left_to_the_service(self):
+        provider, cached = self.get_providers()
+        self.assertFalse(cached.set_time_to_live(60))
+        self.assertIsNone(cached.time_to_live)
+
+    def test_sessions_are_copied(self):
+        provider, cached = self.get_providers()
+        entries = [{"role": "user", "content": "a"}]
+        cached.append_entries("session1", "history", entries)
+        entries[0]["content"] = "b"
+
+        session = cached.get_session("session1")
+        session["history"].append({"role": "assistant", "content": "c"})
+        self.assertEqual(cached.get_session("session1")["history"], [{"role": "user", "content": "a"}])
+
+    def test_failed_flush_is_retried(self):
+        provider = FailingHistoryProvider()
+        cached = CachedHistoryProvider(provider, {"flush_interval": 0})
+        provider.append_entries("session1", "history", [1, 2, 3])
+        cached.trim_entries("session1", "history", drop_last=1)
+        cached.append_entries("session1", "history", [4], {"num_turns": 3})
+        provider.calls = []
+
+        provider.failures = 1
+        cached.flush()
+        self.assertEqual(provider.get_session("session1")["history"], [1, 2])
+        cached.append_entries("session1", "history", [5])
+        cached.flush()
+
+        # The append that failed is made again, before the later one, and only
+        # the changes are written rather than the whole session
+        writes = [call for call in provider.calls if call != "get_session"]
+        self.assertEqual(writes, [
+            ("trim_entries", "history", None, 1),
+            ("append_entries", "history", [4]),
+            ("append_entries", "history", [5]),
+        ])
+        self.assertEqual(provider.get_session("session1"), {"history": [1, 2, 4, 5], "num_turns": 3})
+
+    def test_shared_provider_needs_sticky_sessions(self):
+        with self.assertRaises(ValueError):
+            CachedHistoryProvider(SharedHistoryProvider(), {"flush_interval": 0})
+        CachedHistoryProvider(SharedHistoryProvider(), {"flush_interval": 0, "sticky_sessions": True})
@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from solace_agent_mesh.services.history_service.history_providers.file_history_provider import FileHistoryProvider
+from solace_agent_mesh.services.history_service.history_providers.memory_history_provider import MemoryHistoryProvider
+from solace_agent_mesh.services.history_service.history_providers.redis_history_provider import RedisHistoryProvider
+
+
+def get_redis_provider(config=None):
+    provider = RedisHistoryProvider(config)
+    provider.redis_client = fakeredis.FakeRedis(decode_responses=True)
+    return provider
+
+
+class TestHistoryProviders(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def get_providers(self):
+        providers = [MemoryHistoryProvider(), FileHistoryProvider({"path": self.path})]
+        if fakeredis:
+            providers.append(get_redis_provider())
+        return providers
+
+    def test_append_and_trim_entries(self):
+        for provider in self.get_providers():
+            provider.append_entries("session1", "history", [1, 2, 3], {"num_turns": 3})
+            provider.append_entries("session1", "history", [4, 5])
+            provider.trim_entries("session1", "history", keep_last=3, drop_last=1, updates={"num_turns": 2})
+            provider.append_entries("session1", "files", [{"url": "a"}])
+
+            session = provider.get_session("session1")
+            self.assertEqual(session["history"], [2, 3, 4])
+            self.assertEqual(session["files"], [{"url": "a"}])
+            self.assertEqual(session["num_turns"], 2)
+
+            provider.trim_entries("session1", "history", keep_last=0)
+            self.assertEqual(provider.get_session("session1")["history"], [])
+
+    def test_trim_entries(self):
+        for provider in self.get_providers():
+            provider.append_entries("session1", "history", [1, 2, 3, 4, 5])
+            provider.trim_entries("session1", "history", drop_last=2)
+            self.assertEqual(provider.get_session("session1")["history"], [1, 2, 3])
+
+            provider.trim_entries("session1", "history", keep_last=0, drop_last=1)
+            # Redis has nothing left of a session without fields or entries
+            self.assertEqual(provider.get_session("session1").get("history", []), [])
+
+            provider.append_entries("session1", "history", [1, 2, 3])
+            provider.trim_entries("session1", "history", drop_last=5)
+            self.assertEqual(provider.get_session("session1").get("history", []), [])
+
+            provider.append_entries("session1", "history", [1, 2])
+            provider.trim_entries("session1", "history", keep_last=5)
+            self.assertEqual(provider.get_session("session1")["history"], [1, 2])
+
+    def test_get_session_tail(self):
+        for provider in self.get_providers():
+            self.assertEqual(provider.get_session_tail("session1", "history", 2), {})
+            provider.append_entries("session1", "history", [1, 2, 3], {"num_turns": 3})
+            provider.append_entries("session1", "files", [{"url": "a"}])
+
+            self.assertEqual(provider.get_session_tail("session1", "history", 2), {"history": [2, 3], "num_turns": 3})
+            self.assertEqual(provider.get_session_tail("session1", "history", 5), {"history": [1, 2, 3], "num_turns": 3})
+            self.assertEqual(provider.get_session_tail("session1", "history", 0), {"history": [], "num_turns": 3})
+
+    def test_update_session(self):
+        for provider in self.get_providers():
+            provider.store_session("session1", {"history": [1, 2], "files": [1], "summary": ""})
+            provider.update_session("session1", {"files": [], "summary": "abc"})
+
+            self.assertEqual(
+                provider.get_session("session1"),
+                {"history": [1, 2], "files": [], "summary": "abc"},
+            )
+
+    def test_file_log_compaction(self):
+        provider = FileHistoryProvider({"path": self.path, "max_log_records": 5})
+        for i in range(10):
+            provider.append_entries("session1", "history", [i])
+
+        self.assertEqual(provider.get_session("session1")["history"], list(range(10)))
+        with open(provider._get_key("session1"), "r", encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(provider.get_session("session1")["history"], list(range(10)))
+
+    def test_file_log_compaction_keeps_concurrent_appends(self):
+        provider = FileHistoryProvider({"path": self.path, "max_log_records": 5})
+        for i in range(10):
+            provider.append_entries("session1", "history", [i])
+
+        read_log = provider._read_log
+        def read_log_then_append(file_path):
+            result = read_log(file_path)
+            if len(result[0]["history"]) == 10:
+                # Another writer appends after the session was read
+                provider.append_entries("session1", "history", [10])
+            return result
+        provider._read_log = read_log_then_append
+
+        provider.get_session("session1")
+        provider._read_log = read_log
+        self.assertEqual(provider.get_session("session1")["history"], list(range(11)))
+
+    def test_file_legacy_session(self):
+        with open(os.path.join(self.path, "sessions_session1_history.json"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"history": [1], "files": []}))
+        provider = FileHistoryProvider({"path": self.path})
+
+        self.assertEqual(provider.get_all_sessions(), ["session1"])
+        provider.append_entries("session1", "history", [2])
+        self.assertEqual(provider.get_session("session1")["history"], [1, 2])
+        self.assertEqual(provider.get_all_sessions(), ["session1"])
+
+        provider.delete_session("session1")
+        self.assertEqual(provider.get_all_sessions(), [])
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_time_to_live(self):
+        provider = get_redis_provider()
+        provider.set_time_to_live(60)
+        provider.append_entries("session1", "history", [1], {"num_turns": 1})
+
+        for key in provider._get_keys("session1")[:2]:
+            self.assertGreater(provider.redis_client.pttl(key), 0)
+        self.assertEqual(provider.get_all_sessions(), ["session1"])
+        self.assertEqual(provider.get_sessions(["session1", "session2"]), {
+            "session1": {"history": [1], "files": [], "num_turns": 1},
+            "session2": {},
+        })
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_legacy_session(self):
+        provider = get_redis_provider()
+        provider.redis_client.set(provider._get_key("session1"), json.dumps({"history": [1], "files": [], "summary": ""}))
+
+        # Like store_history, with updates to the session hash, which fails on the old key
+        provider.append_entries("session1", "history", [2], {"num_turns": 2})
+        self.assertEqual(provider.get_session("session1"), {"history": [1, 2], "files": [], "summary": "", "num_turns": 2})
+
+        provider.redis_client.set(provider._get_key("session2"), json.dumps({"history": [1], "files": []}))
+        self.assertEqual(provider.get_session("session2"), {"history": [1], "files": []})
@@ -2,6 +2,22 @@ import unittest
 import time
 
 from solace_agent_mesh.services.history_service import HistoryService
+from solace_agent_mesh.services.history_service.history_providers.base_history_provider import get_session_tail
+from solace_agent_mesh.services.history_service.history_providers.memory_history_provider import MemoryHistoryProvider
+
+
+class TailReadingHistoryProvider(MemoryHistoryProvider):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.reads = []
+
+    def get_session(self, session_id):
+        self.reads.append("session")
+        return super().get_session(session_id)
+
+    def get_session_tail(self, session_id, field, num_entries):
+        self.reads.append(("tail", num_entries))
+        return get_session_tail(self.history.get(session_id, {}), field, num_entries)
 
 
 class TestHistoryService(unittest.TestCase):
@@ -227,3 +243,48 @@ class TestHistoryService(unittest.TestCase):
 
         self.assertEqual(len(history), 1)
         self.assertEqual(history[0]["content"], content2)
+
+    def get_tail_reading_history_service(self, config={}):
+        service = self.get_memory_history_service(config)
+        service.history_provider = TailReadingHistoryProvider()
+        return service
+
+    def test_store_history_reads_the_end_of_the_history(self):
+        service = self.get_tail_reading_history_service({"max_turns": 100})
+        session_id = "session1"
+        for index in range(20):
+            service.store_history(session_id, "user" if index % 2 == 0 else "assistant", f"Message {index}")
+        service.store_actions(session_id, [{"agent_name": "global", "action_name": "action"}] * 10)
+
+        service.history_provider.reads = []
+        service.store_history(session_id, "user", "Message 20")
+        # The trailing actions and the messages before them
+        self.assertEqual(service.history_provider.reads, [("tail", 8), ("tail", 16)])
+        self.assertEqual(len(service.get_history(session_id)), 21)
+
+        service.history_provider.reads = []
+        service.store_history(session_id, "assistant", "Message 21")
+        self.assertEqual(service.history_provider.reads, [("tail", 8)])
+
+    def test_store_history_reads_all_of_the_history_to_truncate_it(self):
+        service = self.get_tail_reading_history_service({"max_turns": 10})
+        session_id = "session1"
+        for index in range(10):
+            service.store_history(session_id, "user" if index % 2 == 0 else "assistant", f"Message {index}")
+
+        service.history_provider.reads = []
+        service.store_history(session_id, "user", "Message 10")
+        self.assertEqual(service.history_provider.reads, [("tail", 8), "session"])
+        history = service.get_history(session_id)
+        self.assertEqual([entry["content"] for entry in history], [f"Message {index}" for index in range(5, 11)])
+
+    def test_user_message_removes_trailing_actions(self):
+        service = self.get_memory_history_service()
+        session_id = "session1"
+        service.store_history(session_id, "user", "Hello")
+        service.store_history(session_id, "assistant", "Hi")
+        service.store_actions(session_id, [{"agent_name": "global", "action_name": "action"}])
+
+        service.store_history(session_id, "user", "Stop")
+        history = service.get_history(session_id)
+        self.assertEqual([entry["content"] for entry in history], ["Hello", "Hi", "Stop"])
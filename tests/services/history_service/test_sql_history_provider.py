@@ -0,0 +1,144 @@
+import json
+import sqlite3
+import unittest
+from contextlib import contextmanager
+from unittest.mock import patch
+
+try:
+    from solace_agent_mesh.services.history_service.history_providers.sql_history_provider import DatabaseFactory, SQLHistoryProvider
+except ImportError:
+    SQLHistoryProvider = None
+
+
+class SQLiteDatabase:
+    """
+    Runs the provider's PostgreSQL queries on an SQLite database, which
+    understands them once the placeholders and row locks are changed.
+    """
+    def __init__(self, connection, fail_on_transaction=None):
+        self.connection = connection
+        self.fail_on_transaction = fail_on_transaction
+        self.num_transactions = 0
+
+    def _translate(self, query):
+        if "information_schema.columns" in query:
+            return "SELECT name AS column_name FROM pragma_table_info(?)"
+        return query.replace("%s", "?").replace(" FOR UPDATE", "")
+
+    def execute(self, query, params=None):
+        return self.connection.execute(self._translate(query), params or ())
+
+    @contextmanager
+    def transaction(self):
+        self.num_transactions += 1
+        if self.num_transactions == self.fail_on_transaction:
+            raise ConnectionError("Connection lost")
+        self.connection.execute("BEGIN")
+        try:
+            yield self
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+
+@unittest.skipIf(SQLHistoryProvider is None, "The SQL database drivers are not installed")
+class TestSQLHistoryProvider(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:", isolation_level=None)
+        self.connection.row_factory = lambda cursor, row: {
+            column[0]: value for column, value in zip(cursor.description, row)
+        }
+        self.connection.execute("PRAGMA foreign_keys = ON")
+
+    def tearDown(self):
+        self.connection.close()
+
+    def get_provider(self, config=None, fail_on_transaction=None):
+        database = SQLiteDatabase(self.connection, fail_on_transaction)
+        with patch.dict(DatabaseFactory.DATABASE_PROVIDERS, {"postgres": lambda **kwargs: database}):
+            return SQLHistoryProvider(config)
+
+    def count_entries(self):
+        return self.connection.execute("SELECT COUNT(*) AS count FROM session_history_entries").fetchone()["count"]
+
+    def test_entries(self):
+        provider = self.get_provider()
+        provider.append_entries("session1", "history", [1, 2, 3], {"num_turns": 3, "last_active_time": 10})
+        provider.append_entries("session1", "history", [4, 5])
+        provider.trim_entries("session1", "history", keep_last=3, drop_last=1, updates={"num_turns": 2})
+        provider.append_entries("session1", "history", [6, 7])
+        provider.update_session("session1", {"files": [{"url": "a"}], "summary": "abc"})
+
+        self.assertEqual(provider.get_session("session1"), {
+            "history": [2, 3, 4, 6, 7],
+            "files": [{"url": "a"}],
+            "num_turns": 2,
+            "summary": "abc",
+            "last_active_time": 10,
+        })
+        self.assertEqual(self.count_entries(), 6)
+
+        self.assertEqual(
+            provider.get_session_tail("session1", "history", 2),
+            {"history": [6, 7], "num_turns": 2, "summary": "abc", "last_active_time": 10},
+        )
+        self.assertEqual(provider.get_recent_history("session1")["history"], [2, 3, 4, 6, 7])
+
+        provider.trim_entries("session1", "history", keep_last=0)
+        self.assertEqual(provider.get_session("session1")["history"], [])
+
+        provider.delete_session("session1")
+        self.assertEqual(provider.get_session("session1"), {})
+        self.assertEqual(self.count_entries(), 0)
+
+    def test_entries_read_limit(self):
+        provider = self.get_provider({"entries_read_limit": 2})
+        provider.append_entries("session1", "history", [1, 2, 3], {"summary": "abc"})
+        provider.append_entries("session1", "files", [{"url": "a"}, {"url": "b"}, {"url": "c"}])
+
+        # Only the prompt is limited, sessions that may be written back are read whole
+        self.assertEqual(provider.get_recent_history("session1"), {"history": [2, 3], "summary": "abc"})
+        self.assertEqual(provider.get_session("session1")["history"], [1, 2, 3])
+
+        provider.update_session("session1", {"files": provider.get_session("session1")["files"][1:]})
+        self.assertEqual(provider.get_session("session1")["files"], [{"url": "b"}, {"url": "c"}])
+
+    def test_failed_write_is_rolled_back(self):
+        provider = self.get_provider()
+        provider.store_session("session1", {"history": [1, 2], "files": [], "summary": "abc"})
+
+        with self.assertRaises(TypeError):
+            # The files can't be serialized, after the history has been replaced
+            provider.store_session("session1", {"history": [3], "files": [object()], "summary": ""})
+
+        self.assertEqual(provider.get_session("session1"), {"history": [1, 2], "files": [], "summary": "abc"})
+
+    def test_delete_inactive_sessions(self):
+        provider = self.get_provider()
+        provider.append_entries("session1", "history", [1], {"last_active_time": 10})
+        provider.append_entries("session2", "history", [2], {"last_active_time": 20})
+
+        provider.delete_inactive_sessions(15)
+        self.assertEqual(provider.get_all_sessions(), ["session2"])
+        self.assertEqual(self.count_entries(), 1)
+
+    def test_migration_resumes_after_failure(self):
+        self.connection.execute("CREATE TABLE session_history (session_id TEXT PRIMARY KEY, data JSON)")
+        for index in range(3):
+            data = {"history": [index, index + 1], "files": [], "summary": str(index), "last_active_time": index}
+            self.connection.execute("INSERT INTO session_history VALUES (?, ?)", (f"session{index}", json.dumps(data)))
+
+        with self.assertRaises(ConnectionError):
+            self.get_provider(fail_on_transaction=2)
+
+        provider = self.get_provider()
+        for index in range(3):
+            self.assertEqual(provider.get_session(f"session{index}"), {
+                "history": [index, index + 1],
+                "files": [],
+                "summary": str(index),
+                "last_active_time": index,
+            })
+        provider.delete_inactive_sessions(1)
+        self.assertEqual(sorted(provider.get_all_sessions()), ["session1", "session2"])
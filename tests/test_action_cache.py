@@ -0,0 +1,79 @@
+# tests to verify that the action response cache is working as expected
+import unittest
+from unittest.mock import patch
+
+from src.common.action_cache import (
+    MemoryActionCache,
+    get_action_cache_key,
+    is_cacheable_response,
+)
+
+USER_PROPERTIES = {
+    "session_id": "session-1",
+    "identity": "user@example.com",
+    "originator_scopes": ["*:*:*"],
+}
+
+
+class TestActionCache(unittest.TestCase):
+    def test_cache_key_scopes(self):
+        def key(cache_config, user_properties=USER_PROPERTIES, params=None):
+            return get_action_cache_key(
+                "web_request",
+                "do_news_search",
+                params or {"query": "news", "max_results": 5},
+                cache_config,
+                user_properties,
+            )
+
+        other_session = {**USER_PROPERTIES, "session_id": "session-2"}
+        other_user = {**other_session, "identity": "other@example.com"}
+        other_scopes = {**USER_PROPERTIES, "originator_scopes": ["web_request:*:*"]}
+
+        # The order of the params doesn't matter
+        self.assertEqual(
+            key({"scope": "global"}),
+            key({"scope": "global"}, params={"max_results": 5, "query": "news"}),
+        )
+        self.assertNotEqual(
+            key({"scope": "global"}), key({"scope": "global"}, params={"query": "x"})
+        )
+
+        self.assertEqual(key({"scope": "global"}), key({"scope": "global"}, other_user))
+        self.assertEqual(key({"scope": "user"}), key({"scope": "user"}, other_session))
+        self.assertNotEqual(key({"scope": "user"}), key({"scope": "user"}, other_user))
+        self.assertNotEqual(key({}), key({}, other_session))
+        self.assertIsNone(key({}, {"identity": "user@example.com"}))
+
+        self.assertEqual(key({"scope": "global"}), key({"scope": "global"}, other_scopes))
+        self.assertNotEqual(
+            key({"scope": "global", "vary_by_scopes": True}),
+            key({"scope": "global", "vary_by_scopes": True}, other_scopes),
+        )
+
+        with self.assertRaises(ValueError):
+            key({"scope": "everyone"})
+
+    def test_memory_cache_expiry_and_eviction(self):
+        cache = MemoryActionCache({"max_entries": 2})
+        with patch("src.common.action_cache.time.time", return_value=1000):
+            cache.set("a", {"message": "A"}, 60)
+            cache.set("b", {"message": "B"}, 10)
+            self.assertEqual(cache.get("a"), {"message": "A"})
+            cache.set("c", {"message": "C"}, 60)
+            self.assertIsNone(cache.get("b"))
+
+        with patch("src.common.action_cache.time.time", return_value=1100):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 1)
+
+    def test_uncacheable_responses(self):
+        self.assertTrue(is_cacheable_response({"message": "Results"}))
+        self.assertFalse(
+            is_cacheable_response({"message": "Error", "error_info": {"error_message": "x"}})
+        )
+        self.assertFalse(is_cacheable_response({"message": "Later", "is_async": True}))
+
+
+if __name__ == "__main__":
+    unittest.main()
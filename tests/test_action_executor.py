@@ -0,0 +1,60 @@
+# tests to verify that the agents' concurrent action executor is working as expected
+import threading
+import unittest
+
+from src.common.action_executor import ActionExecutor
+
+
+class TestActionExecutor(unittest.TestCase):
+    def test_actions_run_concurrently_and_are_counted(self):
+        executor = ActionExecutor(2, max_queued=1)
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def action(value):
+            started.release()
+            release.wait(5)
+            return value
+
+        futures = [executor.submit(action, value) for value in range(3)]
+        # Two run at once and the third waits for a thread
+        started.acquire(timeout=5)
+        started.acquire(timeout=5)
+        stats = executor.get_stats()
+        self.assertEqual(stats["in_flight"], 2)
+        self.assertEqual(stats["queued"], 1)
+
+        # The executor is full, so the next submit has to wait
+        submitted = threading.Event()
+
+        def submit_another():
+            futures.append(executor.submit(action, 3))
+            submitted.set()
+
+        submitter = threading.Thread(target=submit_another)
+        submitter.start()
+        self.assertFalse(submitted.wait(0.2))
+
+        release.set()
+        submitter.join(5)
+        self.assertEqual([future.result(5) for future in futures], [0, 1, 2, 3])
+        stats = executor.get_stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["completed"], 4)
+        executor.shutdown()
+
+    def test_failed_actions_free_their_slot(self):
+        executor = ActionExecutor(1, max_queued=0)
+
+        def fail():
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            executor.submit(fail).result(5)
+        self.assertEqual(executor.submit(lambda: "ok").result(5), "ok")
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,18 @@
 # tests to verify that the action_manager.py file is working as expected:
 import unittest
+from unittest.mock import patch
 
-from src.orchestrator.action_manager import ActionManager
+from src.orchestrator.action_request_store import (
+    MemoryActionRequestStore,
+    create_action_request_store,
+)
+from src.orchestrator.action_manager import (
+    ActionManager,
+    ACTION_REQUEST_TIMEOUT,
+    TIMED_OUT_ACTION_REQUEST_TTL,
+    PENDING_ACTION_RESPONSE,
+    LATE_RESULTS_NOTE,
+)
 from src.common.constants import ORCHESTRATOR_COMPONENT_NAME
 from tests.mocks import FlowKVStore, FlowLockManager
 
@@ -103,3 +114,299 @@ class TestActionManger(unittest.TestCase):
         self.assertTrue(action_list.is_complete())
 
         self.assertEqual(len(action_manager.action_requests), 1)
+
+    def test_unsealed_action_request_completes_after_seal(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        action_list_id = action_manager.add_action_request(
+            [
+                {
+                    "agent_name": "global",
+                    "action_name": "send_message",
+                    "action_params": {"message": "Hello"},
+                    "action_idx": 0,
+                }
+            ],
+            None,
+            sealed=False,
+        )
+
+        action_list = action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_idx": 0,
+                "action_name": "send_message",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Hello", "files": []},
+        )
+
+        # More actions may still be streaming in, so it can't be complete yet
+        self.assertIsNotNone(action_list)
+        self.assertFalse(action_list.is_complete())
+
+        action_manager.add_actions(
+            action_list_id,
+            [
+                {
+                    "agent_name": "global",
+                    "action_name": "send_message",
+                    "action_params": {"message": "Hello2"},
+                    "action_idx": 1,
+                }
+            ],
+        )
+        self.assertIsNone(action_manager.seal_action_request(action_list_id))
+
+        action_list = action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_idx": 1,
+                "action_name": "send_message",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Hello2", "files": []},
+        )
+        self.assertTrue(action_list.is_complete())
+
+    def test_seal_returns_action_list_when_responses_already_arrived(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        action_list_id = action_manager.add_action_request(
+            [
+                {
+                    "agent_name": "global",
+                    "action_name": "send_message",
+                    "action_params": {"message": "Hello"},
+                    "action_idx": 0,
+                }
+            ],
+            None,
+            sealed=False,
+        )
+        action_manager.add_actions(
+            action_list_id,
+            [
+                {
+                    "agent_name": "global",
+                    "action_name": "missing_action",
+                    "action_params": {},
+                    "action_idx": 1,
+                    "response": {"text": "Action was not run"},
+                }
+            ],
+        )
+        action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_idx": 0,
+                "action_name": "send_message",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Hello", "files": []},
+        )
+
+        action_list = action_manager.seal_action_request(action_list_id)
+
+        self.assertIsNotNone(action_list)
+        self.assertTrue(action_list.is_complete())
+
+    def test_actions_time_out_at_their_own_deadlines(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=0):
+            action_list_id = action_manager.add_action_request(
+                [
+                    {
+                        "agent_name": "global",
+                        "action_name": "send_message",
+                        "action_params": {"message": "Hello"},
+                        "action_idx": 0,
+                        "timeout": 10,
+                    },
+                    {
+                        "agent_name": "global",
+                        "action_name": "send_message",
+                        "action_params": {"message": "Hello2"},
+                        "action_idx": 1,
+                    },
+                ],
+                {"session_id": "session"},
+            )
+
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=5):
+            self.assertEqual(action_manager.do_timeout_check(), [])
+
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=11):
+            events = action_manager.do_timeout_check()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["action_list_id"], action_list_id)
+        self.assertEqual(events[0]["action_idx"], 0)
+        self.assertEqual(events[0]["user_properties"], {"session_id": "session"})
+
+        # The second action answers in time
+        action_list = action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_idx": 1,
+                "action_name": "send_message",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Hello2", "files": []},
+        )
+        self.assertEqual(action_list.actions[1]["response"]["text"], "Hello2")
+        with patch(
+            "src.orchestrator.action_request_store.time.monotonic",
+            return_value=ACTION_REQUEST_TIMEOUT + 1,
+        ):
+            self.assertEqual(action_manager.do_timeout_check(), [])
+
+        # The timeout response never came back for the first action
+        with patch(
+            "src.orchestrator.action_request_store.time.monotonic",
+            return_value=11 + TIMED_OUT_ACTION_REQUEST_TTL,
+        ):
+            self.assertEqual(action_manager.do_timeout_check(), [])
+        self.assertNotIn(action_list_id, action_manager.action_requests)
+        self.assertEqual(action_manager.deadlines, [])
+
+    def test_completed_action_requests_do_not_time_out(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=0):
+            action_list_id = action_manager.add_action_request(
+                [
+                    {
+                        "agent_name": "global",
+                        "action_name": "send_message",
+                        "action_params": {"message": "Hello"},
+                        "action_idx": 0,
+                    }
+                ],
+                None,
+            )
+        action_manager.delete_action_request(action_list_id)
+
+        with patch(
+            "src.orchestrator.action_request_store.time.monotonic",
+            return_value=ACTION_REQUEST_TIMEOUT + 1,
+        ):
+            self.assertEqual(action_manager.do_timeout_check(), [])
+        self.assertEqual(action_manager.deadlines, [])
+
+    def test_response_without_action_idx_is_ignored(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        action_list_id = action_manager.add_action_request(
+            [{"agent_name": "global", "action_name": "send_message", "action_idx": 0}],
+            None,
+        )
+
+        action_list = action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_name": "send_message",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Hello"},
+        )
+        self.assertFalse(action_list.is_complete())
+
+    def test_action_request_store_config(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager, {"type": "memory"})
+        self.assertIsInstance(action_manager.store, MemoryActionRequestStore)
+        self.assertIs(action_manager.store.action_requests, action_manager.action_requests)
+
+        with self.assertRaises(ValueError):
+            create_action_request_store({"type": "unknown"}, {}, None)
+
+    def test_partial_results_are_sent_after_their_timeout(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=0):
+            action_list_id = action_manager.add_action_request(
+                [
+                    {
+                        "agent_name": "global",
+                        "action_name": "fast_action",
+                        "action_params": {},
+                        "action_idx": 0,
+                    },
+                    {
+                        "agent_name": "global",
+                        "action_name": "slow_action",
+                        "action_params": {},
+                        "action_idx": 1,
+                    },
+                ],
+                {"identity": "user"},
+                partial_results_timeout=30,
+            )
+        action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_idx": 0,
+                "action_name": "fast_action",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Fast result", "files": []},
+        )
+
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=31):
+            events = action_manager.do_timeout_check()
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0]["partial_results"])
+        self.assertEqual(events[0]["user_properties"], {"identity": "user"})
+        self.assertIn("Fast result", events[0]["text"])
+        self.assertIn(PENDING_ACTION_RESPONSE, events[0]["text"])
+
+        action_list = action_manager.add_action_response(
+            {
+                "action_list_id": action_list_id,
+                "action_idx": 1,
+                "action_name": "slow_action",
+                "originator": ORCHESTRATOR_COMPONENT_NAME,
+            },
+            {"text": "Slow result", "files": []},
+        )
+        self.assertTrue(action_list.is_complete())
+        response_text, _ = action_list.format_ai_response()
+        self.assertTrue(response_text.startswith(LATE_RESULTS_NOTE))
+        self.assertIn("Slow result", response_text)
+        self.assertNotIn("Fast result", response_text)
+
+    def test_partial_results_wait_for_a_result(self):
+        kv_store = FlowKVStore()
+        lock_manager = FlowLockManager()
+        action_manager = ActionManager(kv_store, lock_manager)
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=0):
+            action_list_id = action_manager.add_action_request(
+                [
+                    {
+                        "agent_name": "global",
+                        "action_name": "slow_action",
+                        "action_params": {},
+                        "action_idx": 0,
+                    }
+                ],
+                None,
+                sealed=False,
+                partial_results_timeout=30,
+            )
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=10):
+            action_manager.seal_action_request(action_list_id)
+
+        # Nothing has arrived, so there is nothing to send
+        with patch("src.orchestrator.action_request_store.time.monotonic", return_value=41):
+            self.assertEqual(action_manager.do_timeout_check(), [])
+        self.assertFalse(
+            action_manager.action_requests[action_list_id].partial_results_sent
+        )
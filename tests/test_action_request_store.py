@@ -0,0 +1,157 @@
+# tests to verify that the redis action request store shares action requests between orchestrators
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from src.orchestrator.action_manager import ActionManager, ACTION_REQUEST_TIMEOUT
+from src.orchestrator.action_request_store import ACTION_TIMED_OUT_RESPONSE
+from src.common.constants import ORCHESTRATOR_COMPONENT_NAME
+from tests.mocks import FlowKVStore, FlowLockManager
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestRedisActionRequestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+
+    def create_action_manager(self):
+        """An action manager with its own flow, like another orchestrator replica"""
+        with patch(
+            "redis.Redis",
+            lambda **kwargs: fakeredis.FakeRedis(server=self.server, decode_responses=True),
+        ):
+            return ActionManager(FlowKVStore(), FlowLockManager(), {"type": "redis"})
+
+    def create_actions(self, count):
+        return [
+            {
+                "agent_name": "global",
+                "action_name": f"action{index}",
+                "action_params": {},
+                "action_idx": index,
+            }
+            for index in range(count)
+        ]
+
+    def create_response(self, action_list_id, action_idx, action_name=None):
+        return {
+            "action_list_id": action_list_id,
+            "action_idx": action_idx,
+            "action_name": action_name or f"action{action_idx}",
+            "originator": ORCHESTRATOR_COMPONENT_NAME,
+        }
+
+    def test_add_seal_and_complete(self):
+        replica1 = self.create_action_manager()
+        replica2 = self.create_action_manager()
+        action_list_id = replica1.add_action_request(self.create_actions(1), {"session_id": "1"}, sealed=False)
+        self.assertTrue(replica1.add_actions(action_list_id, self.create_actions(2)[1:]))
+
+        action_list = replica2.add_action_response(self.create_response(action_list_id, 0), {"text": "zero"})
+        self.assertFalse(action_list.is_complete())
+        action_list = replica1.add_action_response(self.create_response(action_list_id, 1), {"text": "one"})
+        self.assertFalse(action_list.is_complete())
+
+        action_list = replica2.seal_action_request(action_list_id)
+        self.assertTrue(action_list.is_complete())
+        self.assertEqual(action_list.get_user_properties(), {"session_id": "1"})
+        self.assertEqual(
+            [action["response"] for action in action_list.actions],
+            [{"text": "zero"}, {"text": "one"}],
+        )
+        self.assertIsNone(replica1.seal_action_request(action_list_id))
+
+    def test_rejects_unknown_and_duplicate_responses(self):
+        replica = self.create_action_manager()
+        action_list_id = replica.add_action_request(self.create_actions(2), None)
+
+        self.assertIsNone(replica.add_action_response(self.create_response(action_list_id, 0, "other"), {}))
+        self.assertIsNone(replica.add_action_response(self.create_response(action_list_id, None, "action0"), {}))
+        self.assertIsNotNone(replica.add_action_response(self.create_response(action_list_id, 0), {}))
+        self.assertIsNone(replica.add_action_response(self.create_response(action_list_id, 0), {}))
+        self.assertIsNone(replica.add_action_response(self.create_response("gone", 0), {}))
+
+    def test_only_one_replica_completes(self):
+        replicas = [self.create_action_manager() for _ in range(8)]
+        action_list_id = replicas[0].add_action_request(self.create_actions(len(replicas)), None)
+
+        completed = []
+        barrier = threading.Barrier(len(replicas))
+
+        def respond(index):
+            barrier.wait()
+            action_list = replicas[index].add_action_response(
+                self.create_response(action_list_id, index), {"text": str(index)}
+            )
+            if action_list and action_list.is_complete():
+                completed.append(index)
+
+        threads = [threading.Thread(target=respond, args=(index,)) for index in range(len(replicas))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(completed), 1)
+
+    def test_action_timeout(self):
+        replica1 = self.create_action_manager()
+        replica2 = self.create_action_manager()
+        action_list_id = replica1.add_action_request(self.create_actions(2), {"session_id": "1"})
+        replica2.add_action_response(self.create_response(action_list_id, 0), {"text": "zero"})
+
+        # The replica that sent the request has gone, so another one times it out
+        with patch(
+            "src.orchestrator.action_request_store.time.time",
+            return_value=time.time() + ACTION_REQUEST_TIMEOUT + 1,
+        ):
+            events = replica2.do_timeout_check()
+            self.assertEqual(replica1.do_timeout_check(), [])
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["action_idx"], 1)
+        self.assertEqual(events[0]["user_properties"], {"session_id": "1"})
+
+        # The timeout event comes back as the action's response
+        action_list = replica1.add_action_response(
+            {**events[0], "originator": ORCHESTRATOR_COMPONENT_NAME}, ACTION_TIMED_OUT_RESPONSE
+        )
+        self.assertTrue(action_list.is_complete())
+        self.assertIsNone(replica2.add_action_response(self.create_response(action_list_id, 1), {"text": "late"}))
+
+    def test_partial_results_deadline_is_shared(self):
+        replica1 = self.create_action_manager()
+        replica2 = self.create_action_manager()
+        action_list_id = replica1.add_action_request(
+            self.create_actions(2), None, partial_results_timeout=30
+        )
+        replica1.add_action_response(self.create_response(action_list_id, 0), {"text": "zero"})
+
+        with patch("src.orchestrator.action_request_store.time.time", return_value=time.time() + 31):
+            events = replica2.do_timeout_check() + replica1.do_timeout_check()
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0]["partial_results"])
+
+    def test_partial_results_are_taken_once(self):
+        replica1 = self.create_action_manager()
+        replica2 = self.create_action_manager()
+        action_list_id = replica1.add_action_request(self.create_actions(3), None)
+        self.assertIsNone(replica1.get_partial_results_event(action_list_id))
+
+        replica2.add_action_response(self.create_response(action_list_id, 0), {"text": "zero"})
+        event = replica1.get_partial_results_event(action_list_id)
+        self.assertTrue(event["partial_results"])
+        self.assertIsNone(replica2.get_partial_results_event(action_list_id))
+
+        action_list = replica2.store.get(action_list_id)
+        self.assertTrue(action_list.actions[0].get("reported"))
+        self.assertFalse(action_list.actions[1].get("reported"))
+
+        replica2.add_action_response(self.create_response(action_list_id, 1), {"text": "one"})
+        action_list = replica1.add_action_response(self.create_response(action_list_id, 2), {"text": "two"})
+        self.assertTrue(action_list.is_complete())
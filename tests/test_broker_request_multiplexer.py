@@ -0,0 +1,169 @@
+"""Tests for routing concurrent broker responses to their requests"""
+
+import asyncio
+import queue
+import threading
+import unittest
+
+from solace_ai_connector.common.event import Event, EventType
+from solace_ai_connector.common.message import Message
+
+from src.agents.base_agent_component import BaseAgentComponent
+from src.common.broker_request_multiplexer import (
+    BrokerRequestMultiplexer,
+    REQUEST_ID_USER_PROPERTY,
+)
+
+
+class FakeController:
+    def __init__(self, request_expiry_s=5):
+        self.request_expiry_s = request_expiry_s
+        self.response_queue = queue.Queue()
+        self.sent = queue.Queue()
+
+    def send_message(self, message, stream=False, streaming_complete_expression=None):
+        self.sent.put(message)
+
+    def respond(self, request, payload):
+        # Responders copy the request's user properties
+        self.response_queue.put(
+            Event(
+                EventType.MESSAGE,
+                Message(
+                    payload=payload,
+                    user_properties=request.get_user_properties().copy(),
+                ),
+            )
+        )
+
+
+class TestBrokerRequestMultiplexer(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.controller = FakeController()
+        self.multiplexer = BrokerRequestMultiplexer(self.controller, self.loop)
+
+    def tearDown(self):
+        self.multiplexer.stop()
+        self.loop.close()
+
+    async def collect_stream(self, name):
+        chunks = []
+        async for response, last in self.multiplexer.request_stream(
+            Message(payload={"name": name}, user_properties={}),
+            "input.payload:last_chunk",
+        ):
+            chunks.append((response.get_payload()["chunk"], last))
+        return chunks
+
+    def test_interleaved_streams(self):
+        async def run():
+            tasks = [
+                asyncio.create_task(self.collect_stream(name)) for name in ("a", "b")
+            ]
+            requests = {}
+            while len(requests) < 2:
+                await asyncio.sleep(0.01)
+                while not self.controller.sent.empty():
+                    request = self.controller.sent.get()
+                    requests[request.get_payload()["name"]] = request
+            # The responses for the two streams arrive interleaved
+            self.controller.respond(requests["b"], {"chunk": "b1", "last_chunk": False})
+            self.controller.respond(requests["a"], {"chunk": "a1", "last_chunk": False})
+            self.controller.respond(requests["a"], {"chunk": "a2", "last_chunk": True})
+            self.controller.respond(requests["b"], {"chunk": "b2", "last_chunk": True})
+            return await asyncio.gather(*tasks)
+
+        result_a, result_b = self.loop.run_until_complete(run())
+        self.assertEqual(result_a, [("a1", False), ("a2", True)])
+        self.assertEqual(result_b, [("b1", False), ("b2", True)])
+        self.assertEqual(self.multiplexer.get_num_requests(), 0)
+
+    def test_request_tags_message(self):
+        async def run():
+            message = Message(payload={}, user_properties={"stimulus_uuid": "s1"})
+            task = asyncio.create_task(self.multiplexer.request(message))
+            while self.controller.sent.empty():
+                await asyncio.sleep(0.01)
+            request = self.controller.sent.get()
+            self.controller.respond(request, {"content": "done"})
+            return request, await task
+
+        request, response = self.loop.run_until_complete(run())
+        self.assertIn(REQUEST_ID_USER_PROPERTY, request.get_user_properties())
+        self.assertEqual(request.get_user_properties()["stimulus_uuid"], "s1")
+        self.assertEqual(response.get_payload(), {"content": "done"})
+
+    def test_timeout(self):
+        self.multiplexer.request_expiry_s = 0.05
+
+        async def run():
+            return await self.multiplexer.request(Message(payload={}))
+
+        with self.assertRaises(TimeoutError):
+            self.loop.run_until_complete(run())
+        self.assertEqual(self.multiplexer.get_num_requests(), 0)
+
+
+class TestConcurrentAgentRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = FakeController()
+        # Just what an agent with concurrent actions needs to call the LLM service
+        self.agent = BaseAgentComponent.__new__(BaseAgentComponent)
+        self.agent.info = {"agent_name": "test_agent"}
+        self.agent.llm_service_topic = "llm/request/"
+        self.agent.broker_request_multiplexer = BrokerRequestMultiplexer(self.controller)
+
+    def tearDown(self):
+        self.agent.broker_request_multiplexer.stop()
+
+    def run_action(self, name, results):
+        self.agent.current_message = Message(payload={}, user_properties={"stimulus_uuid": name})
+        self.agent.current_request_data = {"action_name": name}
+        if name == "streamed":
+            response = self.agent.do_llm_service_request([{"content": name}], stream=True)
+            results[name] = [chunk["chunk"] for chunk, _ in response]
+        else:
+            results[name] = self.agent.do_llm_service_request([{"content": name}])["content"]
+
+    def test_llm_requests_are_concurrent(self):
+        results = {}
+        threads = [
+            threading.Thread(target=self.run_action, args=(name, results))
+            for name in ("single", "streamed")
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Both requests are sent before either has a response
+        requests = {}
+        while len(requests) < 2:
+            request = self.controller.sent.get(timeout=5)
+            requests[request.get_user_properties()["stimulus_uuid"]] = request
+        self.controller.respond(requests["streamed"], {"chunk": "a", "last_chunk": False})
+        self.controller.respond(requests["single"], {"content": "done"})
+        self.controller.respond(requests["streamed"], {"chunk": "b", "last_chunk": True})
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, {"single": "done", "streamed": ["a", "b"]})
+        self.assertEqual(self.agent.broker_request_multiplexer.get_num_requests(), 0)
+
+    def test_abandoned_stream_is_closed_from_another_thread(self):
+        self.agent.current_message = Message(payload={}, user_properties={})
+        self.agent.current_request_data = None
+        responses = self.agent.do_llm_service_request([], stream=True)
+        thread = threading.Thread(target=lambda: next(responses, None))
+        thread.start()
+        request = self.controller.sent.get(timeout=5)
+        self.controller.respond(request, {"chunk": "a", "last_chunk": False})
+        thread.join(5)
+
+        responses.close()
+        self.assertEqual(self.agent.broker_request_multiplexer.get_num_requests(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
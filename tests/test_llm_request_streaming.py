@@ -0,0 +1,53 @@
+# tests to verify that the async streaming path sends its batches off the event loop
+import asyncio
+import threading
+import unittest
+
+from solace_ai_connector.common.message import Message
+
+from src.services.llm_service.components.llm_request_component import LLMRequestComponent
+
+
+class RecordingLLMRequestComponent(LLMRequestComponent):
+    """Records the thread each batch is sent and processed on"""
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        self.stream_batch_size = 2
+        self.sent = []
+
+    def _send_streaming_chunk(self, input_message, chunk, aggregate_result, response_uuid,
+                              first_chunk, last_chunk, sequence, tool_calls=None):
+        self.sent.append((chunk, last_chunk, threading.get_ident()))
+
+    def _process_streaming_batch(self, input_message, aggregate_result, last_chunk):
+        self.sent.append((aggregate_result, last_chunk, threading.get_ident()))
+
+
+class TestLLMRequestStreaming(unittest.TestCase):
+
+    def test_async_batches_are_sent_off_the_event_loop(self):
+        component = RecordingLLMRequestComponent()
+        user_properties = {"stimulus_uuid": "1"}
+        input_message = Message(payload={}, user_properties=user_properties)
+        llm_message = Message(payload={}, user_properties=user_properties)
+        chunks = ["one ", "two ", "three"]
+
+        async def responses():
+            for index, chunk in enumerate(chunks):
+                yield Message(payload={"chunk": chunk}, user_properties=user_properties), index == len(chunks) - 1
+
+        loop_thread = threading.get_ident()
+        result = asyncio.run(
+            component._handle_streaming_async(input_message, llm_message, "1234", responses())
+        )
+
+        self.assertEqual(result["content"], "one two three")
+        self.assertEqual(
+            [(text, last) for text, last, _ in component.sent],
+            [("one two ", False), ("one two ", False), ("three", True), ("one two three", True)],
+        )
+        self.assertTrue(all(thread != loop_thread for _, _, thread in component.sent))
+
+
+if __name__ == "__main__":
+    unittest.main()
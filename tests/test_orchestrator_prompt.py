@@ -0,0 +1,64 @@
+# tests to verify that the orchestrator prompts are built as expected
+import unittest
+
+from src.orchestrator.orchestrator_prompt import (
+    RequestContextPrompt,
+    SystemPrompt,
+    add_cache_breakpoints,
+)
+
+
+def prompt_info(user_email, stable_layout):
+    return {
+        "tag_prefix": "t123_",
+        "system_purpose": "Help the user",
+        "response_format_prompt": "",
+        "agent_state_yaml": "global:\n  state: open\n",
+        "originator_info_yaml": f"email: {user_email}\n",
+        "available_files": [],
+        "stable_layout": stable_layout,
+    }
+
+
+class TestOrchestratorPrompt(unittest.TestCase):
+    def test_default_layout_includes_originator_info(self):
+        prompt = SystemPrompt(prompt_info("a@example.com", False), [])
+        self.assertIn("email: a@example.com", prompt)
+
+    def test_stable_layout_system_prompt_is_the_same_for_all_originators(self):
+        prompt_a = SystemPrompt(prompt_info("a@example.com", True), [])
+        prompt_b = SystemPrompt(prompt_info("b@example.com", True), [])
+        self.assertEqual(prompt_a, prompt_b)
+        self.assertNotIn("a@example.com", prompt_a)
+
+        request_context = RequestContextPrompt(prompt_info("a@example.com", True))
+        self.assertIn("email: a@example.com", request_context)
+        self.assertTrue(request_context.strip().startswith("<t123_request_context>"))
+
+    def test_add_cache_breakpoints(self):
+        messages = [
+            {"role": "system", "content": "system prompt"},
+            {"role": "user", "content": "first"},
+            {"role": "assistant", "content": "reply"},
+            {"role": "user", "content": "second"},
+        ]
+        result = add_cache_breakpoints(messages)
+
+        self.assertEqual(
+            result[0]["content"],
+            [
+                {
+                    "type": "text",
+                    "text": "system prompt",
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ],
+        )
+        self.assertEqual(result[1:3], messages[1:3])
+        self.assertEqual(result[3]["content"][0]["text"], "second")
+        # The original messages are left alone
+        self.assertEqual(messages[0]["content"], "system prompt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+# tests to verify that the OrchestratorState agent registry is working as expected
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from src.common.utils import get_summary_hash
+from src.common.stats_logger import STATS_LOG_INTERVAL
+from src.orchestrator.orchestrator_main import OrchestratorState
+from src.orchestrator.registry_store import FileRegistryStore
+
+
+def agent_summary(agent_name, description="An agent"):
+    return {
+        "agent_name": agent_name,
+        "description": description,
+        "always_open": False,
+        "actions": [
+            {
+                "do_something": {
+                    "desc": "Does something",
+                    "params": ["thing (The thing to do)"],
+                    "examples": [],
+                    "required_scopes": [f"{agent_name}:do_something:execute"],
+                }
+            }
+        ],
+    }
+
+
+class TestOrchestratorState(unittest.TestCase):
+    def setUp(self):
+        OrchestratorState.set_config({"agent_ttl_ms": 60000})
+        self.state = OrchestratorState()
+
+    def tearDown(self):
+        for agent_name in ["test_state_agent", "test_state_unknown_agent"]:
+            self.state.delete_agent(agent_name)
+
+    def test_unchanged_registration_keeps_registry_version(self):
+        summary = agent_summary("test_state_agent")
+        summary["summary_hash"] = get_summary_hash(summary)
+        self.state.register_agent(summary)
+        version = self.state.get_registry_version()
+
+        summary = agent_summary("test_state_agent")
+        summary["summary_hash"] = get_summary_hash(summary)
+        self.state.register_agent(summary)
+        self.assertEqual(self.state.get_registry_version(), version)
+
+        self.state.register_agent(agent_summary("test_state_agent", "Changed"))
+        self.assertGreater(self.state.get_registry_version(), version)
+
+    def test_heartbeat_refreshes_known_agent_only(self):
+        summary = agent_summary("test_state_agent")
+        summary_hash = get_summary_hash(summary)
+        # The hash is worked out when the agent didn't send one
+        self.state.register_agent(summary)
+        expire_time = self.state.get_registered_agents()["test_state_agent"][
+            "expire_time"
+        ]
+
+        self.assertTrue(self.state.refresh_agent("test_state_agent", summary_hash))
+        self.assertGreaterEqual(
+            self.state.get_registered_agents()["test_state_agent"]["expire_time"],
+            expire_time,
+        )
+        self.assertFalse(self.state.refresh_agent("test_state_agent", "other-hash"))
+        self.assertFalse(
+            self.state.refresh_agent("test_state_unknown_agent", summary_hash)
+        )
+
+    def test_get_agent_action(self):
+        self.state.register_agent(agent_summary("test_state_agent"))
+        action = self.state.get_agent_action("test_state_agent", "do_something")
+        self.assertEqual(action["desc"], "Does something")
+        self.assertIsNone(self.state.get_agent_action("test_state_agent", "missing"))
+        self.assertIsNone(
+            self.state.get_agent_action("test_state_unknown_agent", "do_something")
+        )
+
+    def test_registry_snapshot_is_not_modified(self):
+        self.state.register_agent(agent_summary("test_state_agent"))
+        agents = self.state.get_registered_agents()
+
+        self.state.register_agent(agent_summary("test_state_unknown_agent"))
+        self.state.delete_agent("test_state_agent")
+
+        self.assertIn("test_state_agent", agents)
+        self.assertNotIn("test_state_unknown_agent", agents)
+        self.assertIsNone(
+            self.state.get_agent_action("test_state_agent", "do_something")
+        )
+        with self.assertRaises(TypeError):
+            agents["test_state_agent"] = {}
+
+    def test_stimulus_wait_stats(self):
+        self.state.record_stimulus_wait("test_wait_type", 0.5)
+        self.state.record_stimulus_wait("test_wait_type", 1.5)
+
+        stats = self.state.get_stimulus_wait_stats()["test_wait_type"]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["max_seconds"], 1.5)
+        self.assertEqual(stats["average_seconds"], 1.0)
+
+    def test_stats_are_logged_periodically(self):
+        self.state.record_stimulus_wait("test_logged_wait_type", 0.5)
+        with patch("src.common.stats_logger.time.monotonic", return_value=0):
+            self.state.stats_logger.logged_time = 0
+            with patch("src.common.stats_logger.log") as log:
+                self.state.stats_logger.log_stats()
+            log.info.assert_not_called()
+
+        with patch(
+            "src.common.stats_logger.time.monotonic",
+            return_value=STATS_LOG_INTERVAL,
+        ):
+            with patch("src.common.stats_logger.log") as log:
+                self.state.stats_logger.log_stats()
+                self.state.stats_logger.log_stats()
+        log.info.assert_called_once()
+        stats = json.loads(log.info.call_args.args[2])
+        self.assertEqual(stats["stimulus_wait"]["test_logged_wait_type"]["count"], 1)
+        self.assertIn("repaired", stats["response_repair"])
+        self.assertEqual(stats["session_state"]["type"], "memory")
+
+    def test_registry_snapshot_is_loaded_provisionally(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "registry.json")
+            store = FileRegistryStore({"path": path})
+            self.state.registry_store = store
+            try:
+                self.state.register_agent(agent_summary("test_state_agent"))
+                with open(path, "r", encoding="utf-8") as file:
+                    saved = json.load(file)["test_state_agent"]
+                self.assertNotIn("expire_time", saved)
+                self.assertNotIn("state", saved)
+
+                # As if the orchestrator had restarted
+                self.state.registry_store = None
+                self.state.delete_agent("test_state_agent")
+                self.state.registry_store = store
+
+                self.assertEqual(self.state.load_registry_snapshot(5000), 1)
+                agent = self.state.get_registered_agents()["test_state_agent"]
+                self.assertEqual(agent["state"], "closed")
+                self.assertLess(
+                    agent["expire_time"], datetime.now() + timedelta(seconds=6)
+                )
+                # Its heartbeat is recognised, so no full registration is needed
+                self.assertTrue(
+                    self.state.refresh_agent("test_state_agent", saved["summary_hash"])
+                )
+                # Agents that have already registered are left alone
+                self.assertEqual(self.state.load_registry_snapshot(5000), 0)
+            finally:
+                self.state.registry_store = None
+
+    def test_registry_snapshot_is_saved_outside_the_lock(self):
+        state = self.state
+        saves = []
+
+        class LockCheckingStore:
+            def save(self, agents):
+                saves.append(state._lock.locked())
+
+        self.state.registry_store = LockCheckingStore()
+        try:
+            self.state.register_agent(agent_summary("test_state_agent"))
+            self.state.delete_agent("test_state_agent")
+        finally:
+            self.state.registry_store = None
+        self.assertEqual(saves, [False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,12 @@
 
 import unittest
 
+from solace_ai_connector.flow.flow import Flow
 from solace_ai_connector.test_utils.utils_for_test_files import run_component_test
 from src.services.file_service import FileService
+from src.services.llm_service.components.llm_request_component import (
+    STREAMING_SNAPSHOT_REQUESTS_KEY,
+)
 
 file_manager_config = {
     "type": "memory",
@@ -676,3 +680,157 @@ class TestOrchestratorStreamingOutput(unittest.TestCase):
                 "response_uuid": "1234",
             },
         )
+
+    def test_delta_mode_streaming_output(self):
+        """Test the component rebuilding the response from delta mode chunks"""
+
+        def validation_func(output_data, _output_message, _input_message):
+            self.assertEqual(
+                output_data,
+                [
+                    [
+                        {
+                            "text": "Hello",
+                            "chunk": "Hello",
+                            "streaming": True,
+                            "first_chunk": True,
+                            "last_chunk": False,
+                            "uuid": "1234-0",
+                        }
+                    ],
+                    [
+                        {
+                            "text": "Hello World",
+                            "chunk": " World",
+                            "streaming": True,
+                            "first_chunk": False,
+                            "last_chunk": False,
+                            "uuid": "1234-0",
+                        }
+                    ],
+                    [
+                        {
+                            "text": "Hello World again",
+                            "chunk": " again",
+                            "streaming": True,
+                            "first_chunk": False,
+                            "last_chunk": True,
+                            "uuid": "1234-0",
+                        }
+                    ],
+                ],
+            )
+
+        run_component_test(
+            "src.orchestrator.components.orchestrator_streaming_output_component",
+            validation_func,
+            input_data=[
+                {
+                    "chunk": "Hello",
+                    "sequence": 0,
+                    "streaming": True,
+                    "first_chunk": True,
+                    "last_chunk": False,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+                {
+                    "chunk": " World",
+                    "sequence": 1,
+                    "streaming": True,
+                    "first_chunk": False,
+                    "last_chunk": False,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+                {
+                    "chunk": " again",
+                    "content": "Hello World again",
+                    "sequence": 2,
+                    "streaming": True,
+                    "first_chunk": False,
+                    "last_chunk": True,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+            ],
+        )
+
+    def test_delta_mode_missing_chunk(self):
+        """Test that chunks after a gap are dropped until a snapshot arrives"""
+
+        def validation_func(output_data, _output_message, _input_message):
+            self.assertEqual(
+                output_data,
+                [
+                    [
+                        {
+                            "text": "Hello",
+                            "chunk": "Hello",
+                            "streaming": True,
+                            "first_chunk": True,
+                            "last_chunk": False,
+                            "uuid": "1234-0",
+                        }
+                    ],
+                    None,
+                    None,
+                    [
+                        {
+                            "text": "Hello World again",
+                            "chunk": " World again",
+                            "streaming": True,
+                            "first_chunk": False,
+                            "last_chunk": True,
+                            "uuid": "1234-0",
+                        }
+                    ],
+                ],
+            )
+
+        run_component_test(
+            "src.orchestrator.components.orchestrator_streaming_output_component",
+            validation_func,
+            input_data=[
+                {
+                    "chunk": "Hello",
+                    "sequence": 0,
+                    "streaming": True,
+                    "first_chunk": True,
+                    "last_chunk": False,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+                {
+                    "chunk": " again",
+                    "sequence": 2,
+                    "streaming": True,
+                    "first_chunk": False,
+                    "last_chunk": False,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+                {
+                    "chunk": " more",
+                    "sequence": 3,
+                    "streaming": True,
+                    "first_chunk": False,
+                    "last_chunk": False,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+                {
+                    "chunk": "",
+                    "content": "Hello World again",
+                    "sequence": 4,
+                    "streaming": True,
+                    "first_chunk": False,
+                    "last_chunk": True,
+                    "response_uuid": "1234",
+                    "check_reasoning": False,
+                },
+            ],
+            max_response_timeout=3,
+        )
+        # The sender never took the snapshot request, so it is removed at the end
+        self.assertIsNone(Flow._kv_store.get(STREAMING_SNAPSHOT_REQUESTS_KEY))
@@ -0,0 +1,125 @@
+# tests to verify that the orchestrator's tool calling helpers are working as expected
+import unittest
+from types import SimpleNamespace
+
+from src.orchestrator.orchestrator_tools import (
+    create_action_tools,
+    tool_calls_to_actions,
+)
+from src.services.llm_service.components.litellm_tool_chat_model import (
+    add_tool_call_deltas,
+)
+
+AGENTS = {
+    "global": {
+        "description": "Global agent",
+        "state": "open",
+        "actions": [
+            {
+                "change_agent_status": {
+                    "desc": "Open or close an agent",
+                    "params": [
+                        "agent_name (The name of the agent)",
+                        "new_state (open or close)",
+                    ],
+                }
+            },
+            None,
+        ],
+    },
+    "web_request": {"description": "Makes web requests", "state": "closed"},
+}
+
+
+class TestOrchestratorTools(unittest.TestCase):
+    def test_create_action_tools(self):
+        tools = create_action_tools(AGENTS)
+        self.assertEqual(
+            tools,
+            [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": "global__change_agent_status",
+                        "description": "Open or close an agent",
+                        "parameters": {
+                            "type": "object",
+                            "properties": {
+                                "agent_name": {
+                                    "type": "string",
+                                    "description": "The name of the agent",
+                                },
+                                "new_state": {
+                                    "type": "string",
+                                    "description": "open or close",
+                                },
+                            },
+                        },
+                    },
+                }
+            ],
+        )
+
+    def test_tool_calls_to_actions(self):
+        errors = []
+        actions = tool_calls_to_actions(
+            [
+                {
+                    "id": "call_1",
+                    "name": "global__change_agent_status",
+                    "arguments": '{"agent_name": "web_request", "new_state": "open"}',
+                },
+                {"id": "call_2", "name": "global__clear_history", "arguments": ""},
+                {"id": "call_3", "name": "no_separator", "arguments": "{}"},
+                {"id": "call_4", "name": "global__retrieve_file", "arguments": "{"},
+            ],
+            errors,
+        )
+        self.assertEqual(
+            actions,
+            [
+                {
+                    "agent": "global",
+                    "action": "change_agent_status",
+                    "parameters": {"agent_name": "web_request", "new_state": "open"},
+                },
+                {"agent": "global", "action": "clear_history", "parameters": {}},
+            ],
+        )
+        self.assertEqual(
+            errors,
+            [
+                "Unknown tool: no_separator",
+                "Invalid JSON arguments for tool global__retrieve_file",
+            ],
+        )
+
+    def test_add_tool_call_deltas(self):
+        def delta(index, call_id=None, name=None, arguments=None):
+            return SimpleNamespace(
+                index=index,
+                id=call_id,
+                function=SimpleNamespace(name=name, arguments=arguments),
+            )
+
+        tool_calls = []
+        add_tool_call_deltas(tool_calls, [delta(0, "call_1", "global__clear_history", "")])
+        add_tool_call_deltas(tool_calls, [delta(0, arguments='{"depth_to_')])
+        add_tool_call_deltas(tool_calls, [delta(0, arguments='keep": "1"}')])
+        add_tool_call_deltas(tool_calls, [delta(1, "call_2", "global__retrieve_file", "{}")])
+
+        self.assertEqual(
+            tool_calls,
+            [
+                {
+                    "id": "call_1",
+                    "name": "global__clear_history",
+                    "arguments": '{"depth_to_keep": "1"}',
+                },
+                {"id": "call_2", "name": "global__retrieve_file", "arguments": "{}"},
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
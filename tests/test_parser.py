@@ -2,11 +2,65 @@
 import unittest
 
 from src.common.utils import (
+    OrchestratorResponseParser,
     parse_file_content,
     parse_orchestrator_response,
+    repair_orchestrator_response,
     strip_text_after_invoke_action,
 )
 
+# Responses taken from this file and from test_orchestrator_streaming_output.py
+STREAMED_RESPONSES = [
+    """<t628_reasoning>
+- User wants a CSV file with numbers from 1 to 10
+- We'll use the file creation feature to generate the CSV
+</t628_reasoning>
+<t628_current_subject starting_id="1"/>
+Certainly! I'll create a CSV file containing the numbers from 1 to 10 for you. Here's the file:
+<t628_file name="numbers_1_to_10.csv" mime_type="text/csv" size="20">
+<data>number
+1
+2
+3
+4
+5</data>
+</t628_file>
+I've created a CSV file named "numbers_1_to_10.csv". """,
+    "Hello\n<t123_reasoning>Some reasoning</t123_reasoning><t123_status_update>hi</t123_status_update>\n"
+    "data\n"
+    '<t123_invoke_action agent="agent1" action="action1">\n'
+    '<t123_parameter name="param1">value1</t123_parameter>\n'
+    "</t123_invoke_action>",
+    """<t321_reasoning>
+This is some reasoning
+</t321_reasoning>
+Hi
+<t321_file name="file1.txt" mime_type="text/plain">
+<data>My file content</data>
+</t321_file>
+Bye Bye""",
+    """<t321_reasoning>
+This is some reasoning
+</t321_reasoning>
+<t321_current_subject starting_id="123"/>
+Hello
+<t321_status_update>Things are underway</t321_status_update>
+<t321_invoke_action agent="agent1" action="action1">
+<t321_parameter name="param1">value1</t321_parameter>
+<t321_parameter name="param2">
+value2
+</t321_parameter>
+</t321_invoke_action>
+<t321_status_update>
+Things are now complete
+</t321_status_update>
+This should be ignored
+<file name="file1.txt" mime_type="text/plain">
+<data>My file content</data>
+</file>""",
+    "Hello World",
+]
+
 
 class TestParser(unittest.TestCase):
     def setUp(self):
@@ -165,3 +219,124 @@ More text.
 <t2_invoke_action agent='c' action='d'></t2_invoke_action>"""
         result = strip_text_after_invoke_action(text)
         self.assertEqual(result, expected)
+
+    def assert_incremental_matches_full_parse(self, response, chunk_size, check_reasoning):
+        parser = OrchestratorResponseParser()
+        for end in list(range(chunk_size, len(response), chunk_size)) + [len(response)]:
+            last_chunk = end == len(response)
+            self.assertEqual(
+                parser.parse(
+                    response[:end],
+                    last_chunk=last_chunk,
+                    check_reasoning=check_reasoning,
+                ),
+                parse_orchestrator_response(
+                    response[:end],
+                    last_chunk=last_chunk,
+                    check_reasoning=check_reasoning,
+                ),
+                f"Mismatch after {end} characters",
+            )
+
+    def test_incremental_parser_matches_full_parse(self):
+        for response in STREAMED_RESPONSES:
+            for chunk_size in [1, 7, 40]:
+                for check_reasoning in [True, False]:
+                    with self.subTest(
+                        response=response[:20],
+                        chunk_size=chunk_size,
+                        check_reasoning=check_reasoning,
+                    ):
+                        self.assert_incremental_matches_full_parse(
+                            response, chunk_size, check_reasoning
+                        )
+
+    def test_incremental_parser_learns_tag_prefix_late(self):
+        response = "Some text\n<file name='a.txt'>\n<data>abc</data>\n</file>\n<t42_status_update>Working</t42_status_update>\nDone"
+        self.assert_incremental_matches_full_parse(response, 5, False)
+
+    def test_incremental_parser_restarts_on_shorter_text(self):
+        parser = OrchestratorResponseParser()
+        parser.parse(STREAMED_RESPONSES[2])
+        self.assertEqual(
+            parser.parse(STREAMED_RESPONSES[4], last_chunk=True, check_reasoning=False),
+            parse_orchestrator_response(
+                STREAMED_RESPONSES[4], last_chunk=True, check_reasoning=False
+            ),
+        )
+
+    def assert_repaired(self, response, expected_repairs, tag_prefix=""):
+        parsed = parse_orchestrator_response(response, last_chunk=True, tag_prefix=tag_prefix)
+        self.assertNotEqual(parsed["errors"], [])
+        repaired, repairs = repair_orchestrator_response(response, parsed, tag_prefix)
+        self.assertEqual(repairs, expected_repairs)
+        self.assertEqual(repaired["errors"], [])
+        self.assertEqual(
+            repaired["actions"],
+            [{"agent": "agent1", "action": "action1", "parameters": {"param1": "value1"}}],
+        )
+        return repaired
+
+    def test_repair_unclosed_invoke_action(self):
+        self.assert_repaired(
+            "<t1_reasoning>r</t1_reasoning>\n"
+            '<t1_invoke_action agent="agent1" action="action1">\n'
+            '<t1_parameter name="param1">value1</t1_parameter>',
+            ["close_tags"],
+        )
+
+    def test_repair_tag_prefix_mismatch(self):
+        self.assert_repaired(
+            "<t1_reasoning>r</t1_reasoning>\n"
+            '<t2_invoke_action agent="agent1" action="action1">\n'
+            '<t1_parameter name="param1">value1</parameter>\n'
+            "</t1_invoke_action>",
+            ["tag_prefix"],
+        )
+
+    def test_repair_uses_given_tag_prefix(self):
+        self.assert_repaired(
+            "<t2_reasoning>r</t2_reasoning>\n"
+            '<t1_invoke_action agent="agent1" action="action1">\n'
+            '<t1_parameter name="param1">value1</t1_parameter>\n'
+            "</t1_invoke_action>",
+            ["tag_prefix"],
+            "t1_",
+        )
+
+    def test_repair_leaves_unprefixed_tags_in_content(self):
+        repaired = self.assert_repaired(
+            "<t1_reasoning>r</t1_reasoning>\n"
+            'Write <parameter name="x"> to set it.\n'
+            '<t1_invoke_action agent="agent1" action="action1">\n'
+            '<t1_parameter name="param1">value1</parameter>\n'
+            "</t1_invoke_action>",
+            ["tag_prefix"],
+            "t1_",
+        )
+        self.assertIn('<parameter name="x">', str(repaired["content"]))
+
+    def test_repair_unmatched_invoke_action_end(self):
+        self.assert_repaired(
+            "<t1_reasoning>r</t1_reasoning>\n"
+            '<t1_invoke_action agent="agent1" action="action1">\n'
+            '<t1_parameter name="param1">value1</t1_parameter>\n'
+            "</t1_invoke_action>\n"
+            "</t1_invoke_action>",
+            ["unmatched_invoke_action"],
+        )
+
+    def test_repair_missing_reasoning(self):
+        self.assert_repaired(
+            '<t1_invoke_action agent="agent1" action="action1">\n'
+            '<t1_parameter name="param1">value1</t1_parameter>\n'
+            "</t1_invoke_action>",
+            ["missing_reasoning"],
+        )
+
+    def test_repair_leaves_unfixable_response(self):
+        response = "<t1_reasoning>r</t1_reasoning>\n<t1_file name='a.txt'>\n<data>abc"
+        parsed = parse_orchestrator_response(response, last_chunk=True)
+        repaired, repairs = repair_orchestrator_response(response, parsed)
+        self.assertEqual(repairs, [])
+        self.assertIs(repaired, parsed)
@@ -0,0 +1,48 @@
+# tests to verify that the orchestrator's prompt cache is working as expected
+import unittest
+
+from src.orchestrator.orchestrator_main import OrchestratorState
+from src.orchestrator.prompt_cache import PromptCache
+
+
+class TestPromptCache(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = PromptCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_zero_size_disables_cache(self):
+        cache = PromptCache(max_size=1)
+        cache.set("a", 1)
+        cache.set_max_size(0)
+        cache.set("b", 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_registry_changes_clear_cache(self):
+        OrchestratorState.set_config({"agent_ttl_ms": 60000})
+        state = OrchestratorState()
+        version = state.get_registry_version()
+        state.prompt_cache.set("key", "value")
+
+        state.register_agent({"agent_name": "test_prompt_cache_agent", "actions": []})
+
+        self.assertGreater(state.get_registry_version(), version)
+        self.assertIsNone(state.prompt_cache.get("key"))
+
+        version = state.get_registry_version()
+        state.prompt_cache.set("key", "value")
+        state.delete_agent("test_prompt_cache_agent")
+
+        self.assertGreater(state.get_registry_version(), version)
+        self.assertIsNone(state.prompt_cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# tests to verify that the orchestrator's session state store is working as expected
+import unittest
+from unittest.mock import patch
+
+from src.orchestrator.orchestrator_main import OrchestratorState
+from src.orchestrator.session_state_store import (
+    MemorySessionStateStore,
+    create_session_state_store,
+    get_session_state_size,
+)
+
+
+class TestSessionStateStore(unittest.TestCase):
+    def test_least_recently_used_session_is_evicted(self):
+        store = MemorySessionStateStore({"max_sessions": 2})
+        store.set("a", {"value": 1})
+        store.set("b", {"value": 2})
+        store.get("a")
+        store.set("c", {"value": 3})
+
+        self.assertEqual(store.get("b"), {})
+        self.assertEqual(store.get("a"), {"value": 1})
+        self.assertEqual(store.get("c"), {"value": 3})
+        self.assertEqual(store.get_stats()["evicted"], 1)
+
+    def test_sessions_are_evicted_over_max_bytes(self):
+        state = {"value": "x" * 100}
+        size = get_session_state_size(state)
+        store = MemorySessionStateStore({"max_bytes": size * 2})
+        store.set("a", state)
+        store.set("b", state)
+        self.assertEqual(store.get_stats()["bytes"], size * 2)
+
+        store.set("c", state)
+        stats = store.get_stats()
+        self.assertEqual(stats["sessions"], 2)
+        self.assertEqual(stats["bytes"], size * 2)
+        self.assertEqual(store.get("a"), {})
+
+    def test_idle_sessions_expire(self):
+        store = MemorySessionStateStore({"time_to_live": 60})
+        with patch("src.orchestrator.session_state_store.time.time", return_value=1000):
+            store.set("a", {"value": 1})
+            store.set("b", {"value": 2})
+        with patch("src.orchestrator.session_state_store.time.time", return_value=1050):
+            self.assertEqual(store.get("b"), {"value": 2})
+        with patch("src.orchestrator.session_state_store.time.time", return_value=1070):
+            self.assertEqual(store.get("a"), {})
+            self.assertEqual(store.get("b"), {"value": 2})
+
+        stats = store.get_stats()
+        self.assertEqual(stats["sessions"], 1)
+        self.assertEqual(stats["expired"], 1)
+        self.assertEqual(stats["bytes"], get_session_state_size({"value": 2}))
+
+    def test_unknown_store_type(self):
+        with self.assertRaises(ValueError):
+            create_session_state_store({"type": "unknown"})
+
+    def test_orchestrator_session_state(self):
+        state = OrchestratorState()
+        session_id = "test_session_state_store"
+        self.assertEqual(
+            state.get_agent_state(session_id),
+            {"global": {"agent_name": "global", "state": "open"}},
+        )
+        # Reading the state doesn't create a session
+        self.assertEqual(state.get_session_state(session_id), {})
+
+        state.update_agent_state("test_agent", "open", session_id)
+        state.set_current_subject_starting_id(session_id, "subject-1")
+
+        self.assertEqual(state.get_agent_state(session_id)["test_agent"]["state"], "open")
+        self.assertEqual(state.get_current_subject_starting_id(session_id), "subject-1")
+        state.session_state_store.delete(session_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
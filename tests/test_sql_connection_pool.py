@@ -0,0 +1,118 @@
+"""Tests for the shared pools of SQL connections"""
+
+import threading
+import unittest
+
+from src.common.sql_connection_pool import (
+    SQLConnectionPool,
+    close_connection_pools,
+    get_connection_pool,
+    get_pool_dsn,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestSQLConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+
+    def tearDown(self):
+        close_connection_pools()
+
+    def connect(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def create_pool(self, **options):
+        return SQLConnectionPool(self.connect, lambda c: c.healthy, **options)
+
+    def test_connections_are_reused(self):
+        pool = self.create_pool()
+        first = pool.checkout()
+        pool.release(first)
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(len(self.connections), 1)
+
+    def test_checkout_waits_at_max_size(self):
+        pool = self.create_pool(max_size=1, checkout_timeout=5)
+        connection = pool.checkout()
+        checked_out = []
+        thread = threading.Thread(target=lambda: checked_out.append(pool.checkout()))
+        thread.start()
+        thread.join(0.1)
+        self.assertEqual(checked_out, [])
+
+        pool.release(connection)
+        thread.join(5)
+        self.assertEqual(checked_out, [connection])
+        self.assertEqual(pool.get_stats(), {"size": 1, "idle": 0, "in_use": 1})
+
+    def test_checkout_timeout(self):
+        pool = self.create_pool(max_size=1, checkout_timeout=0.05)
+        pool.checkout()
+        with self.assertRaises(TimeoutError):
+            pool.checkout()
+
+    def test_unhealthy_connections_are_replaced(self):
+        pool = self.create_pool(health_check_interval=0)
+        connection = pool.checkout()
+        connection.healthy = False
+        pool.release(connection)
+
+        replacement = pool.checkout()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["size"], 1)
+
+    def test_broken_connections_free_their_slot(self):
+        pool = self.create_pool(max_size=1, checkout_timeout=0.05)
+        pool.release(pool.checkout(), broken=True)
+        self.assertEqual(pool.get_stats()["size"], 0)
+        pool.checkout()
+
+    def test_pool_is_filled_to_min_size(self):
+        pool = get_connection_pool(
+            "postgresql://user@host:5432/db", self.connect, bool, min_size=2
+        )
+        self.assertEqual(pool.get_stats(), {"size": 2, "idle": 2, "in_use": 0})
+        pool.checkout()
+        pool.checkout()
+        self.assertEqual(len(self.connections), 2)
+
+    def test_failed_fill_is_not_raised(self):
+        def connect():
+            raise ConnectionError("Connection refused")
+
+        pool = SQLConnectionPool(connect, bool, min_size=2)
+        pool.fill()
+        self.assertEqual(pool.get_stats()["size"], 0)
+
+    def test_pool_dsn_depends_on_the_credentials(self):
+        dsn = get_pool_dsn("postgresql", "user", "secret", "host", 5432, "db")
+        self.assertNotIn("secret", dsn)
+        self.assertEqual(dsn, get_pool_dsn("postgresql", "user", "secret", "host", 5432, "db"))
+        self.assertNotEqual(dsn, get_pool_dsn("postgresql", "user", "other", "host", 5432, "db"))
+
+    def test_pools_are_shared_by_dsn(self):
+        pool = get_connection_pool("postgresql://user@host:5432/db", self.connect, bool)
+        self.assertIs(
+            get_connection_pool("postgresql://user@host:5432/db", self.connect, bool), pool
+        )
+        self.assertIsNot(
+            get_connection_pool("postgresql://user@host:5432/other", self.connect, bool),
+            pool,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from src.common.stats_logger import StatsLogger, STATS_LOG_INTERVAL
+
+
+class TestStatsLogger(unittest.TestCase):
+    def test_stats_are_logged_once_per_interval(self):
+        stats = {"count": 1}
+        with patch("src.common.stats_logger.time.monotonic", return_value=0):
+            stats_logger = StatsLogger("Test", lambda: stats)
+            with patch("src.common.stats_logger.log") as log:
+                stats_logger.log_stats()
+            log.info.assert_not_called()
+
+        with patch(
+            "src.common.stats_logger.time.monotonic",
+            return_value=STATS_LOG_INTERVAL,
+        ):
+            with patch("src.common.stats_logger.log") as log:
+                stats_logger.log_stats()
+                stats_logger.log_stats()
+        log.info.assert_called_once()
+        self.assertEqual(log.info.call_args.args[1], "Test")
+        self.assertEqual(json.loads(log.info.call_args.args[2]), stats)
+
+    def test_empty_stats_are_not_logged(self):
+        with patch("src.common.stats_logger.time.monotonic", return_value=0):
+            stats_logger = StatsLogger("Test", dict)
+        with patch(
+            "src.common.stats_logger.time.monotonic",
+            return_value=STATS_LOG_INTERVAL,
+        ):
+            with patch("src.common.stats_logger.log") as log:
+                stats_logger.log_stats()
+        log.info.assert_not_called()
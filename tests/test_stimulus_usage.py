@@ -0,0 +1,66 @@
+"""Tests for counting a stimulus' resource usage and checking it against its limits"""
+
+import unittest
+
+from src.orchestrator.stimulus_usage import (
+    STIMULUS_USAGE_USER_PROPERTY,
+    add_stimulus_usage,
+    format_limit_reached_message,
+    get_exceeded_limits,
+    get_messages_characters,
+    get_stimulus_usage,
+)
+
+
+class TestStimulusUsage(unittest.TestCase):
+
+    def test_usage_accumulates_in_user_properties(self):
+        user_properties = {}
+        add_stimulus_usage(user_properties, llm_calls=1, input_characters=100)
+        add_stimulus_usage(user_properties, llm_calls=1, actions=2)
+
+        self.assertEqual(
+            user_properties[STIMULUS_USAGE_USER_PROPERTY],
+            {
+                "llm_calls": 2,
+                "input_characters": 100,
+                "output_characters": 0,
+                "actions": 2,
+            },
+        )
+        self.assertEqual(get_stimulus_usage({})["llm_calls"], 0)
+        with self.assertRaises(ValueError):
+            add_stimulus_usage(user_properties, tokens=1)
+
+    def test_llm_limits_stop_at_the_limit(self):
+        usage = {"llm_calls": 3, "output_characters": 10}
+
+        self.assertEqual(get_exceeded_limits(usage, {"llm_calls": 3}), ["llm_calls"])
+        self.assertEqual(get_exceeded_limits(usage, {"llm_calls": 4}), [])
+        self.assertEqual(get_exceeded_limits(usage, {"llm_calls": 0}), [])
+        self.assertEqual(
+            get_exceeded_limits(usage, {"output_characters": 10}),
+            ["output_characters"],
+        )
+
+    def test_action_limit_only_stops_new_actions(self):
+        usage = {"actions": 4}
+
+        self.assertEqual(get_exceeded_limits(usage, {"actions": 4}), [])
+        self.assertEqual(get_exceeded_limits(usage, {"actions": 5}, 1), [])
+        self.assertEqual(get_exceeded_limits(usage, {"actions": 5}, 2), ["actions"])
+
+    def test_messages_characters(self):
+        messages = [
+            {"role": "system", "content": "abc"},
+            {"role": "user", "content": [{"type": "text", "text": "defg"}]},
+        ]
+        self.assertEqual(get_messages_characters(messages), 7)
+
+    def test_limit_reached_message(self):
+        text = format_limit_reached_message(["llm_calls"], {"llm_calls": 30})
+        self.assertIn("30 calls to the language model", text)
+
+
+if __name__ == "__main__":
+    unittest.main()